@@ -1,14 +1,91 @@
+import asyncio
+import dataclasses
+import os
 import re
-from typing import Dict, Any, List, Optional
+from typing import AsyncIterator, Dict, Any, List, NamedTuple, Optional, Tuple
 from agents.weather_agent import WeatherAgent
 from agents.places_agent import PlacesAgent
+from agents.query_parser import ParsedQuery, QueryParser
+from agents.query_plan import Branch, run_branches
+from agents.response_cache import ChatAnswer, ResponseCache, compute_etag
+from agents.response_schema import public_places
+from agents.warmup import DEFAULT_LOG_PATH, HotDestinations
+from agents.wikipedia_agent import WikipediaAgent
+from utils.admission import HEAVY, LIGHT
+from utils.cache_backend import backend_from_env
+from utils.deadline import deadline_scope, remaining
 from utils.geocoder import Geocoder
+from utils.http_client import UpstreamClients
+from utils.metrics import span
+
+class Triage(NamedTuple):
+    """How a query should be admitted, see Orchestrator.triage."""
+    lane: str
+    # Answerable right away: from the response cache, or with no upstream call
+    immediate: bool
+    # A heavy query whose weather part can be served on its own
+    weather_fallback: bool
+
 
 class Orchestrator:
-    def __init__(self):
-        self.weather_agent = WeatherAgent()
-        self.places_agent = PlacesAgent()
-        self.geocoder = Geocoder()
+    # Per-branch deadlines (seconds). A branch that misses its deadline is dropped
+    # and the response is built from whatever finished.
+    BRANCH_DEADLINES = {
+        "geocode": 10.0,
+        "weather": 8.0,
+        "places": 30.0,
+        "enrichment": 6.0,
+    }
+    # Overpass queries of one batch running at once
+    BATCH_PLACES_CONCURRENCY = 4
+    # Batch geocoding stops this long before its branch deadline (seconds)
+    BATCH_GEOCODE_MARGIN = 1.0
+    # Appended to weather-only answers given while places searches are shed
+    PLACES_SHED_NOTICE = "Places aren't available right now because of high demand, please try again in a moment."
+
+    def __init__(self, http: Optional[UpstreamClients] = None):
+        # One set of pooled upstream clients shared by every agent
+        self.http = http or UpstreamClients()
+        self.query_parser = QueryParser()
+        # Cache tier shared between worker processes (CACHE_BACKEND), if configured
+        self.shared_cache = backend_from_env()
+        self.weather_agent = WeatherAgent(self.http, shared_cache=self.shared_cache)
+        self.wikipedia_agent = WikipediaAgent(self.http)
+        self.places_agent = PlacesAgent(self.http, wikipedia_agent=self.wikipedia_agent, shared_cache=self.shared_cache)
+        self.geocoder = Geocoder(self.http, shared_cache=self.shared_cache)
+        # Locations users ask about, for cache warm-up (WARMUP_LOG_PATH, empty to keep in memory)
+        self.hot_destinations = HotDestinations(os.getenv("WARMUP_LOG_PATH", DEFAULT_LOG_PATH) or None)
+        # Whole answers keyed by normalized query (RESPONSE_CACHE_ENABLED=0 to disable)
+        self.response_cache = ResponseCache(enabled=os.getenv("RESPONSE_CACHE_ENABLED", "1") != "0")
+
+    def coalescing_stats(self) -> Dict[str, Dict[str, int]]:
+        """Single-flight counters for every upstream, e.g. how many callers were coalesced."""
+        groups = [
+            self.geocoder.inflight,
+            self.weather_agent.inflight,
+            self.places_agent.overpass_inflight,
+            self.wikipedia_agent.inflight,
+        ]
+        return {group.name: group.stats() for group in groups}
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit/miss counters and size of every cache on the query path."""
+        caches = {
+            "geocode": self.geocoder.cache,
+            "weather": self.weather_agent.cache,
+            "places": self.places_agent.places_cache,
+            "wikipedia_summaries": self.wikipedia_agent.summaries,
+            "wikipedia_searches": self.wikipedia_agent.searches,
+            "wikidata_sitelinks": self.wikipedia_agent.sitelinks,
+            "responses": self.response_cache,
+        }
+        if self.shared_cache is not None:
+            caches["shared"] = self.shared_cache
+        return {name: cache.stats() for name, cache in caches.items()}
+
+    async def aclose(self) -> None:
+        if self.shared_cache is not None:
+            await self.shared_cache.close()
 
     async def process_query(self, user_input: str, preferences: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -16,61 +93,310 @@ class Orchestrator:
         
         Args:
             user_input: The user's query
-            preferences: Optional preferences dict with category_filter, etc.
+            preferences: Optional preferences dict with category_filter,
+                include_descriptions, etc.
+        """
+        return (await self.answer(user_input, preferences)).body
+
+    async def answer(self, user_input: str, preferences: Dict[str, Any] = None) -> ChatAnswer:
+        """
+        process_query through the response cache: returns the body with its
+        ETag and how long it may be cached. Only the parts of a cached
+        answer that have expired (e.g. the weather) are recomputed.
+        """
+        preferences = preferences or {}
+        category_filter = preferences.get("category_filter", "all")
+        parsed = self.query_parser.parse(user_input)
+        key = self.response_cache.key(parsed, category_filter, preferences)
+        if key is None:
+            body = await self._run_query(user_input, preferences)
+            return ChatAnswer(body, compute_etag(body))
+
+        needed = [branch.name for branch in self._build_plan(parsed.intent, parsed.location, category_filter, preferences)]
+        cached, fresh = self.response_cache.lookup(key, needed)
+        if cached is not None:
+            self.hot_destinations.record(parsed.location, category_filter if "places" in needed else None)
+            return cached
+
+        results = dict(fresh)
+        body = await self._run_query(user_input, preferences, results)
+        return self.response_cache.store(key, needed, fresh, results, body)
+
+    def triage(self, user_input: str, preferences: Dict[str, Any] = None) -> Triage:
+        """
+        Admission lane of a query ("light" for weather only, "heavy" for
+        anything searching places), whether it can be answered right away,
+        and whether weather_only_answer() can stand in for it.
+        """
+        parsed = self.query_parser.parse(user_input)
+        if not parsed.location:
+            return Triage(LIGHT, True, False)
+        lane = LIGHT if parsed.intent == "weather" else HEAVY
+        return Triage(lane, self._cached_answer(parsed, preferences or {}) is not None, parsed.intent == "both")
+
+    def stale_answer(self, user_input: str, preferences: Dict[str, Any] = None) -> Optional[ChatAnswer]:
+        """The last complete answer to this query however old, for when it can't be computed now."""
+        return self._cached_answer(self.query_parser.parse(user_input), preferences or {}, stale=True)
+
+    def _cached_answer(self, parsed: ParsedQuery, preferences: Dict[str, Any], stale: bool = False) -> Optional[ChatAnswer]:
+        category_filter = preferences.get("category_filter", "all")
+        key = self.response_cache.key(parsed, category_filter, preferences)
+        if key is None:
+            return None
+        needed = [branch.name for branch in self._build_plan(parsed.intent, parsed.location, category_filter, preferences)]
+        return self.response_cache.peek(key, needed, stale)
+
+    async def weather_only_answer(self, user_input: str, preferences: Dict[str, Any] = None) -> Optional[ChatAnswer]:
+        """
+        Reduced answer while places searches are shed: the weather part of a
+        weather-and-places query, noting that places were left out. None for
+        queries not asking about the weather. Not cached.
+        """
+        parsed = self.query_parser.parse(user_input)
+        if parsed.intent != "both" or not parsed.location:
+            return None
+        body = await self._run_query(user_input, preferences or {}, intent="weather")
+        body["text"] = f"{body['text']} {self.PLACES_SHED_NOTICE}".strip()
+        return ChatAnswer(body, compute_etag(body))
+
+    async def _run_query(self, user_input: str, preferences: Dict[str, Any], parts: Optional[Dict[str, Any]] = None,
+                         intent: Optional[str] = None) -> Dict[str, Any]:
+        async for event in self.stream_query(user_input, preferences, parts, intent):
+            if event["event"] == "done":
+                return {"text": event["text"], "data": event["data"]}
+
+    async def stream_query(self, user_input: str, preferences: Dict[str, Any] = None, parts: Optional[Dict[str, Any]] = None,
+                           intent: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Same as process_query, but yields events as each agent finishes:
+        "location" (with coordinates), "weather", "places", "enrichment",
+        and finally "done" carrying the complete response.
+
+        parts maps plan branches to results that are still fresh (from the
+        response cache); those branches return them instead of calling the
+        agents, and every branch result is written back into it. intent
+        overrides the parsed intent (e.g. "weather" to leave places out).
         """
         if preferences is None:
             preferences = {}
         
         category_filter = preferences.get("category_filter", "all")
-        intent = self._determine_intent(user_input)
-        location = self._extract_location(user_input)
+        with span("parse_query"):
+            parsed = self.query_parser.parse(user_input)
+        intent, location = intent or parsed.intent, parsed.location
 
         if not location:
-            return {
+            yield {
+                "event": "done",
                 "text": "I'm sorry, I couldn't identify the location you're asking about. Please specify a city or place.",
                 "data": {}
             }
+            return
 
-        coords = await self.geocoder.get_coordinates(location)
-        if not coords:
-            return {
-                "text": f"I'm sorry, I don't know where '{location}' is. Please check the spelling or try a major city.",
-                "data": {}
-            }
+        plan = self._build_plan(intent, location, category_filter, preferences)
+        if parts:
+            plan = [self._reuse(branch, parts[branch.name]) if branch.name in parts else branch for branch in plan]
+        results: Dict[str, Any] = {} if parts is None else parts
+        data: Dict[str, Any] = {}
+        async for name, result in run_branches(plan):
+            results[name] = result
 
-        lat, lon = coords
-        response_parts = []
-        data = {"location": location, "lat": lat, "lon": lon}
+            if name == "geocode":
+                if not result:
+                    yield {
+                        "event": "done",
+                        "text": f"I'm sorry, I don't know where '{location}' is. Please check the spelling or try a major city.",
+                        "data": {}
+                    }
+                    return
+                lat, lon = result
+                self.hot_destinations.record(location, category_filter if any(branch.name == "places" for branch in plan) else None)
+                data = {"location": location, "lat": lat, "lon": lon}
+                yield {"event": "location", **data}
 
-        # Execute agents based on intent
-        if intent in ["weather", "both"]:
-            weather_data = await self.weather_agent.get_weather(lat, lon)
-            if weather_data:
-                data["weather"] = weather_data
-                response_parts.append(self.weather_agent.format_weather_response(weather_data, location))
-
-        if intent in ["places", "both"]:
-            places_data = await self.places_agent.get_places(lat, lon, location, category_filter=category_filter)
-            if places_data:
-                data["places"] = places_data
-                response_parts.append(self.places_agent.format_places_response(places_data, location, category_filter))
-        
-        # If no specific intent detected but location found, default to "places" only
-        # Based on Example 1: "I'm going to go to Bangalore, let's plan my trip" → shows only places
-        if intent == "unknown":
-            # Default to places only for vague queries
-            places_data = await self.places_agent.get_places(lat, lon, location, category_filter=category_filter)
-            
-            if places_data:
-                data["places"] = places_data
-                response_parts.append(self.places_agent.format_places_response(places_data, location, category_filter))
+            elif name == "weather" and result:
+                data["weather"] = result
+                yield {
+                    "event": "weather",
+                    "weather": result,
+                    "text": self.weather_agent.format_weather_response(result, location)
+                }
+
+            elif name == "places" and result is not None:
+                places = public_places(result)
+                if places:
+                    data["places"] = places
+                yield {
+                    "event": "places",
+                    "places": places,
+                    "text": self.places_agent.format_places_response(places, location, category_filter)
+                }
+
+            elif name == "enrichment" and result:
+                data["places"] = public_places(result)
+                yield {"event": "enrichment", "places": data["places"]}
 
-        final_text = " ".join(response_parts)
-        return {
-            "text": final_text,
+        yield {
+            "event": "done",
+            "text": self._compose_text(data, location, category_filter),
             "data": data
         }
 
+    def _compose_text(self, data: Dict[str, Any], location: str, category_filter: str) -> str:
+        with span("format"):
+            response_parts = []
+            if data.get("weather"):
+                response_parts.append(self.weather_agent.format_weather_response(data["weather"], location))
+
+            # "unknown" intent also lands here: vague queries default to places only
+            # Based on Example 1: "I'm going to go to Bangalore, let's plan my trip" → shows only places
+            if data.get("places"):
+                response_parts.append(self.places_agent.format_places_response(data["places"], location, category_filter))
+
+            return " ".join(response_parts)
+
+    async def process_batch(self, queries: List[Tuple[str, Optional[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """
+        Answer several queries (e.g. every stop of a trip) together, returning
+        one process_query-style response per query, in order. A query that
+        fails gets {"error": ...} instead of failing the whole batch.
+
+        All locations are geocoded in one deduplicated pass, weather for every
+        coordinate comes from one multi-location request, and the places
+        searches run concurrently under BATCH_PLACES_CONCURRENCY. A location
+        that couldn't be geocoded because of an upstream failure (as opposed
+        to an unknown place) gets an error of its own.
+        """
+        items = []
+        for user_input, preferences in queries:
+            preferences = preferences or {}
+            with span("parse_query"):
+                parsed = self.query_parser.parse(user_input)
+            items.append((parsed, preferences, preferences.get("category_filter", "all")))
+
+        locations = [parsed.location for parsed, _, _ in items if parsed.location]
+        places_slots = asyncio.Semaphore(self.BATCH_PLACES_CONCURRENCY)
+
+        # Uncached names are geocoded one by one at Nominatim's rate limit
+        geocode_deadline = self.BRANCH_DEADLINES["geocode"] + self.geocoder.pacing(locations)
+
+        async def geocode(_):
+            # Lookups stop a little before the branch deadline, so the ones that
+            # ran out of time fail on their own instead of losing the whole pass
+            with deadline_scope(max(remaining(geocode_deadline) - self.BATCH_GEOCODE_MARGIN, 0.0)):
+                return await self.geocoder.get_coordinates_many(locations)
+
+        def located(coords_by_location, location):
+            coords = coords_by_location.get(location)
+            return coords if isinstance(coords, tuple) else None
+
+        async def weather(inputs):
+            coords = inputs["geocode"]
+            wanted = [
+                point for point in (located(coords, parsed.location) for parsed, _, _ in items if parsed.intent in ["weather", "both"])
+                if point
+            ]
+            forecasts = await self.weather_agent.get_weather_many(wanted)
+            return dict(zip(wanted, forecasts))
+
+        def places_for(parsed, category_filter):
+            async def places(inputs):
+                coords = located(inputs["geocode"], parsed.location)
+                if not coords:
+                    return None
+                async with places_slots:
+                    return await self.places_agent.get_places(coords[0], coords[1], parsed.location, category_filter=category_filter)
+            return places
+
+        def enrichment_for(i, parsed):
+            async def enrichment(inputs):
+                return await self.wikipedia_agent.enrich_places(inputs[f"places:{i}"], parsed.location)
+            return enrichment
+
+        plan = [Branch("geocode", geocode, geocode_deadline)]
+        if any(parsed.intent in ["weather", "both"] for parsed, _, _ in items):
+            plan.append(Branch("weather", weather, self.BRANCH_DEADLINES["weather"], ("geocode",)))
+        for i, (parsed, preferences, category_filter) in enumerate(items):
+            if parsed.location and parsed.intent in ["places", "both", "unknown"]:
+                plan.append(Branch(f"places:{i}", places_for(parsed, category_filter), self.BRANCH_DEADLINES["places"], ("geocode",)))
+                if preferences.get("include_descriptions"):
+                    plan.append(Branch(f"enrichment:{i}", enrichment_for(i, parsed), self.BRANCH_DEADLINES["enrichment"], (f"places:{i}",)))
+
+        results: Dict[str, Any] = {}
+        async for name, result in run_branches(plan):
+            results[name] = result
+
+        coords_by_location = results.get("geocode")
+        forecasts = results.get("weather") or {}
+        responses = []
+        for i, (parsed, _, category_filter) in enumerate(items):
+            location = parsed.location
+            try:
+                if not location:
+                    responses.append({
+                        "text": "I'm sorry, I couldn't identify the location you're asking about. Please specify a city or place.",
+                        "data": {}
+                    })
+                    continue
+                coords = coords_by_location.get(location) if coords_by_location is not None else None
+                if coords_by_location is None or isinstance(coords, Exception):
+                    # Rate limited, timed out or failed upstream: not an unknown place
+                    responses.append({"error": f"Couldn't look up '{location}' right now, please try again."})
+                    continue
+                if not coords:
+                    responses.append({
+                        "text": f"I'm sorry, I don't know where '{location}' is. Please check the spelling or try a major city.",
+                        "data": {}
+                    })
+                    continue
+
+                self.hot_destinations.record(location, category_filter if parsed.intent in ["places", "both", "unknown"] else None)
+                data: Dict[str, Any] = {"location": location, "lat": coords[0], "lon": coords[1]}
+                if parsed.intent in ["weather", "both"] and forecasts.get(coords):
+                    data["weather"] = forecasts[coords]
+                places = results.get(f"enrichment:{i}") or results.get(f"places:{i}")
+                if places:
+                    data["places"] = public_places(places)
+                responses.append({"text": self._compose_text(data, location, category_filter), "data": data})
+            except Exception as e:
+                responses.append({"error": str(e)})
+        return responses
+
+    @staticmethod
+    def _reuse(branch: Branch, result: Any) -> Branch:
+        async def cached(_):
+            return result
+        return dataclasses.replace(branch, run=cached)
+
+    def _build_plan(self, intent: str, location: str, category_filter: str, preferences: Dict[str, Any]) -> List[Branch]:
+        """
+        Build the dependency graph for a query: geocode -> {weather, places -> enrichment}.
+        """
+        async def geocode(_):
+            return await self.geocoder.get_coordinates(location)
+
+        async def weather(inputs):
+            lat, lon = inputs["geocode"]
+            return await self.weather_agent.get_weather(lat, lon)
+
+        async def places(inputs):
+            lat, lon = inputs["geocode"]
+            return await self.places_agent.get_places(lat, lon, location, category_filter=category_filter)
+
+        async def enrichment(inputs):
+            return await self.wikipedia_agent.enrich_places(inputs["places"], location)
+
+        plan = [Branch("geocode", geocode, self.BRANCH_DEADLINES["geocode"])]
+        if intent in ["weather", "both"]:
+            plan.append(Branch("weather", weather, self.BRANCH_DEADLINES["weather"], ("geocode",)))
+        if intent in ["places", "both", "unknown"]:
+            plan.append(Branch("places", places, self.BRANCH_DEADLINES["places"], ("geocode",)))
+            if preferences.get("include_descriptions"):
+                plan.append(Branch("enrichment", enrichment, self.BRANCH_DEADLINES["enrichment"], ("places",)))
+        return plan
+
+    # _determine_intent and _extract_location are the reference implementations
+    # of QueryParser; benchmarks/bench_query_parser.py checks they agree.
     def _determine_intent(self, text: str) -> str:
         text = text.lower()
         has_weather = any(w in text for w in ["weather", "temperature", "rain", "forecast", "hot", "cold"])
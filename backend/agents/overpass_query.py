@@ -0,0 +1,153 @@
+"""
+Compiles place searches into Overpass QL that is cheap to run server-side.
+
+    [out:json][timeout:25][maxsize:67108864][bbox:s,w,n,e];
+    (
+      nwr["tourism"~"^(attraction|museum)$"];
+      nwr["historic"~"^(castle|monument)$"];
+    )->.candidates;
+    nwr.candidates(around:30000,48.85,2.35);
+    convert item ::id=id(), ::geom=center(geom()), "name"=t["name"], ...;
+    out 500;
+
+- One tag statement per key, with the values merged into an anchored regex,
+  instead of node/way/relation statements for every (key, value) pair.
+- The global bbox lets every tag statement use the spatial index, and the
+  exact `around` distance check runs once, over the named candidate set.
+- `convert` returns each element's center and only the tags PlaceRecord
+  keeps, so the response is a fraction of `out center` with full tags.
+- An inner radius turns the search into a ring (difference statement), for
+  searches that grow outwards without re-fetching what they already have.
+"""
+import math
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, List, Tuple
+
+from agents.place_records import KEPT_TAGS
+from utils.spatial import EARTH_RADIUS_KM, geohash_encode
+
+# Server-side limits, set explicitly so a heavy query fails fast instead of
+# queueing behind the instance's (much larger) defaults
+QUERY_TIMEOUT = 25
+QUERY_MAXSIZE = 64 * 1024 * 1024
+
+OUTPUT_TAGS = ("name",) + tuple(sorted(KEPT_TAGS))
+
+# Characters with a meaning in POSIX extended regular expressions
+_REGEX_SPECIAL = set("\\^$.|?*+()[]{}")
+
+
+def _regex_escape(value: str) -> str:
+    return "".join("\\" + char if char in _REGEX_SPECIAL else char for char in value)
+
+
+def _quote(value: str) -> str:
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def bounding_box(lat: float, lon: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """(south, west, north, east) of the circle, for the global [bbox:] setting."""
+    dlat = math.degrees(radius_m / 1000 / EARTH_RADIUS_KM)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return (
+        round(max(lat - dlat, -90.0), 6),
+        round(max(lon - dlon, -180.0), 6),
+        round(min(lat + dlat, 90.0), 6),
+        round(min(lon + dlon, 180.0), 6),
+    )
+
+
+def tag_statements(tags: Iterable[Tuple[str, str]]) -> List[str]:
+    """One `nwr` statement per key, its values merged into a single regex."""
+    values_by_key: "OrderedDict[str, List[str]]" = OrderedDict()
+    for key, value in tags:
+        values = values_by_key.setdefault(key, [])
+        if value not in values:
+            values.append(value)
+
+    statements = []
+    for key, values in values_by_key.items():
+        if len(values) == 1:
+            statements.append(f"nwr[{_quote(key)}={_quote(values[0])}];")
+        else:
+            pattern = "^(" + "|".join(_regex_escape(value) for value in sorted(values)) + ")$"
+            statements.append(f"nwr[{_quote(key)}~{_quote(pattern)}];")
+    return statements
+
+
+def compile_places_query(tags: Iterable[Tuple[str, str]], lat: float, lon: float, radius: int, limit: int = 500, inner_radius: int = 0) -> str:
+    """
+    Overpass QL for elements carrying any of the (key, value) tags within
+    `radius` meters of (lat, lon), or between inner_radius and radius.
+    """
+    south, west, north, east = bounding_box(lat, lon, radius)
+    lines = [f"[out:json][timeout:{QUERY_TIMEOUT}][maxsize:{QUERY_MAXSIZE}][bbox:{south},{west},{north},{east}];", "("]
+    lines += ["  " + statement for statement in tag_statements(tags)]
+    lines.append(")->.candidates;")
+
+    if inner_radius > 0:
+        lines += [
+            "(",
+            f"  nwr.candidates(around:{radius},{lat},{lon});",
+            f"  - nwr.candidates(around:{inner_radius},{lat},{lon});",
+            ");",
+        ]
+    else:
+        lines.append(f"nwr.candidates(around:{radius},{lat},{lon});")
+
+    fields = ["::id=id()", "::geom=center(geom())"] + [f'{_quote(tag)}=t[{_quote(tag)}]' for tag in OUTPUT_TAGS]
+    lines.append("convert item " + ", ".join(fields) + ";")
+    lines.append(f"out {limit};")
+    return "\n".join(lines)
+
+
+class DensityEstimator:
+    """
+    Remembers how many candidates areas returned, to size the next search
+    around them. A search that hits the result cap returns an arbitrary
+    slice of the area, so in dense cities a smaller radius that returns
+    every candidate ranks better and costs the server far less.
+
+    Estimates are kept per area, tag set and result cap: a sparse category
+    says nothing about a busy one searched in the same area. Radii are
+    picked from RADIUS_STEPS, so the compiled query (and with it the
+    in-process and shared cache keys) only changes when the estimate moves
+    across a step, and workers that learned slightly different densities
+    still mostly agree on the radius.
+    """
+
+    # Geohash precision of the areas densities are tracked for (~39km cells)
+    PRECISION = 4
+    MIN_RADIUS = 3000
+    RADIUS_STEPS = (3000, 5000, 8000, 12000, 20000)
+    MAX_AREAS = 4096
+
+    def __init__(self, target_fraction: float = 0.8):
+        self.target_fraction = target_fraction
+        # Candidates per square km, lower bounds when the cap was hit
+        self._density: "OrderedDict[Tuple[str, FrozenSet[Tuple[str, str]], int], float]" = OrderedDict()
+
+    def _key(self, lat: float, lon: float, tags: Iterable[Tuple[str, str]], limit: int) -> Tuple[str, FrozenSet[Tuple[str, str]], int]:
+        return geohash_encode(lat, lon, self.PRECISION), frozenset(tags), limit
+
+    def radius_for(self, lat: float, lon: float, radius: int, limit: int, tags: Iterable[Tuple[str, str]]) -> int:
+        """Largest radius up to `radius` expected to stay under the result cap."""
+        density = self._density.get(self._key(lat, lon, tags, limit))
+        if not density:
+            return radius
+        fitting = 1000 * math.sqrt(self.target_fraction * limit / (math.pi * density))
+        if fitting >= radius:
+            return radius
+        return max([step for step in self.RADIUS_STEPS if step <= fitting], default=self.MIN_RADIUS)
+
+    def observe(self, lat: float, lon: float, radius: int, count: int, limit: int, tags: Iterable[Tuple[str, str]]) -> None:
+        key = self._key(lat, lon, tags, limit)
+        area_km2 = math.pi * (radius / 1000) ** 2
+        density = count / area_km2
+        if count >= limit:
+            # Capped: only a lower bound, so never lower a previous estimate
+            density = max(density, self._density.get(key, 0.0))
+        self._density[key] = density
+        self._density.move_to_end(key)
+        while len(self._density) > self.MAX_AREAS:
+            self._density.popitem(last=False)
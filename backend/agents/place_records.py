@@ -0,0 +1,65 @@
+"""
+Compact place records parsed from Overpass elements.
+
+A record keeps only what ranking, category filtering and enrichment use,
+plus the part of the popularity score that depends on the place alone,
+computed once while the response is being parsed.
+"""
+from typing import Any, Dict, NamedTuple, Optional
+
+from agents.ranking import METADATA_KEYS, category_weight, metadata_count, name_has_keyword
+
+# Tags used by the scorer, the category filters and Wikipedia enrichment
+CATEGORY_KEYS = ("tourism", "historic", "amenity", "shop", "leisure", "natural")
+KEPT_TAGS = frozenset(CATEGORY_KEYS + ("heritage", "unesco", "wikipedia", "wikidata") + tuple(METADATA_KEYS))
+
+
+class PlaceRecord(NamedTuple):
+    name: str
+    lat: float
+    lon: float
+    category: str
+    tags: Dict[str, str]
+    # Score from heuristics that don't depend on the search (category weight,
+    # name length and keywords, Wikipedia presence)
+    static_score: int
+    metadata_count: int
+
+    @property
+    def category_formatted(self) -> str:
+        return self.category.replace("_", " ").title()
+
+
+def parse_place(element: Dict[str, Any]) -> Optional[PlaceRecord]:
+    """
+    Turn an Overpass element into a PlaceRecord, or None if it has no name
+    or no usable coordinates.
+    """
+    tags = element.get("tags", {})
+    name = tags.get("name")
+    if not name:
+        return None
+
+    # Get coordinates
+    if "lat" in element and "lon" in element:
+        place_lat, place_lon = element["lat"], element["lon"]
+    elif "center" in element:
+        place_lat, place_lon = element["center"]["lat"], element["center"]["lon"]
+    elif element.get("geometry", {}).get("type") == "Point":
+        # `convert` output carries a GeoJSON point
+        place_lon, place_lat = element["geometry"]["coordinates"]
+    else:
+        return None
+
+    # Determine category
+    category = tags.get("tourism") or tags.get("historic") or tags.get("amenity") or tags.get("shop") or tags.get("leisure") or tags.get("natural") or "attraction"
+
+    # `convert` output has every requested tag, empty where the element lacks it
+    kept = {key: value for key, value in tags.items() if key in KEPT_TAGS and value != ""}
+    static_score = (
+        category_weight(kept)
+        + (1 if len(name.split()) <= 3 else 0)
+        + (2 if name_has_keyword(name) else 0)
+        + (2 if kept.get("wikipedia") or kept.get("wikidata") else 0)
+    )
+    return PlaceRecord(name, place_lat, place_lon, category, kept, static_score, metadata_count(kept))
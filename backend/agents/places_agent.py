@@ -1,56 +1,90 @@
-import httpx
+import hashlib
 import os
+import time
+import traceback
+import urllib.parse
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
+from agents.overpass_query import DensityEstimator, compile_places_query
+from agents.poi_index import PoiIndex
+from agents.place_records import PlaceRecord, parse_place
+from agents.ranking import CandidateList, RankingEngine, TopKAccumulator
+from agents.wikipedia_agent import WikipediaAgent
+from utils.cache import StaleWhileRevalidateCache
+from utils.cache_backend import CacheBackend
+from utils.http_client import UpstreamClients
+from utils.metrics import BRANCH_OUTCOMES, record_stage, span
+from utils.overpass_stream import OverpassStreamParser
+from utils.poi_store import PoiStore
+from utils.resilience import MirrorPool
+from utils.singleflight import SingleFlight
+from utils.spatial import haversine_distance, snap_to_cell
 
 load_dotenv()
 
+RANKING_ENGINE = RankingEngine()
+
 class PlacesAgent:
     BASE_URL = "https://overpass-api.de/api/interpreter"
-    WIKIPEDIA_API = "https://en.wikipedia.org/api/rest_v1/page/summary/"
+    # Interchangeable Overpass instances, tried healthiest first (comma-separated in OVERPASS_MIRRORS)
+    MIRRORS = [url.strip() for url in os.getenv("OVERPASS_MIRRORS", "").split(",") if url.strip()] or [
+        BASE_URL,
+        "https://overpass.kumi.systems/api/interpreter",
+    ]
+    # Until a mirror has a measured p95, hedge to the next one after this long
+    HEDGE_DELAY = 8.0
 
-    @staticmethod
-    async def get_wikipedia_description(place_name: str, location: str = "") -> Optional[str]:
+    # Overpass results for an area change rarely: serve them fresh for an hour,
+    # then stale (while refreshing in the background) for up to a day
+    PLACES_CACHE_TTL = 3600
+    PLACES_CACHE_STALE_TTL = 24 * 3600
+    PLACES_CACHE_SIZE = 256
+
+    # "category": one Overpass query per category filter.
+    # "union": one query for every category per area, filtered in-process, so
+    # switching categories for an area already fetched costs no network call.
+    FETCH_MODE = os.getenv("PLACES_FETCH_MODE", "category")
+    # "fixed": one search over the whole radius.
+    # "adaptive": search outward in rings (RING_RADII, up to the requested
+    # radius) and stop once a ring brings the total to ENOUGH_GOOD_CANDIDATES
+    # with a place-only score of at least GOOD_STATIC_SCORE. Dense cities are
+    # answered from the inner rings; sparse areas still get the full radius.
+    SEARCH_MODE = os.getenv("PLACES_SEARCH_MODE", "fixed")
+    RING_RADII = (3000, 8000, 15000, 30000)
+    GOOD_STATIC_SCORE = 2
+    ENOUGH_GOOD_CANDIDATES = 25
+
+    # Most elements one Overpass query returns
+    RESULT_LIMIT = 500
+    # The union query covers busy tags like restaurants, so allow more results
+    # than a per-category query
+    UNION_RESULT_LIMIT = 3000
+
+    def __init__(self, http: Optional[UpstreamClients] = None, places_cache: Optional[StaleWhileRevalidateCache] = None, fetch_mode: Optional[str] = None, wikipedia_agent: Optional[WikipediaAgent] = None, poi_store: Optional[PoiStore] = None, search_mode: Optional[str] = None, shared_cache: Optional[CacheBackend] = None):
+        self.http = http or UpstreamClients()
+        # Tier shared with the other workers, consulted before Overpass
+        self.shared_cache = shared_cache
+        # Local extract (POI_STORE_PATH) answering searches it covers without Overpass
+        self.poi_store = poi_store if poi_store is not None else PoiStore.from_env()
+        self.wikipedia_agent = wikipedia_agent or WikipediaAgent(self.http)
+        self.fetch_mode = fetch_mode or self.FETCH_MODE
+        self.search_mode = search_mode or self.SEARCH_MODE
+        self.places_cache = places_cache or StaleWhileRevalidateCache(
+            max_size=self.PLACES_CACHE_SIZE,
+            ttl=self.PLACES_CACHE_TTL,
+            stale_ttl=self.PLACES_CACHE_STALE_TTL,
+        )
+        # Concurrent identical Overpass requests share one upstream call
+        self.overpass_inflight = SingleFlight("overpass")
+        self.mirrors = MirrorPool(self.MIRRORS, self.http.health, default_hedge_delay=self.HEDGE_DELAY)
+        # Shrinks the search radius in areas dense enough to hit the result cap
+        self.density = DensityEstimator()
+
+    async def get_wikipedia_description(self, place_name: str, location: str = "") -> Optional[str]:
         """
         Fetch description from Wikipedia API with multiple search strategies.
         """
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                # Try multiple search strategies
-                search_terms = [
-                    place_name.replace(" ", "_"),
-                    f"{place_name.replace(' ', '_')},_{location.replace(' ', '_')}" if location else None,
-                    place_name.replace(" ", "_").replace(",", "")
-                ]
-                
-                for search_term in search_terms:
-                    if not search_term:
-                        continue
-                        
-                    try:
-                        response = await client.get(f"{PlacesAgent.WIKIPEDIA_API}{search_term}")
-                        
-                        if response.status_code == 200:
-                            data = response.json()
-                            extract = data.get("extract", "")
-                            # Return first 3-4 complete sentences
-                            if extract and len(extract) > 30:  # Ensure meaningful content
-                                # Split by '. ' and keep sentences complete
-                                sentences = extract.split(". ")
-                                # Take 3-4 sentences and ensure we end with a period
-                                num_sentences = min(4, len(sentences))
-                                description = ". ".join(sentences[:num_sentences])
-                                # Add final period if not present
-                                if not description.endswith("."):
-                                    description += "."
-                                return description if len(description) > 30 else None
-                    except:
-                        continue
-                        
-                return None
-        except Exception as e:
-            print(f"Wikipedia API error for {place_name}: {e}")
-            return None
+        return await self.wikipedia_agent.describe(place_name, location)
 
     @staticmethod
     def generate_fallback_description(place_name: str, category: str) -> str:
@@ -63,19 +97,9 @@ class PlacesAgent:
     @staticmethod
     def _haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Calculate distance between two points in km"""
-        import math
-        R = 6371  # Earth radius in km
-        
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = math.sin(dlat/2) * math.sin(dlat/2) + \
-            math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
-            math.sin(dlon/2) * math.sin(dlon/2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        return R * c
+        return haversine_distance(lat1, lon1, lat2, lon2)
 
-    @staticmethod
-    async def get_places(lat: float, lon: float, location_name: str = "", radius: int = 30000, category_filter: str = "all") -> List[Dict[str, Any]]:
+    async def get_places(self, lat: float, lon: float, location_name: str = "", radius: int = 30000, category_filter: str = "all") -> List[Dict[str, Any]]:
         """
         Fetch tourist attractions near a given location using Overpass API (OSM).
         Returns detailed information including coordinates, category, and description.
@@ -87,158 +111,266 @@ class PlacesAgent:
             radius: Search radius in meters (default: 30km)
             category_filter: Category to filter by (all, attractions, food, shopping, entertainment, historic, nature)
         """
-        # Import category mappings
+        if self.poi_store is not None and self.poi_store.covers(lat, lon, radius):
+            try:
+                with span("poi_store"):
+                    candidates = self.poi_store.query(lat, lon, radius, self._category_tags(category_filter))
+                return self._rank_places(candidates, lat, lon, location_name)
+            except Exception as e:
+                print(f"POI store query failed, falling back to Overpass: {e}")
+
+        if self.search_mode == "adaptive":
+            try:
+                candidates = await self._search_rings(lat, lon, radius, category_filter)
+            except Exception as e:
+                return self._search_failed(e)
+            return self._rank_places(candidates, lat, lon, location_name)
+
+        union = self.fetch_mode == "union"
+        category_tags = self._category_tags(category_filter)
+        if union:
+            radius = self.density.radius_for(lat, lon, radius, self.UNION_RESULT_LIMIT, self._union_tags())
+        else:
+            radius = self.density.radius_for(lat, lon, radius, self.RESULT_LIMIT, category_tags)
+
+        # Nearby coordinates (e.g. two geocodes of the same city) share a
+        # geohash cell, and the Overpass query is issued around the cell center
+        cell, cell_lat, cell_lon = snap_to_cell(lat, lon, radius)
+
+        async def fetch(query: str, tags: List[tuple], limit: int) -> List[PlaceRecord]:
+            candidates = await self._fetch_candidates(query)
+            self.density.observe(cell_lat, cell_lon, radius, len(candidates), limit, tags)
+            return candidates
+
+        async def fetch_index() -> PoiIndex:
+            query = self._build_union_query(cell_lat, cell_lon, radius)
+            candidates = await fetch(query, self._union_tags(), self.UNION_RESULT_LIMIT)
+            return PoiIndex(candidates, complete=len(candidates) < self.UNION_RESULT_LIMIT)
+
+        async def fetch_category() -> List[PlaceRecord]:
+            key = (cell, radius, category_filter)
+            return await self.places_cache.get_or_fetch(
+                key,
+                lambda: self.overpass_inflight.do(
+                    key, lambda: fetch(self._build_query(cell_lat, cell_lon, radius, category_filter), category_tags, self.RESULT_LIMIT)
+                ),
+            )
+
+        try:
+            if union:
+                # One fetch of every category per area; filters are applied locally
+                key = (cell, radius, "*")
+                index = await self.places_cache.get_or_fetch(
+                    key,
+                    lambda: self.overpass_inflight.do(key, fetch_index),
+                )
+                if index.complete:
+                    candidates = index.filter(category_filter)
+                else:
+                    # Truncated by the result cap: the category's own query ranks correctly
+                    candidates = await fetch_category()
+            else:
+                candidates = await fetch_category()
+        except Exception as e:
+            return self._search_failed(e)
+
+        return self._rank_places(candidates, lat, lon, location_name)
+
+    @staticmethod
+    def _search_failed(e: Exception) -> List[Dict[str, Any]]:
+        """
+        Log a failed search and report it as "no places". Counted as a places
+        branch error, since the branch itself only sees an empty result.
+        """
+        traceback.print_exc()
+        print(f"Error fetching places: {e}")
+        BRANCH_OUTCOMES.inc(branch="places", outcome="error")
+        return []
+
+    async def _search_rings(self, lat: float, lon: float, radius: int, category_filter: str) -> List[PlaceRecord]:
+        """
+        Fetch candidates ring by ring, from the center outwards, until enough
+        good ones are found. Each ring only transfers elements outside the
+        previous one, and is cached on its own, so a later search in the
+        same area reuses the inner rings and only fetches the new ones.
+        """
+        union = self.fetch_mode == "union"
+        # Small cells: the rings must be centered close to the searched point
+        cell, cell_lat, cell_lon = snap_to_cell(lat, lon, self.RING_RADII[0])
+
+        candidates = CandidateList()
+        good = 0
+        inner = 0
+        for outer in [r for r in self.RING_RADII if r < radius] + [radius]:
+            if union:
+                key = ("ring", cell, inner, outer, "*")
+
+                async def fetch_ring(inner=inner, outer=outer) -> PoiIndex:
+                    query = self._build_union_query(cell_lat, cell_lon, outer, inner)
+                    ring = await self._fetch_candidates(query)
+                    return PoiIndex(ring, complete=len(ring) < self.UNION_RESULT_LIMIT)
+
+                index = await self.places_cache.get_or_fetch(key, lambda key=key, fetch_ring=fetch_ring: self.overpass_inflight.do(key, fetch_ring))
+            if union and index.complete:
+                ring = index.filter(category_filter)
+            else:
+                # Per-category ring (also when the union ring hit its result cap)
+                key = ("ring", cell, inner, outer, category_filter)
+
+                async def fetch_ring(inner=inner, outer=outer) -> List[PlaceRecord]:
+                    return await self._fetch_candidates(self._build_query(cell_lat, cell_lon, outer, category_filter, inner))
+
+                ring = await self.places_cache.get_or_fetch(key, lambda key=key, fetch_ring=fetch_ring: self.overpass_inflight.do(key, fetch_ring))
+
+            candidates.extend(ring)
+            good += sum(1 for record in ring if record.static_score >= self.GOOD_STATIC_SCORE)
+            if good >= self.ENOUGH_GOOD_CANDIDATES:
+                break
+            inner = outer
+        return candidates
+
+    @staticmethod
+    def _category_tags(category_filter: str) -> List[tuple]:
+        try:
+            from features.categories import get_category_tags
+        except ImportError:
+            return [("tourism", "attraction")]
+        return get_category_tags(category_filter)
+
+    @staticmethod
+    def _union_tags() -> List[tuple]:
+        """Tags of every category plus the default set."""
         try:
-            from features.categories import CATEGORY_MAPPINGS
+            from features.categories import get_all_category_tags
         except ImportError:
-            # Fallback if features module not available
-            CATEGORY_MAPPINGS = {"all": None}
+            return [("tourism", "attraction")]
+        return get_all_category_tags()
+
+    @staticmethod
+    def _build_query(lat: float, lon: float, radius: int, category_filter: str, inner_radius: int = 0) -> str:
+        """
+        Build the Overpass QL query for a category filter (within a ring if inner_radius is set).
+        """
+        return compile_places_query(PlacesAgent._category_tags(category_filter), lat, lon, radius, PlacesAgent.RESULT_LIMIT, inner_radius)
+
+    @staticmethod
+    def _build_union_query(lat: float, lon: float, radius: int, inner_radius: int = 0) -> str:
+        """
+        Build one Overpass QL query covering the tags of every category plus the default set.
+        """
+        return compile_places_query(PlacesAgent._union_tags(), lat, lon, radius, PlacesAgent.UNION_RESULT_LIMIT, inner_radius)
+
+    async def _fetch_candidates(self, query: str) -> List[PlaceRecord]:
+        """
+        Run an Overpass query and parse named elements into compact place records.
+        The response is parsed incrementally as it arrives, so the full JSON
+        document is never held in memory. The query goes to the healthiest
+        mirror, hedged to the next one if it is slower than usual.
+        Raises on upstream errors so that failures are never cached.
+        Results are shared with the other workers, keyed by the query text.
+        """
+        shared_key = "overpass:" + hashlib.sha1(query.encode("utf-8")).hexdigest()
+        if self.shared_cache is not None:
+            hit, rows = await self.shared_cache.get_json(shared_key)
+            if hit:
+                return CandidateList(PlaceRecord(*row) for row in rows)
+
+        candidates = await self.mirrors.call(lambda url: self._fetch_candidates_from(url, query))
+        if self.shared_cache is not None:
+            # Records are tuples, stored as JSON arrays
+            await self.shared_cache.set_json(shared_key, candidates, self.PLACES_CACHE_TTL)
+        return candidates
+
+    async def _fetch_candidates_from(self, url: str, query: str) -> List[PlaceRecord]:
+        parser = OverpassStreamParser()
+        candidates = CandidateList()
+        # Parsing is interleaved with the download: time it separately
+        parse_time = 0.0
+        with span("overpass_fetch"):
+            async with self.http.stream("overpass", "GET", url, params={"data": query}) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes():
+                    started = time.perf_counter()
+                    for element in parser.feed(chunk):
+                        record = parse_place(element)
+                        if record is not None:
+                            candidates.append(record)
+                    parse_time += time.perf_counter() - started
+            parser.close()
+        record_stage("overpass_parse", parse_time)
+        return candidates
+
+    @staticmethod
+    def _rank_places(candidates: List[PlaceRecord], lat: float, lon: float, location_name: str = "", limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Score candidates against the search center and return the top places.
+        """
+        with span("scoring"):
+            if RankingEngine.available:
+                top = [candidates[i] for i in RANKING_ENGINE.top_k(candidates, lat, lon, limit)]
+            else:
+                accumulator = TopKAccumulator(lat, lon, limit)
+                for record in candidates:
+                    accumulator.add(record)
+                top = accumulator.result()
         
-        # Build Overpass QL query based on category filter
-        if category_filter == "all" or category_filter not in CATEGORY_MAPPINGS:
-            # Default query - Expanded to include parks, castles, and peaks
-            query = f"""
-            [out:json];
-            (
-              node["tourism"="attraction"](around:{radius},{lat},{lon});
-              way["tourism"="attraction"](around:{radius},{lat},{lon});
-              relation["tourism"="attraction"](around:{radius},{lat},{lon});
-              
-              node["tourism"="museum"](around:{radius},{lat},{lon});
-              way["tourism"="museum"](around:{radius},{lat},{lon});
-              
-              node["historic"="monument"](around:{radius},{lat},{lon});
-              way["historic"="monument"](around:{radius},{lat},{lon});
-              
-              node["historic"="castle"](around:{radius},{lat},{lon});
-              way["historic"="castle"](around:{radius},{lat},{lon});
-              
-              node["leisure"="park"](around:{radius},{lat},{lon});
-              way["leisure"="park"](around:{radius},{lat},{lon});
-              relation["leisure"="park"](around:{radius},{lat},{lon});
-              
-              node["leisure"="garden"](around:{radius},{lat},{lon});
-              way["leisure"="garden"](around:{radius},{lat},{lon});
-              
-              node["natural"="peak"](around:{radius},{lat},{lon});
-            );
-            out center 500;
-            """
-        else:
-            # Build query for specific category
-            category_tags = CATEGORY_MAPPINGS[category_filter]
-            query_parts = []
+        # Add Google Maps link to the top places
+        final_places = []
+        
+        for place in top:
+            # Generate Google Maps link
+            # Use name + location for better UX (shows name in search bar instead of coordinates)
+            query_string = f"{place.name}"
+            if location_name:
+                query_string += f", {location_name}"
             
-            for key, value in category_tags:
-                query_parts.append(f'  node["{key}"="{value}"](around:{radius},{lat},{lon});')
-                query_parts.append(f'  way["{key}"="{value}"](around:{radius},{lat},{lon});')
-                query_parts.append(f'  relation["{key}"="{value}"](around:{radius},{lat},{lon});')
+            encoded_query = urllib.parse.quote(query_string)
+            maps_link = f"https://www.google.com/maps/search/?api=1&query={encoded_query}"
             
-            query = f"""
-            [out:json];
-            (
-{chr(10).join(query_parts)}
-            );
-            out center 500;
-            """
+            place_data = {
+                "name": place.name,
+                "lat": place.lat,
+                "lon": place.lon,
+                "category": place.category_formatted,
+                "description": None,
+                "maps_link": maps_link,
+                # OSM references used to enrich the place with a Wikipedia description
+                "wikipedia": place.tags.get("wikipedia"),
+                "wikidata": place.tags.get("wikidata")
+            }
+            final_places.append(place_data)
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.get(PlacesAgent.BASE_URL, params={"data": query})
-                response.raise_for_status()
-                data = response.json()
-                
-                valid_places_data = []
-                category_counts = {}
-                
-                # First pass: Collect data and count categories for rarity score
-                for element in data.get("elements", []):
-                    tags = element.get("tags", {})
-                    name = tags.get("name")
-                    
-                    if name:
-                        # Get coordinates
-                        if "lat" in element and "lon" in element:
-                            place_lat, place_lon = element["lat"], element["lon"]
-                        elif "center" in element:
-                            place_lat, place_lon = element["center"]["lat"], element["center"]["lon"]
-                        else:
-                            continue
-                        
-                        # Determine category
-                        category = tags.get("tourism") or tags.get("historic") or tags.get("amenity") or tags.get("shop") or tags.get("leisure") or tags.get("natural") or "attraction"
-                        category_formatted = category.replace("_", " ").title()
-                        
-                        # Update counts for rarity heuristic
-                        category_counts[category] = category_counts.get(category, 0) + 1
-                        
-                        valid_places_data.append({
-                            "element": element,
-                            "name": name,
-                            "lat": place_lat,
-                            "lon": place_lon,
-                            "category": category,
-                            "category_formatted": category_formatted,
-                            "tags": tags
-                        })
-                
-                places = []
-                for p in valid_places_data:
-                    # Calculate basic popularity score
-                    popularity_score = PlacesAgent._calculate_popularity_score(
-                        p["tags"], 
-                        p["name"], 
-                        p["lat"], 
-                        p["lon"], 
-                        lat, 
-                        lon, 
-                        p["category"], 
-                        category_counts
-                    )
-                    
-                    places.append({
-                        "name": p["name"],
-                        "lat": p["lat"],
-                        "lon": p["lon"],
-                        "category": p["category_formatted"],
-                        "description": None,
-                        "popularity_score": popularity_score
-                    })
-                
-                # Sort by popularity score (highest first)
-                places.sort(key=lambda x: x["popularity_score"], reverse=True)
-                
-                # Remove popularity_score from final output and return top 5
-                # Also add Google Maps link
-                final_places = []
-                import urllib.parse
-                
-                for place in places[:5]:
-                    # Generate Google Maps link
-                    # Use name + location for better UX (shows name in search bar instead of coordinates)
-                    query_string = f"{place['name']}"
-                    if location_name:
-                        query_string += f", {location_name}"
-                    
-                    encoded_query = urllib.parse.quote(query_string)
-                    maps_link = f"https://www.google.com/maps/search/?api=1&query={encoded_query}"
-                    
-                    place_data = {
-                        "name": place["name"],
-                        "lat": place["lat"],
-                        "lon": place["lon"],
-                        "category": place["category"],
-                        "description": place["description"],
-                        "maps_link": maps_link
-                    }
-                    final_places.append(place_data)
-                
-                return final_places
-            except Exception as e:
-                import traceback
-                traceback.print_exc()
-                print(f"Error fetching places: {e}")
-                return []
+        return final_places
+
+    @staticmethod
+    def _select_top_places(candidates: List[PlaceRecord], lat: float, lon: float, limit: int = 5) -> List[PlaceRecord]:
+        """
+        Reference per-place implementation of the ranking, the baseline that
+        RankingEngine and TopKAccumulator are benchmarked against.
+        """
+        # First pass: count categories for rarity score
+        category_counts = {}
+        for p in candidates:
+            category_counts[p.category] = category_counts.get(p.category, 0) + 1
+        
+        scored = []
+        for p in candidates:
+            # Calculate basic popularity score
+            popularity_score = PlacesAgent._calculate_popularity_score(
+                p.tags, 
+                p.name, 
+                p.lat, 
+                p.lon, 
+                lat, 
+                lon, 
+                p.category, 
+                category_counts
+            )
+            scored.append((popularity_score, p))
+        
+        # Sort by popularity score (highest first)
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [p for _, p in scored[:limit]]
 
     @staticmethod
     def _calculate_popularity_score(tags: dict, name: str, lat: float, lon: float, search_lat: float, search_lon: float, category: str, category_counts: dict) -> float:
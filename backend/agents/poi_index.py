@@ -0,0 +1,58 @@
+"""
+Per-area index of points of interest.
+
+Built once from an "all categories" Overpass fetch, then answers any
+category filter in-process instead of issuing a new Overpass query.
+A fetch that hit the query's result cap holds an arbitrary slice of the
+area (Overpass returns nodes before ways and relations), so such an index
+is marked incomplete and must not stand in for per-category queries.
+"""
+from collections import defaultdict
+from typing import Dict, List, Tuple
+from agents.place_records import PlaceRecord
+from agents.ranking import CandidateList
+
+try:
+    from features.categories import get_all_category_tags, get_category_tags
+except ImportError:
+    # Fallback if features module not available
+    get_all_category_tags = get_category_tags = None
+
+Tag = Tuple[str, str]
+
+
+class PoiIndex:
+    """Candidate places of one area, indexed by their (key, value) OSM tags."""
+
+    def __init__(self, candidates: List[PlaceRecord], complete: bool = True):
+        self.candidates = candidates
+        # False when the fetch was truncated by the result cap
+        self.complete = complete
+        indexed_keys = {key for key, _ in get_all_category_tags()} if get_all_category_tags else set()
+        self._by_tag: Dict[Tag, List[int]] = defaultdict(list)
+        for i, candidate in enumerate(candidates):
+            tags = candidate.tags
+            for key in indexed_keys:
+                value = tags.get(key)
+                if value:
+                    self._by_tag[(key, value)].append(i)
+        self._filtered: Dict[str, List[PlaceRecord]] = {}
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def filter(self, category_filter: str) -> List[PlaceRecord]:
+        """
+        Return the candidates an Overpass query for this category would have
+        returned, keeping the original response order so ranking ties break
+        the same way.
+        """
+        if category_filter not in self._filtered:
+            if get_category_tags is None:
+                self._filtered[category_filter] = self.candidates
+            else:
+                positions = set()
+                for tag in get_category_tags(category_filter):
+                    positions.update(self._by_tag.get(tag, ()))
+                self._filtered[category_filter] = CandidateList(self.candidates[i] for i in sorted(positions))
+        return self._filtered[category_filter]
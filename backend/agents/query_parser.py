@@ -0,0 +1,127 @@
+"""
+Single-pass query understanding for the Orchestrator.
+
+One precompiled scanner finds every intent / noise keyword occurrence in
+the query, and intent, matched keywords and the cleaned location span are
+all derived from that one scan. Results are memoized, since most traffic
+repeats a few hundred phrasings.
+
+Answers are identical to Orchestrator._determine_intent and
+Orchestrator._extract_location (see benchmarks/bench_query_parser.py).
+"""
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+WEATHER_KEYWORDS = ("weather", "temperature", "rain", "forecast", "hot", "cold")
+PLACES_KEYWORDS = ("places", "visit", "sightseeing", "tourist", "attractions", "plan my trip", "go to")
+# Removed before location extraction, e.g. "Bangalore temperature" -> "Bangalore"
+LOCATION_NOISE_KEYWORDS = ("weather", "temperature", "temp", "forecast", "rain", "hot", "cold", "climate")
+
+_WEATHER = frozenset(WEATHER_KEYWORDS)
+_PLACES = frozenset(PLACES_KEYWORDS)
+_NOISE = frozenset(LOCATION_NOISE_KEYWORDS)
+
+# A zero-width lookahead reports a match at every position, so overlapping
+# occurrences are all found (the same as substring checks). Longest keywords
+# first, so "temperature" wins over "temp" at the same position.
+_ALL_KEYWORDS = sorted(_WEATHER | _PLACES | _NOISE, key=len, reverse=True)
+_SCANNER = re.compile("(?=(" + "|".join(re.escape(keyword) for keyword in _ALL_KEYWORDS) + "))")
+
+# PRIORITIZE "in", "at", "near" to avoid capturing "to do in paris" as "do in paris"
+_LOCATION_PATTERNS = (
+    re.compile(r"(?:in|at|near|from)\s+([a-zA-Z\s]+)"),
+    re.compile(r"(?:to|visit|for|about)\s+(?!go\b|do\b)([a-zA-Z\s]+)"),
+)
+_STOPWORDS = frozenset(["please", "now", "today", "tomorrow", "me", "us"])
+_GREETINGS = frozenset(["hi", "hello", "hey", ""])
+_NON_LOCATION_WORDS = frozenset(["i", "i'm", "what", "where", "how", "let's", "the", "a"])
+
+
+class ParsedQuery(NamedTuple):
+    intent: str
+    location: Optional[str]
+    keywords: Tuple[str, ...]
+
+
+def _is_word_char(char: str) -> bool:
+    # Same definition as \w for str patterns
+    return char.isalnum() or char == "_"
+
+
+@lru_cache(maxsize=4096)
+def parse_query(text: str) -> ParsedQuery:
+    """Extract intent, location and matched keywords from a user query."""
+    text_clean = text.lower().strip()
+
+    keywords = []
+    has_weather = has_places = False
+    # Pieces of text_clean kept after dropping whole-word noise keywords
+    kept = []
+    kept_from = 0
+    for match in _SCANNER.finditer(text_clean):
+        keyword = match.group(1)
+        keywords.append(keyword)
+        if keyword in _WEATHER:
+            has_weather = True
+        elif keyword in _PLACES:
+            has_places = True
+
+        if keyword in _NOISE:
+            start = match.start()
+            end = start + len(keyword)
+            if (start == 0 or not _is_word_char(text_clean[start - 1])) and \
+                    (end == len(text_clean) or not _is_word_char(text_clean[end])):
+                kept.append(text_clean[kept_from:start])
+                kept_from = end
+    kept.append(text_clean[kept_from:])
+
+    if has_weather and has_places:
+        intent = "both"
+    elif has_weather:
+        intent = "weather"
+    elif has_places:
+        intent = "places"
+    else:
+        intent = "unknown"
+
+    return ParsedQuery(intent, _find_location(text, "".join(kept).strip()), tuple(keywords))
+
+
+def _find_location(text: str, text_clean: str) -> Optional[str]:
+    # 1. Direct match for common patterns: "in [loc]", "at [loc]", "to [loc]", "near [loc]"
+    for pattern in _LOCATION_PATTERNS:
+        match = pattern.search(text_clean)
+        if match:
+            candidate = match.group(1).strip()
+            if candidate not in _STOPWORDS:
+                return candidate.title()
+
+    # 2. Fallback: a short input is likely just a place name
+    if len(text_clean.split()) <= 3 and text_clean not in _GREETINGS:
+        return text_clean.title()
+
+    # 3. Fallback: capitalized words in the original text
+    capitalized_words = []
+    for word in text.split():
+        clean_word = word.strip("?.!,")
+        if clean_word.lower() in _NOISE:
+            continue
+        if clean_word and clean_word[0].isupper() and clean_word.lower() not in _NON_LOCATION_WORDS:
+            capitalized_words.append(clean_word)
+
+    if capitalized_words:
+        return " ".join(capitalized_words)
+
+    return None
+
+
+class QueryParser:
+    """Thin wrapper so the parser can be injected into the Orchestrator."""
+
+    def parse(self, text: str) -> ParsedQuery:
+        return parse_query(text)
+
+    @staticmethod
+    def cache_info():
+        return parse_query.cache_info()
@@ -0,0 +1,95 @@
+"""
+Per-query dependency graph for the Orchestrator.
+
+A query is broken into branches (geocode -> weather / places -> enrichment).
+Branches whose dependencies are satisfied run concurrently, each under its
+own deadline, so wall-clock time tracks the slowest branch instead of the sum.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Tuple
+
+from utils.deadline import remaining
+from utils.metrics import BRANCH_OUTCOMES, span
+
+
+@dataclass
+class Branch:
+    """One unit of work in a query plan."""
+    name: str
+    # Called with the results of the branches listed in depends_on
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+    deadline: float
+    depends_on: Tuple[str, ...] = ()
+
+
+def _stage(name: str) -> str:
+    # Batch plans number their branches ("places:3"): one stage per kind
+    return name.split(":", 1)[0]
+
+
+async def _run_with_deadline(branch: Branch, inputs: Dict[str, Any]) -> Any:
+    stage = _stage(branch.name)
+    # The branch's own deadline, or less if the request's deadline comes first
+    timeout = remaining(branch.deadline)
+    try:
+        with span(stage):
+            result = await asyncio.wait_for(branch.run(inputs), timeout=timeout)
+    except asyncio.TimeoutError:
+        BRANCH_OUTCOMES.inc(branch=stage, outcome="timeout")
+        print(f"Branch '{branch.name}' missed its {timeout:.1f}s deadline")
+        return None
+    except Exception as e:
+        BRANCH_OUTCOMES.inc(branch=stage, outcome="error")
+        print(f"Branch '{branch.name}' failed: {e}")
+        return None
+    BRANCH_OUTCOMES.inc(branch=stage, outcome="ok" if result else "empty")
+    return result
+
+
+async def run_branches(branches: List[Branch]) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Execute a plan, yielding (branch name, result) as each branch settles.
+
+    A branch that fails or misses its deadline yields None, and any branch
+    depending on it is skipped (also yielding None) rather than blocking
+    the rest of the response.
+    """
+    waiting = {branch.name: branch for branch in branches}
+    results: Dict[str, Any] = {}
+    running: Dict[asyncio.Task, str] = {}
+
+    try:
+        while waiting or running:
+            # Launch (or skip) every branch whose dependencies have settled
+            launched = True
+            while launched:
+                launched = False
+                for name, branch in list(waiting.items()):
+                    if not all(dep in results for dep in branch.depends_on):
+                        continue
+                    del waiting[name]
+                    launched = True
+                    if any(results[dep] is None for dep in branch.depends_on):
+                        BRANCH_OUTCOMES.inc(branch=_stage(name), outcome="skipped")
+                        results[name] = None
+                        yield name, None
+                        continue
+                    inputs = {dep: results[dep] for dep in branch.depends_on}
+                    running[asyncio.create_task(_run_with_deadline(branch, inputs))] = name
+
+            if not running:
+                # Remaining branches depend on something that is not in the plan
+                for name in waiting:
+                    yield name, None
+                return
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = running.pop(task)
+                results[name] = task.result()
+                yield name, results[name]
+    finally:
+        # Consumer stopped early (e.g. client disconnected): don't leak work
+        for task in running:
+            task.cancel()
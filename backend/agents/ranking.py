@@ -0,0 +1,216 @@
+"""
+Vectorized popularity ranking for PlacesAgent.
+
+Converts candidate places into columnar NumPy arrays in a single pass and
+computes the same heuristic as PlacesAgent._calculate_popularity_score for
+all of them at once. Without NumPy, TopKAccumulator computes the same
+ranking with bounded per-category heaps.
+"""
+import re
+import heapq
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from utils.spatial import EARTH_RADIUS_KM, haversine_distance
+
+if TYPE_CHECKING:
+    from agents.place_records import PlaceRecord
+
+NAME_KEYWORDS = ["Palace", "Museum", "Park", "Fort", "Temple", "Plaza", "Square", "Tower", "National", "Lake", "Aquarium", "Zoo", "Beach", "Gate", "Bridge", "Cathedral", "Basilica", "Market", "Garden", "Hills"]
+METADATA_KEYS = ["opening_hours", "wheelchair", "website", "wikipedia", "ticket_price", "tourism", "phone", "email", "addr:street", "image"]
+
+# One scan per name instead of one lowercase + substring check per keyword
+_KEYWORD_PATTERN = re.compile("|".join(re.escape(keyword.lower()) for keyword in NAME_KEYWORDS))
+
+_TOP_TIER_HISTORIC = {"monument", "castle", "ruins", "memorial"}
+_SECOND_TIER_TOURISM = {"theme_park", "zoo", "aquarium", "viewpoint"}
+_SECOND_TIER_LEISURE = {"park", "garden"}
+_THIRD_TIER_AMENITY = {"restaurant", "cafe", "marketplace"}
+
+
+def category_weight(tags: Dict[str, str]) -> int:
+    """Heuristic 1: heritage/museum/historic +3, entertainment/nature +2, shopping/food +1."""
+    if tags.get("heritage") or tags.get("unesco") or tags.get("tourism", "") == "museum" or tags.get("historic", "") in _TOP_TIER_HISTORIC:
+        return 3
+    if tags.get("tourism", "") in _SECOND_TIER_TOURISM or tags.get("leisure", "") in _SECOND_TIER_LEISURE or tags.get("natural", ""):
+        return 2
+    if tags.get("shop", "") or tags.get("amenity", "") in _THIRD_TIER_AMENITY:
+        return 1
+    return 0
+
+
+def name_has_keyword(name: str) -> bool:
+    return _KEYWORD_PATTERN.search(name.lower()) is not None
+
+
+def metadata_count(tags: Dict[str, str]) -> int:
+    return sum(1 for key in METADATA_KEYS if key in tags)
+
+
+class CandidateList(list):
+    """
+    A list of candidates that keeps its columnar form, so cached candidate
+    sets (places cache, POI index) are only converted once.
+    """
+    columns: Optional[Dict[str, Any]] = None
+
+
+class RankingEngine:
+    """Scores and selects the top candidates of a search in one vectorized pass."""
+
+    available = np is not None
+
+    @staticmethod
+    def to_columns(candidates: List["PlaceRecord"]) -> Dict[str, Any]:
+        """
+        Convert candidate records into columnar arrays. This is the only
+        per-candidate Python loop; everything after it is vectorized.
+        """
+        if isinstance(candidates, CandidateList) and candidates.columns is not None:
+            return candidates.columns
+
+        n = len(candidates)
+        # Place-only heuristics were already computed when each record was parsed
+        columns = {
+            "lat": np.fromiter((c.lat for c in candidates), dtype=np.float64, count=n),
+            "lon": np.fromiter((c.lon for c in candidates), dtype=np.float64, count=n),
+            "static_score": np.fromiter((c.static_score for c in candidates), dtype=np.int8, count=n),
+            "metadata": np.fromiter((c.metadata_count for c in candidates), dtype=np.int8, count=n),
+        }
+        category_index: Dict[str, int] = {}
+        columns["category_ids"] = np.fromiter(
+            (category_index.setdefault(c.category, len(category_index)) for c in candidates), dtype=np.int32, count=n
+        )
+        if isinstance(candidates, CandidateList):
+            candidates.columns = columns
+        return columns
+
+    @staticmethod
+    def score_columns(columns: Dict[str, Any], search_lat: float, search_lon: float) -> "np.ndarray":
+        lat = columns["lat"]
+        lon = columns["lon"]
+
+        # 4. Proximity to search center: < 5km -> +2, 5-20km -> +1
+        dlat = np.radians(search_lat - lat)
+        dlon = np.radians(search_lon - lon)
+        a = np.sin(dlat / 2) * np.sin(dlat / 2) + \
+            np.cos(np.radians(lat)) * np.cos(np.radians(search_lat)) * \
+            np.sin(dlon / 2) * np.sin(dlon / 2)
+        dist = EARTH_RADIUS_KM * (2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a)))
+        proximity = np.where(dist < 5, 2, np.where(dist <= 20, 1, 0))
+
+        # 5. Feature richness in OSM metadata
+        metadata = columns["metadata"]
+        richness = np.where(metadata >= 5, 2, np.where(metadata >= 2, 1, 0))
+
+        # 6. Type frequency rarity: rare categories in the area score higher
+        category_ids = columns["category_ids"]
+        counts = np.bincount(category_ids)[category_ids] if len(category_ids) else category_ids
+        rarity = np.select([counts == 1, counts <= 5, counts <= 15], [3, 2, 1], default=0)
+
+        return columns["static_score"].astype(np.float64) + proximity + richness + rarity
+
+    def score(self, candidates: List["PlaceRecord"], search_lat: float, search_lon: float) -> "np.ndarray":
+        if not candidates:
+            return np.empty(0, dtype=np.float64)
+        return self.score_columns(self.to_columns(candidates), search_lat, search_lon)
+
+    def top_k(self, candidates: List["PlaceRecord"], search_lat: float, search_lon: float, k: int, scores: Optional["np.ndarray"] = None) -> List[int]:
+        """
+        Indices of the k best candidates, highest score first. Ties keep the
+        original candidate order, exactly like a stable descending sort.
+        """
+        n = len(candidates)
+        if n == 0 or k <= 0:
+            return []
+        if scores is None:
+            scores = self.score(candidates, search_lat, search_lon)
+
+        # Scores are small whole numbers, so fold the position into the key
+        # to make every key unique and break ties by original order
+        keys = scores.astype(np.int64) * n + (n - 1 - np.arange(n))
+        if k < n:
+            selected = np.argpartition(-keys, k - 1)[:k]
+        else:
+            selected = np.arange(n)
+        return selected[np.argsort(-keys[selected])].tolist()
+
+
+def proximity_score(dist: float) -> int:
+    """Heuristic 4: < 5km -> +2, 5-20km -> +1"""
+    if dist < 5:
+        return 2
+    if dist <= 20:
+        return 1
+    return 0
+
+
+def richness_score(count: int) -> int:
+    """Heuristic 5: feature richness in OSM metadata"""
+    if count >= 5:
+        return 2
+    if count >= 2:
+        return 1
+    return 0
+
+
+def rarity_score(count: int) -> int:
+    """Heuristic 6: rare categories in the area are likely more important"""
+    if count == 1:
+        return 3
+    if count <= 5:
+        return 2
+    if count <= 15:
+        return 1
+    return 0
+
+
+class TopKAccumulator:
+    """
+    Streaming top-k selection that never holds more than k records per category.
+
+    Every heuristic except rarity is known as soon as a record is seen, and
+    rarity is the same for all records of a category. So the overall top k
+    is always among the top k of each category by the other heuristics,
+    and only those need to be kept until the final category counts are known.
+    """
+
+    def __init__(self, search_lat: float, search_lon: float, k: int):
+        self.search_lat = search_lat
+        self.search_lon = search_lon
+        self.k = k
+        self.category_counts: Dict[str, int] = {}
+        # Min-heaps of (partial score, -sequence, record): the root is the
+        # weakest kept record, and among equal scores the latest one
+        self._heaps: Dict[str, List[Tuple[int, int, "PlaceRecord"]]] = {}
+        self._seen = 0
+
+    def add(self, record: "PlaceRecord") -> None:
+        seq = self._seen
+        self._seen += 1
+        self.category_counts[record.category] = self.category_counts.get(record.category, 0) + 1
+        if self.k <= 0:
+            return
+
+        dist = haversine_distance(record.lat, record.lon, self.search_lat, self.search_lon)
+        partial = record.static_score + proximity_score(dist) + richness_score(record.metadata_count)
+        heap = self._heaps.setdefault(record.category, [])
+        item = (partial, -seq, record)
+        if len(heap) < self.k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+
+    def result(self) -> List["PlaceRecord"]:
+        """The k best records, highest score first, ties in arrival order."""
+        finalists = []
+        for category, heap in self._heaps.items():
+            rarity = rarity_score(self.category_counts[category])
+            for partial, neg_seq, record in heap:
+                finalists.append((partial + rarity, neg_seq, record))
+        finalists.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [record for _, _, record in finalists[:self.k]]
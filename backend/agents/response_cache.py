@@ -0,0 +1,137 @@
+"""
+End-to-end cache of /chat answers.
+
+Answers are keyed by what the query means rather than how it is phrased:
+(intent, normalized location, category filter, descriptions on/off), so
+"Show me places in paris" and "places to visit in Paris" share an entry.
+Every part of an answer (the geocode and each query plan branch) keeps its
+own expiry. A fully fresh entry is returned as is; otherwise only the
+expired parts are recomputed and the fresh ones are reused. Each answer
+carries an ETag and the time until its first part expires, for the HTTP
+cache headers.
+"""
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from agents.query_parser import ParsedQuery
+from utils.cache import TTLCache
+from utils.geocode_cache import normalize_place_key
+from utils.serialization import dumps
+
+
+@dataclass
+class ChatAnswer:
+    """A /chat response body with what the HTTP layer needs to cache it."""
+    body: Dict[str, Any]
+    etag: str
+    # Seconds until the first part of the answer expires (0: not cacheable)
+    max_age: int = 0
+
+
+@dataclass
+class ResponseEntry:
+    # Plan branch name -> (result, monotonic expiry)
+    parts: Dict[str, Tuple[Any, float]] = field(default_factory=dict)
+    # Last complete answer; served as fresh only while every needed part is
+    answer: Optional[ChatAnswer] = None
+
+
+def compute_etag(body: Dict[str, Any]) -> str:
+    return '"' + hashlib.sha1(dumps(body, sort_keys=True)).hexdigest()[:20] + '"'
+
+
+class ResponseCache:
+    """Per-part expiring answers, keyed by normalized query."""
+
+    # Coordinates practically never change; current weather goes stale much
+    # sooner than the hourly forecast it comes from; place lists follow the
+    # places cache
+    PART_TTLS = {
+        "geocode": 24 * 3600,
+        "weather": 900,
+        "places": 3600,
+        "enrichment": 3600,
+    }
+
+    def __init__(self, max_size: int = 2048, enabled: bool = True):
+        self.enabled = enabled
+        # Entries live as long as their longest-lived part
+        self._entries = TTLCache(max_size=max_size, ttl=max(self.PART_TTLS.values()))
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+
+    def key(self, parsed: ParsedQuery, category_filter: str, preferences: Dict[str, Any]) -> Optional[Hashable]:
+        if not self.enabled or not parsed.location:
+            return None
+        location = normalize_place_key(parsed.location)
+        if not location:
+            return None
+        return (parsed.intent, location, category_filter, bool(preferences.get("include_descriptions")))
+
+    def lookup(self, key: Hashable, needed: Iterable[str]) -> Tuple[Optional[ChatAnswer], Dict[str, Any]]:
+        """
+        Return (answer, fresh parts): the stored answer if every needed part
+        is still fresh, otherwise None and the parts that can be reused.
+        """
+        hit, entry = self._entries.get(key)
+        if not hit:
+            self.misses += 1
+            return None, {}
+        now = time.monotonic()
+        fresh = {name: value for name, (value, expires_at) in entry.parts.items() if expires_at > now}
+        if entry.answer is not None and all(name in fresh for name in needed):
+            self.hits += 1
+            return ChatAnswer(entry.answer.body, entry.answer.etag, self._max_age(entry, needed, now)), fresh
+        if fresh:
+            self.partial_hits += 1
+        else:
+            self.misses += 1
+        return None, fresh
+
+    def peek(self, key: Hashable, needed: Iterable[str], stale: bool = False) -> Optional[ChatAnswer]:
+        """
+        The stored answer, without counting a lookup: if every needed part
+        is fresh or, with stale, however old (then with max_age 0).
+        """
+        hit, entry = self._entries.get(key)
+        if not hit or entry.answer is None:
+            return None
+        now = time.monotonic()
+        needed = list(needed)
+        if all(name in entry.parts and entry.parts[name][1] > now for name in needed):
+            return ChatAnswer(entry.answer.body, entry.answer.etag, self._max_age(entry, needed, now))
+        return ChatAnswer(entry.answer.body, entry.answer.etag) if stale else None
+
+    def store(self, key: Hashable, needed: Iterable[str], reused: Dict[str, Any], results: Dict[str, Any], body: Dict[str, Any]) -> ChatAnswer:
+        """
+        Record an answer built from reused parts (keeping their expiry) and
+        newly computed results. Failed or empty results are not cached, and
+        an answer missing any part is returned with max_age 0 (the previous
+        complete answer is kept, for peek(stale=True)).
+        """
+        hit, entry = self._entries.get(key)
+        if not hit:
+            entry = ResponseEntry()
+        now = time.monotonic()
+        for name, value in results.items():
+            if name in reused or not value:
+                continue
+            entry.parts[name] = (value, now + self.PART_TTLS.get(name, 0))
+
+        answer = ChatAnswer(body, compute_etag(body))
+        needed = list(needed)
+        if all(name in entry.parts and entry.parts[name][1] > now for name in needed):
+            entry.answer = answer
+            answer.max_age = self._max_age(entry, needed, now)
+        self._entries.set(key, entry)
+        return answer
+
+    @staticmethod
+    def _max_age(entry: ResponseEntry, needed: Iterable[str], now: float) -> int:
+        return max(0, int(min((entry.parts[name][1] - now for name in needed), default=0)))
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "partial_hits": self.partial_hits, "misses": self.misses, "size": len(self._entries)}
@@ -0,0 +1,112 @@
+"""
+Public shape of /chat responses.
+
+Agents keep what they need internally (OSM references for enrichment, the
+scoring inputs); responses carry only the fields clients render. The
+models below document that shape in the OpenAPI schema. Handlers return
+pre-serialized bodies, so they are not validated on every request.
+
+fields= projections select parts of a response by dotted path, applied
+through lists: "text,data.weather.current,data.places.name".
+"""
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel
+
+# Place keys sent to clients, in this order; None values are left out
+PLACE_FIELDS = ("name", "category", "lat", "lon", "maps_link", "description")
+
+
+class CurrentWeather(BaseModel):
+    temperature_2m: Optional[float] = None
+    precipitation: Optional[float] = None
+    weather_code: Optional[int] = None
+    wind_speed_10m: Optional[float] = None
+
+
+class DailyWeather(BaseModel):
+    # One value per forecast day, today first
+    temperature_2m_max: List[Optional[float]] = []
+    temperature_2m_min: List[Optional[float]] = []
+    precipitation_probability_max: List[Optional[int]] = []
+
+
+class Weather(BaseModel):
+    current: CurrentWeather
+    daily: DailyWeather
+
+
+class Place(BaseModel):
+    name: str
+    category: Optional[str] = None
+    lat: float
+    lon: float
+    maps_link: str
+    description: Optional[str] = None
+
+
+class ChatData(BaseModel):
+    location: Optional[str] = None
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    weather: Optional[Weather] = None
+    places: Optional[List[Place]] = None
+
+
+class ChatResponse(BaseModel):
+    text: str
+    data: ChatData
+
+
+class BatchError(BaseModel):
+    error: str
+
+
+class BatchResponse(BaseModel):
+    results: List[Union[ChatResponse, BatchError]]
+
+
+def public_places(places: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{key: place[key] for key in PLACE_FIELDS if place.get(key) is not None} for place in places]
+
+
+# Parsed projection: field name -> nested projection (None: the whole value)
+Projection = Dict[str, Optional["Projection"]]
+
+
+def parse_fields(spec: Optional[str]) -> Optional[Projection]:
+    """Parse "a.b,c" into {"a": {"b": None}, "c": None}; None/empty selects everything."""
+    if not spec:
+        return None
+    tree: Projection = {}
+    for path in spec.split(","):
+        names = [name.strip() for name in path.split(".") if name.strip()]
+        node = tree
+        for i, name in enumerate(names):
+            last = i == len(names) - 1
+            if name in node and node[name] is None:
+                # A shorter path already selects all of it
+                break
+            if last:
+                node[name] = None
+            else:
+                node = node.setdefault(name, {})
+    return tree or None
+
+
+def project(value: Any, projection: Optional[Projection]) -> Any:
+    """Keep the selected fields of value; lists are projected element by element."""
+    if projection is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, projection) for item in value]
+    if isinstance(value, dict):
+        return {name: project(value[name], sub) for name, sub in projection.items() if name in value}
+    return value
+
+
+def canonical_fields(projection: Optional[Projection]) -> str:
+    """Stable spelling of a projection, for cache keys and ETags."""
+    if projection is None:
+        return ""
+    return ",".join(name + ("(" + canonical_fields(sub) + ")" if sub is not None else "") for name, sub in sorted(projection.items()))
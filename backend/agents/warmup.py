@@ -0,0 +1,192 @@
+"""
+Cache warm-up for popular destinations.
+
+HotDestinations counts the locations /chat resolves (with decay, persisted
+across restarts). WarmupScheduler runs at startup and then periodically:
+for the configured plus most requested destinations it fills the geocode
+cache, refreshes weather for all of them in one multi-location request and
+loads their places (all categories, plus the category filters users
+actually asked for there), so hot queries are answered from memory.
+Upstream calls go through the shared clients and their rate limits, one
+search at a time, each awaited, leaving headroom for live traffic.
+"""
+import asyncio
+import json
+import os
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from utils.geocode_cache import normalize_place_key
+
+if TYPE_CHECKING:
+    from agents.orchestrator import Orchestrator
+
+DEFAULT_LOG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "destinations.json")
+
+
+class HotDestinations:
+    """Decaying request counts per destination, optionally persisted to JSON."""
+
+    # Applied once per warm-up cycle, so old popularity fades out over a day or so
+    DECAY = 0.98
+    MAX_TRACKED = 1000
+    # Below this a destination hasn't been asked for recently enough to warm
+    MIN_SCORE = 0.5
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        # normalized key -> [display name, score, {category filter: score}]
+        self._scores: Dict[str, List] = {}
+        if path:
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._scores = {key: list(value) for key, value in json.load(f).items()}
+            for entry in self._scores.values():
+                # Logs written before category filters were tracked
+                if len(entry) < 3:
+                    entry.append({})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Could not read destination log {self.path}: {e}")
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._scores, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not save destination log {self.path}: {e}")
+
+    def record(self, location: str, category_filter: Optional[str] = None) -> None:
+        """Count a request for location, and for its places category filter if it searched places."""
+        key = normalize_place_key(location)
+        if not key:
+            return
+        entry = self._scores.setdefault(key, [location, 0.0, {}])
+        entry[1] += 1.0
+        if category_filter:
+            entry[2][category_filter] = entry[2].get(category_filter, 0.0) + 1.0
+
+    def decay(self) -> None:
+        for entry in self._scores.values():
+            entry[1] *= self.DECAY
+            categories = entry[2]
+            for category in list(categories):
+                categories[category] *= self.DECAY
+                if categories[category] < self.MIN_SCORE:
+                    del categories[category]
+        if len(self._scores) > self.MAX_TRACKED:
+            ranked = sorted(self._scores.items(), key=lambda item: -item[1][1])
+            self._scores = dict(ranked[:self.MAX_TRACKED])
+
+    def top(self, n: int) -> List[str]:
+        ranked = sorted(self._scores.values(), key=lambda entry: -entry[1])
+        return [name for name, score, _ in ranked[:n] if score >= self.MIN_SCORE]
+
+    def categories(self, location: str) -> List[str]:
+        """Category filters recently used for location, "all" first and always included."""
+        entry = self._scores.get(normalize_place_key(location))
+        requested = sorted(entry[2], key=lambda category: -entry[2][category]) if entry else []
+        return ["all"] + [category for category in requested if category != "all"]
+
+
+class WarmupScheduler:
+    """Periodically prefetches everything /chat needs for hot destinations."""
+
+    def __init__(self, orchestrator: "Orchestrator", destinations: Optional[List[str]] = None, top_n: int = 20, interval: float = 1800.0, enabled: bool = True):
+        self.orchestrator = orchestrator
+        self.destinations = destinations or []
+        self.top_n = top_n
+        self.interval = interval
+        self.enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.last_warmed: List[str] = []
+
+    @classmethod
+    def from_env(cls, orchestrator: "Orchestrator") -> "WarmupScheduler":
+        """
+        WARMUP_ENABLED (default 1), WARMUP_DESTINATIONS (comma-separated,
+        always warmed), WARMUP_TOP_N learned destinations added on top, and
+        WARMUP_INTERVAL seconds between cycles.
+        """
+        destinations = [name.strip() for name in os.getenv("WARMUP_DESTINATIONS", "").split(",") if name.strip()]
+        return cls(
+            orchestrator,
+            destinations=destinations,
+            top_n=int(os.getenv("WARMUP_TOP_N", "20")),
+            interval=float(os.getenv("WARMUP_INTERVAL", "1800")),
+            enabled=os.getenv("WARMUP_ENABLED", "1") != "0",
+        )
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.orchestrator.hot_destinations.save()
+
+    def targets(self) -> List[str]:
+        names = list(self.destinations)
+        seen = {normalize_place_key(name) for name in names}
+        for name in self.orchestrator.hot_destinations.top(self.top_n):
+            if normalize_place_key(name) not in seen:
+                names.append(name)
+                seen.add(normalize_place_key(name))
+        return names
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.warm()
+            except Exception as e:
+                print(f"Warm-up cycle failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def warm(self) -> List[str]:
+        """Run one warm-up cycle; returns the destinations that were warmed."""
+        orchestrator = self.orchestrator
+        targets = self.targets()
+
+        located: List[Tuple[str, Tuple[float, float]]] = []
+        for name in targets:
+            coords = await orchestrator.geocoder.get_coordinates(name)
+            if coords:
+                located.append((name, coords))
+
+        # Weather for every destination in one multi-location request
+        weather = orchestrator.weather_agent
+        await weather.refresh_cells(list(dict.fromkeys(weather.grid_cell(lat, lon) for _, (lat, lon) in located)))
+
+        # Stale place lists are served instantly and refreshed in the background,
+        # so touching them every cycle keeps them from ever expiring. Each
+        # refresh is awaited before the next search, so a cycle never has
+        # more than one Overpass call of its own in flight.
+        places = orchestrator.places_agent
+        for name, (lat, lon) in located:
+            for category in orchestrator.hot_destinations.categories(name):
+                await places.get_places(lat, lon, name, category_filter=category)
+                await places.places_cache.wait_refreshes()
+
+        orchestrator.hot_destinations.decay()
+        orchestrator.hot_destinations.save()
+        self.cycles += 1
+        self.last_warmed = [name for name, _ in located]
+        return self.last_warmed
+
+    def stats(self) -> Dict:
+        return {"enabled": self.enabled, "cycles": self.cycles, "last_warmed": self.last_warmed}
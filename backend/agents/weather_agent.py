@@ -1,30 +1,161 @@
-import httpx
-from typing import Dict, Any, Optional
+import os
+import time
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from utils.cache import TTLCache
+from utils.cache_backend import CacheBackend
+from utils.http_client import UpstreamClients
+from utils.singleflight import SingleFlight
+
+Cell = Tuple[float, float, str]
 
 class WeatherAgent:
-    BASE_URL = "https://api.open-meteo.com/v1/forecast"
+    # Overridable to point at a stand-in server (see benchmarks/stub_upstreams.py)
+    BASE_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
 
-    @staticmethod
-    async def get_weather(lat: float, lon: float) -> Optional[Dict[str, Any]]:
+    CURRENT_FIELDS = "temperature_2m,precipitation,weather_code,wind_speed_10m"
+    DAILY_FIELDS = "temperature_2m_max,temperature_2m_min,precipitation_probability_max"
+    # Only today's daily values are shown
+    FORECAST_DAYS = 1
+    TIMEZONE = "auto"
+
+    # Open-Meteo's forecast models run on grids of roughly 0.1 degrees (~11km),
+    # so coordinates in the same cell get the same forecast
+    GRID_RESOLUTION = 0.1
+    # Forecast data is refreshed hourly; cached cells expire at the next update
+    # instead of after a fixed TTL
+    FORECAST_UPDATE_INTERVAL = 3600
+    WEATHER_CACHE_SIZE = 2048
+    # Locations per multi-location request (keeps the URL comfortably short)
+    BULK_BATCH_SIZE = 50
+
+    def __init__(self, http: Optional[UpstreamClients] = None, cache: Optional[TTLCache] = None, shared_cache: Optional[CacheBackend] = None):
+        self.http = http or UpstreamClients()
+        self.cache = cache or TTLCache(max_size=self.WEATHER_CACHE_SIZE, ttl=self.FORECAST_UPDATE_INTERVAL)
+        # Tier shared with the other workers, consulted before Open-Meteo
+        self.shared_cache = shared_cache
+        self.inflight = SingleFlight("open_meteo")
+
+    @classmethod
+    def grid_cell(cls, lat: float, lon: float, timezone: str = TIMEZONE) -> Cell:
+        """Snap coordinates to the center of their forecast grid cell."""
+        res = cls.GRID_RESOLUTION
+        return round(round(lat / res) * res, 4), round(round(lon / res) * res, 4), timezone
+
+    def _seconds_until_update(self) -> float:
+        interval = self.FORECAST_UPDATE_INTERVAL
+        return interval - time.time() % interval
+
+    async def get_weather(self, lat: float, lon: float) -> Optional[Dict[str, Any]]:
         """
         Fetch current weather and forecast for a given latitude and longitude.
         """
-        params = {
-            "latitude": lat,
-            "longitude": lon,
-            "current": "temperature_2m,precipitation,weather_code",
-            "daily": "temperature_2m_max,temperature_2m_min,precipitation_probability_max",
-            "timezone": "auto"
-        }
-        
-        async with httpx.AsyncClient() as client:
+        cell = self.grid_cell(lat, lon)
+        hit, cached = self.cache.get(cell)
+        if hit:
+            return cached
+        try:
+            # Concurrent requests for the same cell share one Open-Meteo call
+            return await self.inflight.do(cell, lambda: self._load_cell(cell))
+        except Exception as e:
+            print(f"Error fetching weather: {e}")
+            return None
+
+    async def get_weather_many(self, coordinates: Iterable[Tuple[float, float]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Weather for many coordinates, in order. Cached cells are served from
+        memory and the rest are fetched with multi-location requests.
+        """
+        cells = [self.grid_cell(lat, lon) for lat, lon in coordinates]
+        missing = []
+        for cell in dict.fromkeys(cells):
+            if not self.cache.get(cell)[0]:
+                missing.append(cell)
+        missing = await self._load_shared(missing)
+        await self.refresh_cells(missing)
+        return [self.cache.get(cell)[1] for cell in cells]
+
+    @staticmethod
+    def _shared_key(cell: Cell) -> str:
+        return "weather:%s,%s,%s" % cell
+
+    async def _load_shared(self, cells: List[Cell]) -> List[Cell]:
+        """Copy cells the shared cache holds into memory; returns the cells it didn't have."""
+        if self.shared_cache is None or not cells:
+            return cells
+        found = await self.shared_cache.get_many_json([self._shared_key(cell) for cell in cells])
+        ttl = self._seconds_until_update()
+        missing = []
+        for cell, (hit, weather) in zip(cells, found):
+            if hit and isinstance(weather, dict):
+                # Entries written by an older release may still be full payloads
+                self.cache.set(cell, self.compact(weather), ttl=ttl)
+            else:
+                missing.append(cell)
+        return missing
+
+    async def _load_cell(self, cell: Cell) -> Optional[Dict[str, Any]]:
+        if not await self._load_shared([cell]):
+            return self.cache.get(cell)[1]
+        return await self._fetch_cells([cell])
+
+    async def refresh_cells(self, cells: List[Cell]) -> int:
+        """
+        Fetch the given cells in batched multi-location requests and cache
+        them. Returns how many were refreshed; failed batches are skipped.
+        """
+        by_timezone: Dict[str, List[Cell]] = {}
+        for cell in cells:
+            by_timezone.setdefault(cell[2], []).append(cell)
+        batches = [
+            group[i:i + self.BULK_BATCH_SIZE]
+            for group in by_timezone.values()
+            for i in range(0, len(group), self.BULK_BATCH_SIZE)
+        ]
+
+        refreshed = 0
+        for batch in batches:
             try:
-                response = await client.get(WeatherAgent.BASE_URL, params=params)
-                response.raise_for_status()
-                return response.json()
+                await self._fetch_cells(batch)
+                refreshed += len(batch)
             except Exception as e:
-                print(f"Error fetching weather: {e}")
-                return None
+                print(f"Error refreshing weather for {len(batch)} locations: {e}")
+        return refreshed
+
+    async def _fetch_cells(self, cells: List[Cell]) -> Optional[Dict[str, Any]]:
+        """Fetch and cache cells sharing a timezone setting; returns the first cell's weather."""
+        params = {
+            "latitude": ",".join(str(lat) for lat, _, _ in cells),
+            "longitude": ",".join(str(lon) for _, lon, _ in cells),
+            "current": self.CURRENT_FIELDS,
+            "daily": self.DAILY_FIELDS,
+            "forecast_days": self.FORECAST_DAYS,
+            "timezone": cells[0][2],
+        }
+
+        response = await self.http.get("open_meteo", self.BASE_URL, params=params)
+        response.raise_for_status()
+        payload = response.json()
+        # A multi-location request returns a list, in request order
+        results = [self.compact(result) for result in (payload if isinstance(payload, list) else [payload])]
+        ttl = self._seconds_until_update()
+        for cell, result in zip(cells, results):
+            self.cache.set(cell, result, ttl=ttl)
+            if self.shared_cache is not None:
+                await self.shared_cache.set_json(self._shared_key(cell), result, ttl)
+        return results[0] if results else None
+
+    @classmethod
+    def compact(cls, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Keep only the requested current and daily fields, daily arrays cut
+        to FORECAST_DAYS; drops units, grid metadata and the time axis.
+        """
+        current = payload.get("current") or {}
+        daily = payload.get("daily") or {}
+        return {
+            "current": {name: current[name] for name in cls.CURRENT_FIELDS.split(",") if name in current},
+            "daily": {name: daily[name][:cls.FORECAST_DAYS] for name in cls.DAILY_FIELDS.split(",") if isinstance(daily.get(name), list)},
+        }
 
     @staticmethod
     def format_weather_response(data: Dict[str, Any], place_name: str) -> str:
@@ -0,0 +1,192 @@
+import asyncio
+import os
+import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple
+from utils.cache import TTLCache
+from utils.http_client import UpstreamClients
+from utils.singleflight import SingleFlight
+
+class WikipediaAgent:
+    """
+    Batch description enrichment for places.
+
+    Resolves each place's `wikipedia` / `wikidata` OSM tag directly when
+    present and falls back to a title search otherwise, or when the tagged
+    page has no summary (stale or renamed tag). All lookups for a batch
+    run concurrently under a shared semaphore, and summaries (including
+    misses) are cached.
+    """
+    # Overridable to point at a stand-in server (see benchmarks/stub_upstreams.py)
+    SUMMARY_API = os.getenv("WIKIPEDIA_SUMMARY_URL", "https://{lang}.wikipedia.org/api/rest_v1/page/summary/{title}")
+    WIKIDATA_API = os.getenv("WIKIDATA_URL", "https://www.wikidata.org/w/api.php")
+
+    SUMMARY_TTL = 7 * 24 * 3600
+    MISS_TTL = 24 * 3600
+    MAX_CONCURRENCY = 8
+    # wbgetentities accepts at most 50 ids per call
+    WIKIDATA_BATCH_SIZE = 50
+
+    def __init__(self, http: Optional[UpstreamClients] = None, max_concurrency: Optional[int] = None):
+        self.http = http or UpstreamClients()
+        self.semaphore = asyncio.Semaphore(max_concurrency or self.MAX_CONCURRENCY)
+        self.summaries = TTLCache(max_size=4096, ttl=self.SUMMARY_TTL)
+        self.searches = TTLCache(max_size=4096, ttl=self.SUMMARY_TTL)
+        self.sitelinks = TTLCache(max_size=4096, ttl=self.SUMMARY_TTL)
+        self.inflight = SingleFlight("wikipedia")
+
+    async def enrich_places(self, places: List[Dict[str, Any]], location: str = "") -> List[Dict[str, Any]]:
+        """
+        Return copies of places with "description" filled in where Wikipedia has one.
+        """
+        # Places tagged with only a Wikidata id need one batched sitelink lookup first
+        wikidata_ids = [p["wikidata"] for p in places if p.get("wikidata") and not p.get("wikipedia")]
+        sitelinks = await self._resolve_wikidata(wikidata_ids) if wikidata_ids else {}
+
+        async def describe(place: Dict[str, Any]) -> Optional[str]:
+            description = None
+            if place.get("wikipedia"):
+                lang, title = self._parse_wikipedia_tag(place["wikipedia"])
+                description = await self.get_summary(lang, title)
+            elif place.get("wikidata") in sitelinks:
+                description = await self.get_summary("en", sitelinks[place["wikidata"]])
+            # No tag, or a stale / renamed one: search by name instead
+            return description or await self.describe(place["name"], location)
+
+        descriptions = await asyncio.gather(*[describe(place) for place in places])
+        enriched = []
+        for place, description in zip(places, descriptions):
+            place = dict(place)
+            if description:
+                place["description"] = description
+            enriched.append(place)
+        return enriched
+
+    async def describe(self, place_name: str, location: str = "") -> Optional[str]:
+        """
+        Find a description by title search. Candidate titles are looked up
+        concurrently and the first one in priority order that has a summary wins.
+        """
+        key = (place_name, location)
+        hit, description = self.searches.get(key)
+        if hit:
+            return description
+
+        search_terms = [place_name, f"{place_name}, {location}" if location else None, place_name.replace(",", "")]
+        unique_terms = list(dict.fromkeys(term for term in search_terms if term))
+        results = await asyncio.gather(*[self._lookup_summary("en", term) for term in unique_terms])
+        description = None
+        # Cache the outcome only if no title ahead of it failed to answer
+        settled = True
+        for term_settled, result in results:
+            if result:
+                description = result
+                break
+            settled = settled and term_settled
+
+        if settled:
+            self.searches.set(key, description, None if description else self.MISS_TTL)
+        return description
+
+    async def get_summary(self, lang: str, title: str) -> Optional[str]:
+        """
+        Fetch the first sentences of a page summary, cached per (lang, title).
+        """
+        return (await self._lookup_summary(lang, title))[1]
+
+    async def _lookup_summary(self, lang: str, title: str) -> Tuple[bool, Optional[str]]:
+        """
+        (settled, description): settled is False when the lookup failed
+        (network error, 5xx, 429, unreadable body) and may succeed on retry.
+        """
+        key = (lang, title)
+        hit, description = self.summaries.get(key)
+        if hit:
+            return True, description
+        return await self.inflight.do(key, lambda: self._fetch_summary(lang, title))
+
+    async def _fetch_summary(self, lang: str, title: str) -> Tuple[bool, Optional[str]]:
+        url = self.SUMMARY_API.format(lang=lang, title=urllib.parse.quote(title.replace(" ", "_"), safe=""))
+        try:
+            async with self.semaphore:
+                response = await self.http.get("wikipedia", url, follow_redirects=True)
+        except Exception as e:
+            # Network errors are not cached so the next request can retry
+            print(f"Wikipedia API error for {title}: {e}")
+            return False, None
+
+        description = None
+        if response.status_code == 200:
+            try:
+                extract = response.json().get("extract", "")
+            except (ValueError, AttributeError) as e:
+                print(f"Wikipedia API returned an unreadable summary for {title}: {e}")
+                return False, None
+            description = self._summarize_extract(extract)
+        elif response.status_code != 404:
+            return False, None
+        self.summaries.set((lang, title), description, None if description else self.MISS_TTL)
+        return True, description
+
+    async def _resolve_wikidata(self, ids: List[str]) -> Dict[str, str]:
+        """Map Wikidata ids to English Wikipedia titles in as few calls as possible."""
+        sitelinks: Dict[str, str] = {}
+        unique_ids = []
+        for entity_id in dict.fromkeys(ids):
+            hit, title = self.sitelinks.get(entity_id)
+            if not hit:
+                unique_ids.append(entity_id)
+            elif title:
+                sitelinks[entity_id] = title
+        batches = [unique_ids[i:i + self.WIKIDATA_BATCH_SIZE] for i in range(0, len(unique_ids), self.WIKIDATA_BATCH_SIZE)]
+
+        async def fetch(batch: List[str]) -> Dict[str, str]:
+            params = {
+                "action": "wbgetentities",
+                "ids": "|".join(batch),
+                "props": "sitelinks",
+                "sitefilter": "enwiki",
+                "format": "json",
+            }
+            try:
+                async with self.semaphore:
+                    response = await self.http.get("wikidata", self.WIKIDATA_API, params=params)
+                response.raise_for_status()
+                entities = response.json().get("entities", {})
+            except Exception as e:
+                print(f"Wikidata API error: {e}")
+                return {}
+            titles = {}
+            for entity_id in batch:
+                title = entities.get(entity_id, {}).get("sitelinks", {}).get("enwiki", {}).get("title")
+                self.sitelinks.set(entity_id, title, None if title else self.MISS_TTL)
+                if title:
+                    titles[entity_id] = title
+            return titles
+
+        for titles in await asyncio.gather(*[fetch(batch) for batch in batches]):
+            sitelinks.update(titles)
+        return sitelinks
+
+    @staticmethod
+    def _parse_wikipedia_tag(tag: str) -> Tuple[str, str]:
+        """Split an OSM wikipedia tag like "fr:Tour Eiffel" into (lang, title)."""
+        lang, sep, title = tag.partition(":")
+        if sep and 2 <= len(lang) <= 3 and lang.isalpha():
+            return lang, title
+        return "en", tag
+
+    @staticmethod
+    def _summarize_extract(extract: str) -> Optional[str]:
+        """Keep the first few complete sentences of a summary extract."""
+        # Return first 3-4 complete sentences
+        if not extract or len(extract) <= 30:  # Ensure meaningful content
+            return None
+        # Split by '. ' and keep sentences complete
+        sentences = extract.split(". ")
+        # Take 3-4 sentences and ensure we end with a period
+        num_sentences = min(4, len(sentences))
+        description = ". ".join(sentences[:num_sentences])
+        # Add final period if not present
+        if not description.endswith("."):
+            description += "."
+        return description if len(description) > 30 else None
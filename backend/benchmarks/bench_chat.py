@@ -0,0 +1,171 @@
+"""
+End-to-end load test of POST /chat against the local upstream stand-in.
+
+Starts benchmarks.stub_upstreams and the app (uvicorn main:app) as
+subprocesses, then for each concurrency level sends the query corpus in a
+loop from that many concurrent clients and reports throughput and latency
+percentiles as JSON. The app is restarted for every level so each starts
+with cold caches, unless --reuse-app is given.
+
+    python -m benchmarks.bench_chat --concurrency 1 4 16 64 --requests 200
+    python -m benchmarks.bench_chat --stub-args="--latency overpass=3000 --error-rate overpass=0.1"
+    python -m benchmarks.bench_chat --preferences '{"include_descriptions": true}'
+    python -m benchmarks.bench_chat --workers 4 --env CACHE_BACKEND=sqlite
+"""
+import argparse
+import asyncio
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+from benchmarks.bench_query_parser import DEFAULT_CORPUS, load_corpus
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+@contextmanager
+def stub_upstreams(port_base: int, extra_args: List[str]) -> Iterator[Dict[str, str]]:
+    """Run the stand-in servers; yields the environment pointing at them."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_upstreams", "serve", "--port-base", str(port_base)] + extra_args,
+        cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        line = process.stdout.readline()
+        if not line:
+            raise SystemExit("Stub upstream servers failed to start")
+        yield json.loads(line)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+@contextmanager
+def app_server(port: int, env: Dict[str, str], workers: int = 1) -> Iterator[str]:
+    """Run the backend with the given environment; yields its base URL."""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR, env={**os.environ, **env},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(base_url + "/", timeout=1.0)
+                break
+            except httpx.TransportError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise SystemExit("Backend failed to start")
+                time.sleep(0.2)
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+async def load(base_url: str, queries: List[str], preferences: Optional[Dict[str, Any]], concurrency: int, total: int, timeout: float, admin_token: str) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    next_index = 0
+
+    async def client(http: httpx.AsyncClient) -> None:
+        nonlocal next_index
+        while next_index < total:
+            query = queries[next_index % len(queries)]
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await http.post(base_url + "/chat", json={"message": query, "preferences": preferences})
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+                    continue
+                error = str(response.status_code)
+            except httpx.HTTPError as e:
+                error = type(e).__name__
+            errors[error] = errors.get(error, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stats = (await http.get(base_url + "/stats", headers={"X-Admin-Token": admin_token})).json()
+
+    ordered = sorted(latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "succeeded": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(1000 * sum(ordered) / len(ordered), 1) if ordered else 0.0,
+        "p50_ms": round(1000 * percentile(ordered, 0.50), 1),
+        "p95_ms": round(1000 * percentile(ordered, 0.95), 1),
+        "p99_ms": round(1000 * percentile(ordered, 0.99), 1),
+        "upstreams": stats.get("upstreams", {}),
+    }
+
+
+def run(queries: List[str], preferences: Optional[Dict[str, Any]], levels: List[int], total: int, port: int, stub_port_base: int, stub_args: List[str], reuse_app: bool, timeout: float,
+        workers: int = 1, app_env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    # No persistent geocode cache or destination log, and no warm-up: every run starts from the same state.
+    # The admin token unlocks /stats for the throttle report.
+    env_overrides = {"GEOCODE_CACHE_PATH": "", "WARMUP_ENABLED": "0", "WARMUP_LOG_PATH": "", "METRICS_ADMIN_TOKEN": "bench", **(app_env or {})}
+    results = []
+    with stub_upstreams(stub_port_base, stub_args) as stub_env:
+        env = {**stub_env, **env_overrides}
+        if reuse_app:
+            with app_server(port, env, workers) as base_url:
+                for concurrency in levels:
+                    results.append(asyncio.run(load(base_url, queries, preferences, concurrency, total, timeout, env["METRICS_ADMIN_TOKEN"])))
+        else:
+            for concurrency in levels:
+                with app_server(port, env, workers) as base_url:
+                    results.append(asyncio.run(load(base_url, queries, preferences, concurrency, total, timeout, env["METRICS_ADMIN_TOKEN"])))
+    return {"benchmark": "chat", "queries": len(queries), "preferences": preferences, "stub_args": stub_args, "workers": workers, "app_env": app_env or {},
+            "cold_start_per_level": not reuse_app, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--preferences", type=json.loads, help="Preferences JSON sent with every query")
+    parser.add_argument("--requests", type=int, default=200, help="Requests sent per concurrency level")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--stub-port-base", type=int, default=8900)
+    parser.add_argument("--stub-args", default="", help="Extra arguments for `stub_upstreams serve` (latency, error rates)")
+    parser.add_argument("--reuse-app", action="store_true", help="Keep one app process (and its caches) across levels")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--env", nargs="*", default=[], metavar="KEY=VALUE", help="Extra environment for the app (e.g. CACHE_BACKEND=sqlite)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    result = run(load_corpus(args.corpus), args.preferences, args.concurrency, args.requests, args.port, args.stub_port_base,
+                 shlex.split(args.stub_args), args.reuse_app, args.timeout,
+                 args.workers, dict(pair.split("=", 1) for pair in args.env))
+    report = json.dumps(result, indent=2)
+    print(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Micro-benchmark of Overpass response parsing: json.loads of the whole
+document against the incremental OverpassStreamParser fed in network-sized
+chunks, for both `out center` responses and the compact `convert` output.
+
+Checks that both paths produce the same place records, then reports
+timings as JSON.
+
+    python -m benchmarks.bench_overpass_parse --sizes 500 3000 [--chunk 16384]
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+
+from agents.overpass_query import OUTPUT_TAGS
+from agents.place_records import parse_place
+from benchmarks.stub_upstreams import synthetic_elements
+from utils.overpass_stream import OverpassStreamParser
+
+
+def converted(element: Dict[str, Any]) -> Dict[str, Any]:
+    lat = element["lat"] if "lat" in element else element["center"]["lat"]
+    lon = element["lon"] if "lon" in element else element["center"]["lon"]
+    tags = element["tags"]
+    return {
+        "type": "item", "id": element["id"],
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        "tags": {tag: tags.get(tag, "") for tag in OUTPUT_TAGS},
+    }
+
+
+def parse_document(payload: bytes) -> List:
+    records = []
+    for element in json.loads(payload)["elements"]:
+        record = parse_place(element)
+        if record is not None:
+            records.append(record)
+    return records
+
+
+def parse_stream(payload: bytes, chunk_size: int) -> List:
+    parser = OverpassStreamParser()
+    records = []
+    for start in range(0, len(payload), chunk_size):
+        for element in parser.feed(payload[start:start + chunk_size]):
+            record = parse_place(element)
+            if record is not None:
+                records.append(record)
+    parser.close()
+    return records
+
+
+def timeit(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def run(sizes: List[int], chunk_size: int, repeat: int) -> Dict[str, Any]:
+    results = []
+    for n in sizes:
+        elements = synthetic_elements(48.8566, 2.3522, count=n)
+        for output, items in (("center", elements), ("convert", [converted(e) for e in elements])):
+            payload = json.dumps({"version": 0.6, "elements": items}).encode()
+            document = parse_document(payload)
+            streamed = parse_stream(payload, chunk_size)
+            results.append({
+                "elements": n,
+                "output": output,
+                "payload_kb": round(len(payload) / 1024, 1),
+                "records_match": document == streamed,
+                "document_ms": round(timeit(lambda: parse_document(payload), repeat), 3),
+                "stream_ms": round(timeit(lambda: parse_stream(payload, chunk_size), repeat), 3),
+            })
+    return {"benchmark": "overpass_parse", "chunk_size": chunk_size, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 3000])
+    parser.add_argument("--chunk", type=int, default=16384, help="Bytes per simulated network read")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    result = run(args.sizes, args.chunk, args.repeat)
+    print(json.dumps(result, indent=2))
+    if not all(entry["records_match"] for entry in result["results"]):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
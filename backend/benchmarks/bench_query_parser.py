@@ -0,0 +1,74 @@
+"""
+Micro-benchmark of QueryParser against Orchestrator._determine_intent and
+Orchestrator._extract_location.
+
+Verifies that the single-pass parser gives the same intent and location as
+the reference methods on a corpus of real queries, then reports per-query
+timings (cold, and warm from the memoized cache) as JSON.
+
+    python -m benchmarks.bench_query_parser [--corpus FILE] [--repeat N]
+"""
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List
+
+from agents.orchestrator import Orchestrator
+from agents.query_parser import parse_query
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "fixtures", "queries.txt")
+
+
+def load_corpus(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def per_query_us(fn, queries: List[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in queries:
+            fn(query)
+        best = min(best, time.perf_counter() - start)
+    return best / len(queries) * 1e6
+
+
+def run(queries: List[str], repeat: int) -> Dict[str, Any]:
+    # The reference methods don't touch any agent state
+    reference = Orchestrator.__new__(Orchestrator)
+
+    mismatches = []
+    for query in queries:
+        expected = (reference._determine_intent(query), reference._extract_location(query))
+        parsed = parse_query(query)
+        if (parsed.intent, parsed.location) != expected:
+            mismatches.append({"query": query, "expected": expected, "got": [parsed.intent, parsed.location]})
+
+    def cold(query):
+        parse_query.__wrapped__(query)
+
+    return {
+        "benchmark": "query_parser",
+        "queries": len(queries),
+        "mismatches": mismatches,
+        "reference_us": round(per_query_us(lambda q: (reference._determine_intent(q), reference._extract_location(q)), queries, repeat), 3),
+        "parser_cold_us": round(per_query_us(cold, queries, repeat), 3),
+        "parser_memoized_us": round(per_query_us(parse_query, queries, repeat), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    result = run(load_corpus(args.corpus), args.repeat)
+    print(json.dumps(result, indent=2))
+    if result["mismatches"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
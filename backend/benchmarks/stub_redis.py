@@ -0,0 +1,122 @@
+"""
+Stand-in Redis server speaking RESP2, for trying CACHE_BACKEND=redis (and
+multi-worker benchmarks) without installing Redis.
+
+Supports the commands utils/cache_backend.RedisBackend sends (GET, MGET,
+SET with EX/PX, DEL) plus PING, SELECT, AUTH, DBSIZE and FLUSHALL, with
+lazy key expiry. Optional --latency delays every reply.
+
+    python -m benchmarks.stub_redis --port 6390 [--latency 1]
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6390/0 uvicorn main:app --workers 4
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class StubRedis:
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        # key -> (value, monotonic expiry or None)
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.commands = 0
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    def execute(self, args: List[bytes]) -> bytes:
+        self.commands += 1
+        command = args[0].upper() if args else b""
+        if command == b"PING":
+            return b"+PONG\r\n"
+        if command in (b"SELECT", b"AUTH"):
+            return b"+OK\r\n"
+        if command == b"GET" and len(args) == 2:
+            return bulk(self._get(args[1]))
+        if command == b"MGET" and len(args) >= 2:
+            return b"*%d\r\n" % (len(args) - 1) + b"".join(bulk(self._get(key)) for key in args[1:])
+        if command == b"SET" and len(args) >= 3:
+            expires_at = None
+            options = [arg.upper() for arg in args[3:]]
+            for i, option in enumerate(options[:-1]):
+                if option == b"EX":
+                    expires_at = time.monotonic() + int(args[4 + i])
+                elif option == b"PX":
+                    expires_at = time.monotonic() + int(args[4 + i]) / 1000
+            self._data[args[1]] = (args[2], expires_at)
+            return b"+OK\r\n"
+        if command == b"DEL":
+            removed = sum(1 for key in args[1:] if self._data.pop(key, None) is not None)
+            return b":%d\r\n" % removed
+        if command == b"DBSIZE":
+            return b":%d\r\n" % len(self._data)
+        if command == b"FLUSHALL":
+            self._data.clear()
+            return b"+OK\r\n"
+        return b"-ERR unknown command or wrong number of arguments\r\n"
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                args = await read_command(reader)
+                if args is None:
+                    break
+                reply = self.execute(args)
+                if self.latency_ms:
+                    await asyncio.sleep(self.latency_ms / 1000)
+                writer.write(reply)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def bulk(value: Optional[bytes]) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command (e.g. typed into telnet)
+        return line.strip().split()
+    args = []
+    for _ in range(int(line[1:])):
+        header = await reader.readline()
+        length = int(header[1:])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+async def serve(host: str, port: int, latency_ms: float) -> None:
+    stub = StubRedis(latency_ms)
+    server = await asyncio.start_server(stub.handle, host, port)
+    print(f"Stub Redis listening on redis://{host}:{port}/0", flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--latency", type=float, default=0.0, help="Milliseconds added to every reply")
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.latency))
+
+
+if __name__ == "__main__":
+    main()
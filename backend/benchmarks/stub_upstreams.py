@@ -0,0 +1,369 @@
+"""
+Local stand-in for Nominatim, Open-Meteo, Overpass, Wikipedia and Wikidata,
+so /chat can be benchmarked without touching the live services.
+
+Responses recorded with `record` (fixtures/upstream/<provider>.json) are
+replayed; anything not recorded gets a deterministic synthetic answer of
+the same shape. The committed fixtures are a small Paris sample (geocode,
+weather, sixteen places and some of their summaries) in the recorded format;
+`record` adds to them. Each provider listens on its own port, like the real
+endpoints, and has its own injected latency and error rate.
+
+    python -m benchmarks.stub_upstreams serve --latency overpass=1500 --error-rate overpass=0.05
+    python -m benchmarks.stub_upstreams record --locations Paris Tokyo   # needs network access
+
+`serve` prints the environment variables that point the backend at it.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import urllib.parse
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from agents.overpass_query import OUTPUT_TAGS, compile_places_query
+from utils.geocode_cache import normalize_place_key
+from utils.spatial import haversine_distance
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "upstream")
+
+PROVIDERS = ("nominatim", "open_meteo", "overpass", "wikipedia", "wikidata")
+# Typical latencies of the public services, in milliseconds
+DEFAULT_LATENCY_MS = {"nominatim": 150, "open_meteo": 80, "overpass": 1500, "wikipedia": 60, "wikidata": 100}
+DEFAULT_PORT_BASE = 8900
+
+SYNTHETIC_TAGS = [
+    ("tourism", "attraction"), ("tourism", "museum"), ("tourism", "viewpoint"), ("tourism", "zoo"),
+    ("historic", "monument"), ("historic", "castle"), ("historic", "ruins"), ("historic", "memorial"),
+    ("leisure", "park"), ("leisure", "garden"), ("natural", "peak"), ("natural", "beach"),
+    ("amenity", "restaurant"), ("amenity", "cafe"), ("amenity", "bar"), ("amenity", "cinema"),
+    ("amenity", "theatre"), ("shop", "mall"), ("shop", "supermarket"), ("amenity", "marketplace"),
+]
+NAME_PARTS = ["Royal", "Old", "Grand", "City", "Palace", "Museum", "Park", "Fort", "Temple", "Lake", "Gate", "Cafe", "House", "Market", "Saint", "Garden"]
+EXTRA_TAGS = ["opening_hours", "wheelchair", "website", "wikipedia", "wikidata", "phone", "image", "heritage"]
+
+
+def _seed(*parts: Any) -> int:
+    return int(hashlib.sha1(repr(parts).encode()).hexdigest()[:12], 16)
+
+
+def load_fixtures(provider: str) -> Any:
+    path = os.path.join(FIXTURES_DIR, f"{provider}.json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# --- Synthetic responses ---------------------------------------------------
+
+def synthetic_coordinates(query: str) -> Tuple[float, float]:
+    rnd = random.Random(_seed("geocode", normalize_place_key(query)))
+    return round(rnd.uniform(-50, 60), 5), round(rnd.uniform(-120, 140), 5)
+
+
+def synthetic_weather(lat: float, lon: float) -> Dict[str, Any]:
+    rnd = random.Random(_seed("weather", round(lat, 1), round(lon, 1)))
+    base = 30 - abs(lat) / 2
+    return {
+        "latitude": lat, "longitude": lon, "timezone": "GMT", "utc_offset_seconds": 0,
+        "current": {"temperature_2m": round(base + rnd.uniform(-5, 5), 1), "precipitation": round(rnd.choice([0, 0, 0, 0.4, 2.1]), 1), "weather_code": rnd.choice([0, 1, 3, 61]), "wind_speed_10m": round(rnd.uniform(0, 30), 1)},
+        "daily": {
+            "temperature_2m_max": [round(base + rnd.uniform(0, 6), 1) for _ in range(7)],
+            "temperature_2m_min": [round(base - rnd.uniform(0, 8), 1) for _ in range(7)],
+            "precipitation_probability_max": [rnd.randint(0, 100) for _ in range(7)],
+        },
+    }
+
+
+def synthetic_elements(lat: float, lon: float, count: int = 3000) -> List[Dict[str, Any]]:
+    """Places around a center, denser towards it, as `out center` elements."""
+    rnd = random.Random(_seed("places", round(lat, 2), round(lon, 2)))
+    elements = []
+    for i in range(count):
+        key, value = rnd.choice(SYNTHETIC_TAGS)
+        tags = {key: value, "name": " ".join(rnd.choice(NAME_PARTS) for _ in range(rnd.randint(1, 4)))}
+        for extra in EXTRA_TAGS:
+            if rnd.random() < 0.2:
+                tags[extra] = f"en:{tags['name']}" if extra == "wikipedia" else ("Q%d" % rnd.randint(1, 10**6) if extra == "wikidata" else "yes")
+        # Square of a uniform variable: most places near the center
+        distance_km = 30 * rnd.random() ** 2
+        bearing = rnd.uniform(0, 2 * math.pi)
+        place_lat = lat + distance_km / 111.32 * math.cos(bearing)
+        place_lon = lon + distance_km / (111.32 * max(math.cos(math.radians(lat)), 0.01)) * math.sin(bearing)
+        element = {"type": "node" if i % 3 else "way", "id": i + 1, "tags": tags}
+        if element["type"] == "node":
+            element["lat"], element["lon"] = round(place_lat, 7), round(place_lon, 7)
+        else:
+            element["center"] = {"lat": round(place_lat, 7), "lon": round(place_lon, 7)}
+        elements.append(element)
+    return elements
+
+
+# --- Overpass query interpretation -------------------------------------------
+
+_AROUND = re.compile(r"around:(\d+),([-\d.]+),([-\d.]+)")
+_TAG_EQ = re.compile(r'\["([^"]+)"="([^"]+)"\]')
+_TAG_RE = re.compile(r'\["([^"]+)"~"\^\(([^)]*)\)\$"\]')
+_OUT = re.compile(r"out(?: center)? (\d+);")
+
+
+def _element_position(element: Dict[str, Any]) -> Tuple[float, float]:
+    if "lat" in element:
+        return element["lat"], element["lon"]
+    if "center" in element:
+        return element["center"]["lat"], element["center"]["lon"]
+    lon, lat = element["geometry"]["coordinates"]
+    return lat, lon
+
+
+def answer_overpass(query: str, recorded: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    arounds = [(int(r), float(a), float(b)) for r, a, b in _AROUND.findall(query)]
+    if not arounds:
+        return {"elements": []}
+    radius, lat, lon = arounds[0]
+    inner = arounds[1][0] if len(arounds) > 1 else 0
+    wanted = set(_TAG_EQ.findall(query))
+    for key, values in _TAG_RE.findall(query):
+        wanted.update((key, value.replace("\\", "")) for value in values.split("|"))
+    limit_match = _OUT.search(query)
+    limit = int(limit_match.group(1)) if limit_match else 10**9
+
+    source = None
+    for dataset in recorded or []:
+        if haversine_distance(lat, lon, dataset["lat"], dataset["lon"]) < 50:
+            source = dataset["elements"]
+            break
+    if source is None:
+        source = synthetic_elements(round(lat, 2), round(lon, 2))
+
+    converted = "convert item" in query
+    elements = []
+    for element in source:
+        tags = element.get("tags", {})
+        if wanted and not any(tags.get(key) == value for key, value in wanted):
+            continue
+        place_lat, place_lon = _element_position(element)
+        distance = haversine_distance(lat, lon, place_lat, place_lon) * 1000
+        if distance > radius or (inner and distance <= inner):
+            continue
+        if converted:
+            element = {
+                "type": "item", "id": element.get("id", 0),
+                "geometry": {"type": "Point", "coordinates": [place_lon, place_lat]},
+                "tags": {tag: tags.get(tag, "") for tag in OUTPUT_TAGS},
+            }
+        elements.append(element)
+        if len(elements) >= limit:
+            break
+    return {"version": 0.6, "generator": "stub_upstreams", "elements": elements}
+
+
+# --- Server ------------------------------------------------------------------
+
+class FaultInjector:
+    """Per-provider latency (lognormal around the configured mean) and error rate."""
+
+    def __init__(self, latency_ms: float, error_rate: float, error_status: int, seed: int):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+
+    async def delay(self) -> Optional[Response]:
+        if self.latency_ms > 0:
+            await asyncio.sleep(self.latency_ms / 1000 * self.random.lognormvariate(0, 0.35) / math.exp(0.35 ** 2 / 2))
+        if self.random.random() < self.error_rate:
+            return Response(status_code=self.error_status, headers={"Retry-After": "1"})
+        return None
+
+
+def create_app(provider: str, faults: FaultInjector) -> Starlette:
+    fixtures = load_fixtures(provider)
+
+    async def nominatim(request: Request) -> Response:
+        error = await faults.delay()
+        if error:
+            return error
+        query = request.query_params.get("q", "")
+        recorded = (fixtures or {}).get(normalize_place_key(query))
+        if recorded is not None:
+            return JSONResponse(recorded)
+        lat, lon = synthetic_coordinates(query)
+        return JSONResponse([{"lat": str(lat), "lon": str(lon), "display_name": query}])
+
+    async def open_meteo(request: Request) -> Response:
+        error = await faults.delay()
+        if error:
+            return error
+        lats = [float(value) for value in request.query_params.get("latitude", "0").split(",")]
+        lons = [float(value) for value in request.query_params.get("longitude", "0").split(",")]
+        results = []
+        for lat, lon in zip(lats, lons):
+            recorded = (fixtures or {}).get(f"{round(lat, 1)},{round(lon, 1)}")
+            results.append(recorded if recorded is not None else synthetic_weather(lat, lon))
+        return JSONResponse(results if len(results) > 1 else results[0])
+
+    async def overpass(request: Request) -> Response:
+        error = await faults.delay()
+        if error:
+            return error
+        return JSONResponse(answer_overpass(request.query_params.get("data", ""), fixtures))
+
+    async def wikipedia(request: Request) -> Response:
+        error = await faults.delay()
+        if error:
+            return error
+        title = request.path_params["title"]
+        recorded = (fixtures or {}).get(title)
+        if recorded is not None:
+            return JSONResponse(recorded)
+        # Roughly a third of titles have no article
+        if _seed("wiki", title) % 3 == 0:
+            return JSONResponse({"title": "Not found."}, status_code=404)
+        readable = title.replace("_", " ")
+        return JSONResponse({"title": readable, "extract": f"{readable} is a landmark. It is popular with visitors. It has a long history."})
+
+    async def wikidata(request: Request) -> Response:
+        error = await faults.delay()
+        if error:
+            return error
+        ids = request.query_params.get("ids", "").split("|")
+        return JSONResponse({"entities": {
+            entity_id: {"sitelinks": {"enwiki": {"title": f"Landmark {entity_id}"}}} for entity_id in ids if entity_id
+        }})
+
+    routes = {
+        "nominatim": [Route("/search", nominatim)],
+        "open_meteo": [Route("/v1/forecast", open_meteo)],
+        "overpass": [Route("/api/interpreter", overpass, methods=["GET", "POST"])],
+        "wikipedia": [Route("/{lang}/api/rest_v1/page/summary/{title:path}", wikipedia)],
+        "wikidata": [Route("/w/api.php", wikidata)],
+    }[provider]
+    return Starlette(routes=routes)
+
+
+def environment(port_base: int, host: str = "127.0.0.1") -> Dict[str, str]:
+    """Backend environment variables pointing every upstream at the stub."""
+    ports = {provider: port_base + i for i, provider in enumerate(PROVIDERS)}
+    return {
+        "NOMINATIM_URL": f"http://{host}:{ports['nominatim']}/search",
+        "OPEN_METEO_URL": f"http://{host}:{ports['open_meteo']}/v1/forecast",
+        "OVERPASS_MIRRORS": f"http://{host}:{ports['overpass']}/api/interpreter",
+        "WIKIPEDIA_SUMMARY_URL": f"http://{host}:{ports['wikipedia']}/{{lang}}/api/rest_v1/page/summary/{{title}}",
+        "WIKIDATA_URL": f"http://{host}:{ports['wikidata']}/w/api.php",
+    }
+
+
+async def serve(port_base: int, latency: Dict[str, float], error_rate: Dict[str, float], error_status: int, seed: int) -> None:
+    import uvicorn
+
+    servers = []
+    for i, provider in enumerate(PROVIDERS):
+        faults = FaultInjector(latency.get(provider, DEFAULT_LATENCY_MS[provider]), error_rate.get(provider, 0.0), error_status, seed + i)
+        config = uvicorn.Config(create_app(provider, faults), host="127.0.0.1", port=port_base + i, log_level="warning", access_log=False)
+        servers.append(uvicorn.Server(config))
+    tasks = [asyncio.create_task(server.serve()) for server in servers]
+    while not all(server.started for server in servers):
+        await asyncio.sleep(0.05)
+    print(json.dumps(environment(port_base)), flush=True)
+    await asyncio.gather(*tasks)
+
+
+# --- Recording ---------------------------------------------------------------
+
+async def record(locations: List[str], radius: int, summaries: int) -> None:
+    """Record live responses for the given locations into fixtures/upstream/."""
+    from features.categories import get_all_category_tags
+    from utils.http_client import UpstreamClients
+
+    http = UpstreamClients()
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    nominatim = load_fixtures("nominatim") or {}
+    open_meteo = load_fixtures("open_meteo") or {}
+    overpass = load_fixtures("overpass") or []
+    wikipedia = load_fixtures("wikipedia") or {}
+    try:
+        for name in locations:
+            response = await http.get("nominatim", "https://nominatim.openstreetmap.org/search", params={"q": name, "format": "json", "limit": 1})
+            response.raise_for_status()
+            nominatim[normalize_place_key(name)] = response.json()
+            if not response.json():
+                continue
+            lat, lon = float(response.json()[0]["lat"]), float(response.json()[0]["lon"])
+
+            response = await http.get("open_meteo", "https://api.open-meteo.com/v1/forecast", params={
+                "latitude": round(lat, 1), "longitude": round(lon, 1),
+                "current": "temperature_2m,precipitation,weather_code,wind_speed_10m",
+                "daily": "temperature_2m_max,temperature_2m_min,precipitation_probability_max",
+                "timezone": "auto",
+            })
+            response.raise_for_status()
+            open_meteo[f"{round(lat, 1)},{round(lon, 1)}"] = response.json()
+
+            query = compile_places_query(get_all_category_tags(), lat, lon, radius, limit=5000)
+            response = await http.get("overpass", "https://overpass-api.de/api/interpreter", params={"data": query})
+            response.raise_for_status()
+            overpass = [dataset for dataset in overpass if haversine_distance(lat, lon, dataset["lat"], dataset["lon"]) >= 50]
+            overpass.append({"name": name, "lat": lat, "lon": lon, "elements": response.json()["elements"]})
+            print(f"Recorded {name}: {len(overpass[-1]['elements'])} places", file=sys.stderr)
+
+            for element in overpass[-1]["elements"][:summaries]:
+                lang, _, title = element.get("tags", {}).get("wikipedia", "").partition(":")
+                if not title:
+                    continue
+                title = title.replace(" ", "_")
+                response = await http.get("wikipedia", f"https://{lang}.wikipedia.org/api/rest_v1/page/summary/{urllib.parse.quote(title, safe='')}")
+                if response.status_code == 200:
+                    wikipedia[title] = response.json()
+    finally:
+        await http.aclose()
+        for provider, data in (("nominatim", nominatim), ("open_meteo", open_meteo), ("overpass", overpass), ("wikipedia", wikipedia)):
+            with open(os.path.join(FIXTURES_DIR, f"{provider}.json"), "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+
+
+def _parse_pairs(pairs: List[str]) -> Dict[str, float]:
+    parsed = {}
+    for pair in pairs:
+        provider, _, value = pair.partition("=")
+        if provider not in PROVIDERS:
+            raise SystemExit(f"Unknown provider {provider!r} (expected one of {', '.join(PROVIDERS)})")
+        parsed[provider] = float(value)
+    return parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve_parser = commands.add_parser("serve", help="Run the stand-in servers")
+    serve_parser.add_argument("--port-base", type=int, default=DEFAULT_PORT_BASE, help="First of the consecutive ports, one per provider")
+    serve_parser.add_argument("--latency", nargs="*", default=[], metavar="PROVIDER=MS", help="Mean injected latency")
+    serve_parser.add_argument("--error-rate", nargs="*", default=[], metavar="PROVIDER=RATE", help="Fraction of requests answered with --error-status")
+    serve_parser.add_argument("--error-status", type=int, default=503)
+    serve_parser.add_argument("--seed", type=int, default=0)
+    record_parser = commands.add_parser("record", help="Record live responses as fixtures")
+    record_parser.add_argument("--locations", nargs="+", default=["Paris", "London", "Tokyo", "Bangalore", "New York"])
+    record_parser.add_argument("--radius", type=int, default=30000)
+    record_parser.add_argument("--summaries", type=int, default=20, help="Places per location whose Wikipedia summary is recorded")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        asyncio.run(serve(args.port_base, _parse_pairs(args.latency), _parse_pairs(args.error_rate), args.error_status, args.seed))
+    else:
+        asyncio.run(record(args.locations, args.radius, args.summaries))
+
+
+if __name__ == "__main__":
+    main()
@@ -51,6 +51,30 @@ CATEGORY_MAPPINGS = {
     ],
 }
 
+# Tags searched when no category filter is applied ("all")
+DEFAULT_PLACE_TAGS = [
+    ("tourism", "attraction"),
+    ("tourism", "museum"),
+    ("historic", "monument"),
+    ("historic", "castle"),
+    ("leisure", "park"),
+    ("leisure", "garden"),
+    ("natural", "peak"),
+]
+
+def get_category_tags(category_key: str) -> list:
+    """Get the (key, value) OSM tag pairs searched for a category."""
+    return CATEGORY_MAPPINGS.get(category_key) or DEFAULT_PLACE_TAGS
+
+def get_all_category_tags() -> list:
+    """Union of the tags of every category plus the default set, without duplicates."""
+    tags = list(DEFAULT_PLACE_TAGS)
+    for category_tags in CATEGORY_MAPPINGS.values():
+        for tag in category_tags or []:
+            if tag not in tags:
+                tags.append(tag)
+    return tags
+
 def get_category_display_name(category_key: str) -> str:
     """Get user-friendly display name for category."""
     display_names = {
@@ -1,15 +1,82 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager, nullcontext
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from dotenv import load_dotenv
+import hashlib
+import hmac
 import os
+import time
 
 load_dotenv()
 
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 from agents.orchestrator import Orchestrator
+from agents.response_cache import ChatAnswer
+from agents.response_schema import BatchResponse, ChatResponse, canonical_fields, parse_fields, project
+from agents.warmup import WarmupScheduler
+from utils.admission import HEAVY, LANES, LIGHT, AdmissionController, Overloaded
+from utils.cache import TTLCache
+from utils.deadline import deadline_scope
+from utils.http_client import UpstreamClients
+from utils.metrics import ADMISSIONS, HTTP_SECONDS, PROFILER, REGISTRY, REQUEST_ERRORS, trace_request
+from utils.serialization import compress, dumps, negotiate_encoding
 
-app = FastAPI(title="Inkle Tourism AI")
+# Largest number of queries accepted by /chat/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "25"))
+
+# Required in the X-Admin-Token header by /stats, /metrics and
+# /debug/profiling; without it those routes answer 404
+ADMIN_TOKEN = os.getenv("METRICS_ADMIN_TOKEN")
+
+upstreams = UpstreamClients()
+orchestrator = Orchestrator(upstreams)
+warmup = WarmupScheduler.from_env(orchestrator)
+# Bounded concurrency, queues and priority lanes for queries that call upstreams
+admission = AdmissionController.from_env()
+
+# Encoded bodies of cacheable answers by (ETag, fields, coding): repeated
+# hits skip serialization and compression. ETags follow content, so entries
+# never go stale; the TTL only bounds memory.
+encoded_bodies = TTLCache(max_size=512, ttl=3600)
+
+def _samples(stats: Dict[str, Dict[str, Any]], label: str, field: str, **extra):
+    return [({label: name, **extra}, values[field]) for name, values in stats.items() if field in values]
+
+# Counters the components already keep, read at scrape time
+for result, field in (("hit", "hits"), ("stale_hit", "stale_hits"), ("fallback_hit", "fallback_hits"), ("miss", "misses")):
+    REGISTRY.collector(f"voyant_cache_{field}_total", "counter", f"Cache lookups answered as {result.replace('_', ' ')}.", ("cache",),
+                       lambda field=field: _samples(orchestrator.cache_stats(), "cache", field))
+REGISTRY.collector("voyant_cache_entries", "gauge", "Entries held per cache.", ("cache",),
+                   lambda: _samples(orchestrator.cache_stats(), "cache", "size"))
+REGISTRY.collector("voyant_coalesced_calls_total", "counter", "Upstream calls that joined an identical call already in flight.", ("group",),
+                   lambda: _samples(orchestrator.coalescing_stats(), "group", "coalesced"))
+REGISTRY.collector("upstream_throttle_rejected_total", "counter", "Requests that could not get a rate-limit token or slot in time.", ("provider",),
+                   lambda: _samples(upstreams.throttle_stats(), "provider", "rejected"))
+REGISTRY.collector("upstream_concurrency_limit", "gauge", "Current adaptive concurrency limit per provider.", ("provider",),
+                   lambda: _samples(upstreams.throttle_stats(), "provider", "concurrency_limit"))
+REGISTRY.collector("upstream_in_flight", "gauge", "Requests in flight per provider.", ("provider",),
+                   lambda: _samples(upstreams.throttle_stats(), "provider", "in_flight"))
+REGISTRY.collector("voyant_admission_in_flight", "gauge", "Admitted queries running, per lane.", ("lane",),
+                   lambda: [({"lane": lane}, admission.stats()["in_flight"][lane]) for lane in LANES])
+REGISTRY.collector("voyant_admission_queued", "gauge", "Queries waiting for a slot, per lane.", ("lane",),
+                   lambda: [({"lane": lane}, admission.stats()["queued"][lane]) for lane in LANES])
+REGISTRY.collector("upstream_circuit_open", "gauge", "1 while the endpoint's circuit breaker is not closed.", ("endpoint",),
+                   lambda: [({"endpoint": endpoint}, int(values["state"] != "closed")) for endpoint, values in upstreams.health_stats().items()])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open pooled upstream connections once and reuse them across requests
+    await upstreams.start()
+    # Prefetch hot destinations now and periodically, in the background
+    warmup.start()
+    yield
+    await warmup.stop()
+    await orchestrator.aclose()
+    await upstreams.aclose()
+
+app = FastAPI(title="Inkle Tourism AI", lifespan=lifespan)
 
 # CORS - Allow all for development
 app.add_middleware(
@@ -20,23 +87,269 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-orchestrator = Orchestrator()
-
 class ChatRequest(BaseModel):
     message: str
     preferences: Optional[Dict[str, Any]] = None
 
+class ProfilingSettings(BaseModel):
+    enabled: Optional[bool] = None
+    server_timing: Optional[bool] = None
+    slow_ms: Optional[float] = None
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """
+    Request latency histogram, plus per-request stage traces while profiling
+    is enabled (Server-Timing header and slow-request log).
+    """
+    started = time.perf_counter()
+    if PROFILER.enabled:
+        with trace_request() as trace:
+            response = await call_next(request)
+    else:
+        trace = None
+        response = await call_next(request)
+
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    # For streamed responses this is the time to the first byte
+    HTTP_SECONDS.observe(time.perf_counter() - started, method=request.method, path=path, status=response.status_code)
+
+    if trace is not None:
+        streamed = response.headers.get("content-type", "").startswith(("text/event-stream", "application/x-ndjson"))
+        # A streamed body is still being produced, so its trace is incomplete here
+        if PROFILER.server_timing and not streamed:
+            response.headers["Server-Timing"] = trace.server_timing()
+        PROFILER.finish(trace, f"{request.method} {path}")
+    return response
+
 @app.get("/")
 async def root():
     return {"message": "Inkle Tourism AI Backend is running"}
 
-@app.post("/chat")
-async def chat(request: ChatRequest):
+@app.get("/ready")
+async def ready():
+    """
+    Readiness: 503 while the instance is turning queries away (an admission
+    queue is full), so a load balancer can route around it. / stays up as
+    the liveness check.
+    """
+    stats = admission.stats()
+    return JSONResponse(stats, status_code=200 if stats["ready"] else 503)
+
+def _require_admin(http_request: Request) -> None:
+    """Admin routes are off unless METRICS_ADMIN_TOKEN is set, and need it when it is."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Prometheus sends its credentials as a bearer token
+    bearer = http_request.headers.get("authorization", "")
+    token = bearer[7:] if bearer.startswith("Bearer ") else http_request.headers.get("x-admin-token")
+    if not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/stats")
+async def stats(http_request: Request):
+    _require_admin(http_request)
+    return {
+        "coalescing": orchestrator.coalescing_stats(),
+        "caches": orchestrator.cache_stats(),
+        "upstreams": upstreams.throttle_stats(),
+        "endpoints": upstreams.health_stats(),
+        "warmup": warmup.stats(),
+        "profiling": PROFILER.stats(),
+        "admission": admission.stats(),
+    }
+
+@app.get("/metrics")
+async def metrics(http_request: Request):
+    """Prometheus text exposition of every counter and histogram."""
+    _require_admin(http_request)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/debug/profiling")
+async def set_profiling(settings: ProfilingSettings, http_request: Request):
+    """Switch per-request profiling on or off without a redeploy."""
+    _require_admin(http_request)
+    PROFILER.update(settings.enabled, settings.server_timing, settings.slow_ms)
+    return PROFILER.stats()
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # Weak comparison: a proxy may have weakened the tag after compressing the body
+    return "*" in candidates or etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+def _encode(body: Any, http_request: Request) -> Tuple[bytes, Optional[str]]:
+    """(body, Content-Encoding) of a JSON body, compressed as the client accepts."""
+    return compress(dumps(body), negotiate_encoding(http_request.headers.get("accept-encoding")))
+
+def _json_response(content: bytes, encoding: Optional[str], headers: Optional[Dict[str, str]] = None) -> Response:
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content, media_type="application/json", headers=headers)
+
+def _overloaded(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=503, detail=f"Server busy: {e}", headers={"Retry-After": str(e.retry_after)})
+
+async def _admitted_answer(message: str, preferences: Optional[Dict[str, Any]]) -> Tuple[ChatAnswer, Optional[str]]:
+    """
+    Answer a query under admission control; returns (answer, how it was
+    degraded or None). Answers from cache skip the queue. When the query's
+    lane is overloaded, the last cached answer is served however old, else
+    the weather part alone for weather-and-places queries; otherwise
+    Overloaded propagates.
+    """
+    triage = orchestrator.triage(message, preferences)
+    if triage.immediate:
+        return await orchestrator.answer(message, preferences), None
+    with deadline_scope(admission.request_timeout):
+        try:
+            async with admission.admit(triage.lane):
+                return await orchestrator.answer(message, preferences), None
+        except Overloaded:
+            stale = orchestrator.stale_answer(message, preferences)
+            if stale is not None:
+                ADMISSIONS.inc(lane=triage.lane, outcome="served_stale")
+                return stale, "stale"
+            if triage.weather_fallback:
+                try:
+                    # Only a free slot: the light queue is for queries that asked for weather only
+                    async with admission.admit(LIGHT, wait=False):
+                        partial = await orchestrator.weather_only_answer(message, preferences)
+                    ADMISSIONS.inc(lane=triage.lane, outcome="served_weather_only")
+                    return partial, "weather-only"
+                except Overloaded:
+                    pass
+            ADMISSIONS.inc(lane=triage.lane, outcome="shed")
+            raise
+
+def _answer_response(answer: ChatAnswer, http_request: Request, fields: Optional[str] = None, degraded: Optional[str] = None) -> Response:
+    """
+    JSON response with validators, projected to fields= and compressed as
+    negotiated; a GET whose If-None-Match still matches gets a 304.
+    """
+    projection = parse_fields(fields)
+    etag = answer.etag
+    if projection is not None:
+        # Every projection is a representation of its own
+        etag = '"' + hashlib.sha1((etag + canonical_fields(projection)).encode("utf-8")).hexdigest()[:20] + '"'
+    encoding = negotiate_encoding(http_request.headers.get("accept-encoding"))
+    key = (etag, encoding)
+    hit, encoded = encoded_bodies.get(key)
+    if not hit:
+        encoded = compress(dumps(project(answer.body, projection)), encoding)
+        if answer.max_age:
+            encoded_bodies.set(key, encoded)
+    content, content_encoding = encoded
+
+    headers = {
+        # A compressed body is no longer byte-identical to the uncompressed one
+        "ETag": "W/" + etag if content_encoding else etag,
+        "Cache-Control": f"public, max-age={answer.max_age}" if answer.max_age else "no-cache",
+    }
+    if degraded:
+        headers["X-Degraded"] = degraded
+    if http_request.method == "GET" and _etag_matches(http_request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={**headers, "Vary": "Accept-Encoding"})
+    return _json_response(content, content_encoding, headers)
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat(request: ChatRequest, http_request: Request, fields: Optional[str] = None):
+    """
+    Answer a query. fields= selects parts of the response by dotted path,
+    e.g. "text,data.weather.current,data.places.name".
+    """
     try:
-        response = await orchestrator.process_query(request.message, request.preferences)
-        return response
+        answer, degraded = await _admitted_answer(request.message, request.preferences)
+    except Overloaded as e:
+        raise _overloaded(e)
     except Exception as e:
+        REQUEST_ERRORS.inc(endpoint="/chat", error=type(e).__name__)
         raise HTTPException(status_code=500, detail=str(e))
+    return _answer_response(answer, http_request, fields, degraded)
+
+@app.get("/chat", response_model=ChatResponse)
+async def chat_get(http_request: Request, message: str, category_filter: str = "all", include_descriptions: bool = False, fields: Optional[str] = None):
+    """
+    Same answer as POST /chat, as a cacheable GET: browsers and CDNs can
+    store it for max-age and revalidate it with If-None-Match (304).
+    """
+    preferences = {"category_filter": category_filter, "include_descriptions": include_descriptions}
+    try:
+        answer, degraded = await _admitted_answer(message, preferences)
+    except Overloaded as e:
+        raise _overloaded(e)
+    except Exception as e:
+        REQUEST_ERRORS.inc(endpoint="/chat", error=type(e).__name__)
+        raise HTTPException(status_code=500, detail=str(e))
+    return _answer_response(answer, http_request, fields, degraded)
+
+@app.post("/chat/batch", response_model=BatchResponse)
+async def chat_batch(requests: List[ChatRequest], http_request: Request, fields: Optional[str] = None):
+    """
+    Answer several queries in one call (e.g. every stop of a trip). Results
+    come back in request order; a query that fails has an "error" entry
+    instead of failing the batch. fields= applies to every result.
+    """
+    if len(requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_SIZE} queries per batch")
+    # One slot per query (capped by the controller), in the heavy lane if any of them searches places
+    lane = HEAVY if any(orchestrator.triage(r.message, r.preferences).lane == HEAVY for r in requests) else LIGHT
+    try:
+        with deadline_scope(admission.request_timeout):
+            async with admission.admit(lane, weight=len(requests)):
+                results = await orchestrator.process_batch([(r.message, r.preferences) for r in requests])
+    except Overloaded as e:
+        ADMISSIONS.inc(lane=lane, outcome="shed")
+        raise _overloaded(e)
+    except Exception as e:
+        REQUEST_ERRORS.inc(endpoint="/chat/batch", error=type(e).__name__)
+        raise HTTPException(status_code=500, detail=str(e))
+    projection = parse_fields(fields)
+    results = [result if "error" in result else project(result, projection) for result in results]
+    return _json_response(*_encode({"results": results}, http_request))
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    """
+    Streaming variant of /chat: emits each agent result as soon as it is ready.
+    Sends Server-Sent Events when the client accepts text/event-stream,
+    newline-delimited JSON otherwise. The last event ("done") carries the
+    same payload /chat would have returned.
+    """
+    use_sse = "text/event-stream" in http_request.headers.get("accept", "")
+    arrived = time.monotonic()
+    triage = orchestrator.triage(request.message, request.preferences)
+    if not triage.immediate and admission.queue_full(triage.lane):
+        ADMISSIONS.inc(lane=triage.lane, outcome="shed")
+        raise _overloaded(Overloaded(f"{triage.lane} queue full", admission.retry_after))
+
+    async def events():
+        try:
+            # The slot is taken here rather than in the handler, so it is
+            # released even if the stream is never consumed; the deadline
+            # still counts from the request's arrival
+            with deadline_scope(admission.request_timeout - (time.monotonic() - arrived)):
+                async with nullcontext() if triage.immediate else admission.admit(triage.lane):
+                    async for event in orchestrator.stream_query(request.message, request.preferences):
+                        payload = dumps(event)
+                        if use_sse:
+                            yield b"event: " + event["event"].encode() + b"\ndata: " + payload + b"\n\n"
+                        else:
+                            yield payload + b"\n"
+        except Exception as e:
+            REQUEST_ERRORS.inc(endpoint="/chat/stream", error=type(e).__name__)
+            error = dumps({"event": "error", "detail": str(e)})
+            yield b"event: error\ndata: " + error + b"\n\n" if use_sse else error + b"\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        # Stop proxies from buffering the stream until it completes
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 if __name__ == "__main__":
     import uvicorn
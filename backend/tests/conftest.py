@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+# Keep the agents built by tests in memory: no on-disk geocode store,
+# destination log, shared cache tier or POI extract from the developer's setup
+os.environ["GEOCODE_CACHE_PATH"] = ""
+os.environ["WARMUP_LOG_PATH"] = ""
+os.environ["CACHE_BACKEND"] = ""
+os.environ["POI_STORE_PATH"] = ""
+
+KNOWN_PLACES = {"Paris": (48.85, 2.35), "Tokyo": (35.68, 139.69)}
+
+
+@pytest.fixture
+def app_client(monkeypatch):
+    """TestClient for main.app over an orchestrator whose agents answer from memory."""
+    from fastapi.testclient import TestClient
+
+    import main
+    from agents.orchestrator import Orchestrator
+    from utils.cache import TTLCache
+    from utils.geocode_cache import GeocodeCache
+
+    orchestrator = Orchestrator()
+    orchestrator.geocoder.cache = GeocodeCache(use_gazetteer=False)
+
+    async def fetch_coordinates(name):
+        return KNOWN_PLACES.get(name)
+
+    async def get_weather(lat, lon):
+        return {"current": {"temperature_2m": 14.2, "precipitation": 0.0, "weather_code": 3, "wind_speed_10m": 11.5},
+                "daily": {"temperature_2m_max": [15.1], "temperature_2m_min": [8.3], "precipitation_probability_max": [10]}}
+
+    async def get_weather_many(coordinates):
+        return [await get_weather(lat, lon) for lat, lon in coordinates]
+
+    async def get_places(lat, lon, location_name="", radius=30000, category_filter="all"):
+        return [{"name": f"{location_name} sight {i}", "lat": lat, "lon": lon, "category": "Museum", "maps_link": "https://maps.test", "wikipedia": None}
+                for i in range(5)]
+
+    orchestrator.geocoder._fetch_coordinates = fetch_coordinates
+    orchestrator.weather_agent.get_weather = get_weather
+    orchestrator.weather_agent.get_weather_many = get_weather_many
+    orchestrator.places_agent.get_places = get_places
+    monkeypatch.setattr(main, "orchestrator", orchestrator)
+    monkeypatch.setattr(main, "encoded_bodies", TTLCache(max_size=512, ttl=3600))
+    # Not entered as a context manager, so the app's lifespan (warm-up) doesn't run
+    return TestClient(main.app)
@@ -0,0 +1,34 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+ADMIN_ROUTES = [("GET", "/stats", None), ("GET", "/metrics", None), ("POST", "/debug/profiling", {})]
+
+
+@pytest.mark.parametrize("method,path,body", ADMIN_ROUTES)
+def test_admin_routes_are_off_without_a_token(monkeypatch, method, path, body):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    response = TestClient(main.app).request(method, path, json=body, headers={"X-Admin-Token": ""})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("method,path,body", ADMIN_ROUTES)
+def test_admin_routes_need_the_token(monkeypatch, method, path, body):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", "s3cret")
+    client = TestClient(main.app)
+
+    def send(path, json, headers=None):
+        return client.request(method, path, json=json, headers=headers)
+
+    assert send(path, json=body).status_code == 403
+    assert send(path, json=body, headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert send(path, json=body, headers={"X-Admin-Token": "s3cret"}).status_code == 200
+    assert send(path, json=body, headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+
+def test_health_checks_stay_open(monkeypatch):
+    monkeypatch.setattr(main, "ADMIN_TOKEN", None)
+    client = TestClient(main.app)
+    assert client.get("/").status_code == 200
+    assert client.get("/ready").status_code == 200
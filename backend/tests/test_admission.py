@@ -0,0 +1,217 @@
+import asyncio
+
+import pytest
+
+from utils.admission import HEAVY, LIGHT, AdmissionController, Overloaded
+from utils.deadline import deadline_scope
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_release_hands_slot_to_waiter():
+    async def test():
+        admission = AdmissionController(max_concurrent=1, max_heavy=1, max_queue=4, queue_timeout=1.0)
+        await admission.acquire(HEAVY)
+        waiter = asyncio.create_task(admission.acquire(HEAVY))
+        await asyncio.sleep(0)
+        assert admission.stats()["queued"][HEAVY] == 1
+
+        admission.release(HEAVY)
+        await waiter
+        # The slot moved to the waiter without ever being free
+        assert admission.in_flight[HEAVY] == 1
+        admission.release(HEAVY)
+        assert admission.in_flight == {LIGHT: 0, HEAVY: 0}
+
+    run(test())
+
+
+def test_light_waiters_served_first():
+    async def test():
+        admission = AdmissionController(max_concurrent=1, max_heavy=1, max_queue=4, queue_timeout=1.0)
+        await admission.acquire(LIGHT)
+        order = []
+
+        async def wait(lane):
+            await admission.acquire(lane)
+            order.append(lane)
+
+        heavy = asyncio.create_task(wait(HEAVY))
+        await asyncio.sleep(0)
+        light = asyncio.create_task(wait(LIGHT))
+        await asyncio.sleep(0)
+        admission.release(LIGHT)
+        await light
+        assert order == [LIGHT]
+        admission.release(LIGHT)
+        await heavy
+        assert order == [LIGHT, HEAVY]
+
+    run(test())
+
+
+def test_heavy_lane_capped():
+    async def test():
+        admission = AdmissionController(max_concurrent=3, max_heavy=2, max_queue=4, queue_timeout=0.05)
+        await admission.acquire(HEAVY)
+        await admission.acquire(HEAVY)
+        with pytest.raises(Overloaded):
+            await admission.acquire(HEAVY)
+        # The remaining slot is still open to light queries
+        await admission.acquire(LIGHT)
+
+    run(test())
+
+
+def test_queue_timeout_leaves_no_trace():
+    async def test():
+        admission = AdmissionController(max_concurrent=1, max_heavy=1, max_queue=4, queue_timeout=0.05)
+        await admission.acquire(HEAVY)
+        with pytest.raises(Overloaded) as raised:
+            await admission.acquire(HEAVY)
+        assert raised.value.retry_after >= 1
+        assert admission.stats()["queued"][HEAVY] == 0
+        admission.release(HEAVY)
+        assert admission.in_flight[HEAVY] == 0
+
+    run(test())
+
+
+def test_queue_wait_capped_by_request_deadline():
+    async def test():
+        admission = AdmissionController(max_concurrent=1, max_heavy=1, max_queue=4, queue_timeout=5.0)
+        await admission.acquire(HEAVY)
+        started = asyncio.get_running_loop().time()
+        with deadline_scope(0.05):
+            with pytest.raises(Overloaded):
+                await admission.acquire(HEAVY)
+        assert asyncio.get_running_loop().time() - started < 1.0
+
+    run(test())
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def test():
+        admission = AdmissionController(max_concurrent=1, max_heavy=1, max_queue=4, queue_timeout=1.0)
+        await admission.acquire(HEAVY)
+        waiter = asyncio.create_task(admission.acquire(HEAVY))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert admission.stats()["queued"][HEAVY] == 0
+        admission.release(HEAVY)
+        assert admission.in_flight[HEAVY] == 0
+
+    run(test())
+
+
+def test_slot_granted_to_cancelled_waiter_is_passed_on():
+    async def test():
+        admission = AdmissionController(max_concurrent=1, max_heavy=1, max_queue=4, queue_timeout=1.0)
+        await admission.acquire(HEAVY)
+        first = asyncio.create_task(admission.acquire(HEAVY))
+        second = asyncio.create_task(admission.acquire(HEAVY))
+        await asyncio.sleep(0)
+        # Hand the slot to the first waiter, then cancel it before it resumes:
+        # either it keeps the slot or passes it on, but the slot is never lost
+        admission.release(HEAVY)
+        first.cancel()
+        try:
+            await first
+        except asyncio.CancelledError:
+            pass
+        else:
+            admission.release(HEAVY)
+        await asyncio.wait_for(second, 1.0)
+        assert admission.in_flight[HEAVY] == 1
+
+    run(test())
+
+
+def test_full_queue_rejects_and_reports_not_ready():
+    async def test():
+        admission = AdmissionController(max_concurrent=1, max_heavy=1, max_queue=1, queue_timeout=1.0)
+        await admission.acquire(HEAVY)
+        waiter = asyncio.create_task(admission.acquire(HEAVY))
+        await asyncio.sleep(0)
+        assert not admission.ready()
+        with pytest.raises(Overloaded):
+            await admission.acquire(HEAVY)
+        with pytest.raises(Overloaded):
+            await admission.acquire(LIGHT, wait=False)
+        admission.release(HEAVY)
+        await waiter
+        assert admission.ready()
+
+    run(test())
+
+
+def test_weighted_acquire_waits_for_all_its_slots():
+    async def test():
+        admission = AdmissionController(max_concurrent=8, max_heavy=4, max_queue=4, queue_timeout=1.0)
+        for _ in range(3):
+            await admission.acquire(HEAVY)
+        batch = asyncio.create_task(admission.acquire(HEAVY, weight=25))
+        await asyncio.sleep(0)
+        # Capped to half the lane, and not admitted while only one slot is free
+        assert not batch.done()
+        admission.release(HEAVY)
+        assert await batch == 2
+        assert admission.in_flight[HEAVY] == 4
+        with pytest.raises(Overloaded):
+            await admission.acquire(HEAVY, wait=False)
+        admission.release(HEAVY, 2)
+        admission.release(HEAVY, 2)
+        assert admission.in_flight[HEAVY] == 0
+
+    run(test())
+
+
+def test_batch_leaves_half_the_lane_to_single_queries():
+    async def test():
+        admission = AdmissionController(max_concurrent=32, max_heavy=16, max_queue=4, queue_timeout=1.0)
+        assert await admission.acquire(HEAVY, weight=25) == 8
+        for _ in range(8):
+            await admission.acquire(HEAVY, wait=False)
+        with pytest.raises(Overloaded):
+            await admission.acquire(HEAVY, wait=False)
+        assert await admission.acquire(LIGHT, weight=25) == 16
+
+    run(test())
+
+
+def test_mixed_batch_takes_a_heavy_slot_per_query(app_client, monkeypatch):
+    import main
+
+    admission = AdmissionController(max_concurrent=16, max_heavy=8, max_queue=4, queue_timeout=1.0)
+    acquired = []
+    acquire = admission.acquire
+
+    async def spy(lane, wait=True, weight=1):
+        acquired.append((lane, weight, await acquire(lane, wait, weight)))
+        return acquired[-1][2]
+
+    admission.acquire = spy
+    monkeypatch.setattr(main, "admission", admission)
+    weather = [{"message": f"weather in {city}"} for city in ("Paris", "Tokyo")]
+    # One places search makes the whole batch heavy, weighted by every query in it
+    assert app_client.post("/chat/batch", json=weather + [{"message": "places to visit in Paris"}]).status_code == 200
+    assert app_client.post("/chat/batch", json=weather * 4 + [{"message": "places to visit in Tokyo"}]).status_code == 200
+    assert app_client.post("/chat/batch", json=weather).status_code == 200
+    assert acquired == [(HEAVY, 3, 3), (HEAVY, 9, 4), (LIGHT, 2, 2)]
+    assert admission.in_flight == {LIGHT: 0, HEAVY: 0}
+
+
+def test_admit_releases_on_error():
+    async def test():
+        admission = AdmissionController(max_concurrent=4, max_heavy=4, max_queue=4, queue_timeout=1.0)
+        with pytest.raises(RuntimeError):
+            async with admission.admit(HEAVY, weight=2):
+                assert admission.in_flight[HEAVY] == 2
+                raise RuntimeError("boom")
+        assert admission.in_flight[HEAVY] == 0
+
+    run(test())
@@ -0,0 +1,96 @@
+import asyncio
+
+from agents.orchestrator import Orchestrator
+from utils.geocode_cache import GeocodeCache
+from utils.rate_limit import UpstreamBusy
+
+KNOWN = {"Hampi": (15.335, 76.46), "Gokarna": (14.55, 74.32), "Udaipur": (24.58, 73.71)}
+
+
+def _orchestrator():
+    orchestrator = Orchestrator()
+    orchestrator.geocoder.cache = GeocodeCache(use_gazetteer=False)
+    calls = {"geocode": [], "weather": 0, "places": []}
+
+    async def fetch_coordinates(name):
+        calls["geocode"].append(name)
+        if name == "Flakyville":
+            raise UpstreamBusy("nominatim: no rate-limit token within 5.0s")
+        return KNOWN.get(name)
+
+    async def get_weather_many(coordinates):
+        calls["weather"] += 1
+        return [{"current": {"temperature_2m": lat}, "daily": {}} for lat, _ in coordinates]
+
+    async def get_places(lat, lon, location_name="", radius=30000, category_filter="all"):
+        calls["places"].append((location_name, category_filter))
+        return [{"name": f"{location_name} {category_filter}", "lat": lat, "lon": lon, "category": "Museum", "maps_link": "https://maps.test", "wikipedia": None}]
+
+    orchestrator.geocoder._fetch_coordinates = fetch_coordinates
+    orchestrator.weather_agent.get_weather_many = get_weather_many
+    orchestrator.places_agent.get_places = get_places
+    return orchestrator, calls
+
+
+def test_results_in_request_order():
+    async def test():
+        orchestrator, calls = _orchestrator()
+        results = await orchestrator.process_batch([
+            ("places to visit in Gokarna", {"category_filter": "nature"}),
+            ("weather in Hampi", None),
+            ("hello", None),
+            ("weather and places in Udaipur", None),
+            ("weather in Gokarna", None),
+        ])
+        assert [r["data"].get("location") for r in results] == ["Gokarna", "Hampi", None, "Udaipur", "Gokarna"]
+        assert [p["name"] for p in results[0]["data"]["places"]] == ["Gokarna nature"]
+        assert "weather" not in results[0]["data"]
+        assert results[1]["data"]["weather"]["current"]["temperature_2m"] == 15.335
+        assert "places" not in results[1]["data"]
+        assert results[2]["data"] == {} and "couldn't identify the location" in results[2]["text"]
+        assert results[3]["data"]["weather"] and results[3]["data"]["places"]
+        assert results[4]["data"]["weather"]["current"]["temperature_2m"] == 14.55
+
+        # Each place geocoded once, all weather in one call
+        assert sorted(calls["geocode"]) == ["Gokarna", "Hampi", "Udaipur"]
+        assert calls["weather"] == 1
+        assert sorted(calls["places"]) == [("Gokarna", "nature"), ("Udaipur", "all")]
+
+    asyncio.run(test())
+
+
+def test_failed_lookup_is_an_error_entry_not_an_unknown_place():
+    async def test():
+        orchestrator, _ = _orchestrator()
+        results = await orchestrator.process_batch([
+            ("weather in Hampi", None),
+            ("things to do in Flakyville", None),
+            ("weather in Atlantis", None),
+        ])
+        assert results[0]["data"]["location"] == "Hampi"
+        assert results[1] == {"error": "Couldn't look up 'Flakyville' right now, please try again."}
+        assert "don't know where 'Atlantis' is" in results[2]["text"]
+        # The failure is not cached as "not found"
+        assert orchestrator.geocoder.cache.get("flakyville") == (False, None)
+
+    asyncio.run(test())
+
+
+def test_failed_branch_leaves_the_other_items_intact():
+    async def test():
+        orchestrator, _ = _orchestrator()
+
+        async def get_places(lat, lon, location_name="", radius=30000, category_filter="all"):
+            if location_name == "Hampi":
+                raise ConnectionError("overpass down")
+            return [{"name": "Beach", "lat": lat, "lon": lon, "category": "Beach", "maps_link": "https://maps.test"}]
+
+        orchestrator.places_agent.get_places = get_places
+        results = await orchestrator.process_batch([
+            ("weather and places in Hampi", None),
+            ("places to visit in Gokarna", None),
+        ])
+        assert "places" not in results[0]["data"] and results[0]["data"]["weather"]
+        assert [p["name"] for p in results[1]["data"]["places"]] == ["Beach"]
+
+    asyncio.run(test())
@@ -0,0 +1,99 @@
+import asyncio
+
+from benchmarks.stub_redis import StubRedis
+from utils.cache_backend import KEY_PREFIX, MemoryBackend, RedisBackend, RedisError
+
+
+async def _with_stub_redis(test, **backend_options):
+    stub = StubRedis()
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    backend = RedisBackend(f"redis://127.0.0.1:{port}/0", **backend_options)
+    try:
+        async with server:
+            await test(backend, stub)
+    finally:
+        await backend.close()
+
+
+def test_redis_round_trips():
+    async def test(backend, stub):
+        await backend.set("bytes", b"\x00binary\r\nvalue", ttl=60)
+        assert await backend.get("bytes") == b"\x00binary\r\nvalue"
+        assert await backend.get("missing") is None
+
+        await backend.set_json("geocode:paris", [48.85, 2.35], ttl=60)
+        await backend.set_json("geocode:nowhere", None, ttl=60)
+        assert await backend.get_many_json(["geocode:paris", "geocode:nowhere", "geocode:other"]) == [
+            (True, [48.85, 2.35]),
+            (True, None),
+            (False, None),
+        ]
+
+        await backend.delete("bytes")
+        assert await backend.get("bytes") is None
+        assert KEY_PREFIX.encode() + b"geocode:paris" in stub._data
+        assert backend.stats()["errors"] == 0
+
+    asyncio.run(_with_stub_redis(test))
+
+
+def test_redis_ttl_expires():
+    async def test(backend, _):
+        await backend.set("short", b"value", ttl=0.05)
+        assert await backend.get("short") == b"value"
+        await asyncio.sleep(0.1)
+        assert await backend.get("short") is None
+
+    asyncio.run(_with_stub_redis(test))
+
+
+def test_redis_pipelined_commands_share_connections():
+    async def test(backend, _):
+        await asyncio.gather(*[backend.set(f"k{i}", str(i).encode(), ttl=60) for i in range(50)])
+        values = await asyncio.gather(*[backend.get(f"k{i}") for i in range(50)])
+        assert values == [str(i).encode() for i in range(50)]
+        # Connections went back to the pool, at most one per slot
+        assert 1 <= backend._pool.qsize() <= 4
+
+    asyncio.run(_with_stub_redis(test, pool_size=4))
+
+
+def test_redis_error_reply_keeps_connection():
+    async def test(backend, _):
+        try:
+            await backend._command("NOSUCHCOMMAND")
+        except RedisError:
+            pass
+        else:
+            raise AssertionError("expected an error reply")
+        assert backend._pool.qsize() == 1
+        await backend.set("after", b"ok", ttl=60)
+        assert await backend.get("after") == b"ok"
+
+    asyncio.run(_with_stub_redis(test))
+
+
+def test_redis_unreachable_counts_as_miss():
+    async def run():
+        server = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        await server.wait_closed()
+        backend = RedisBackend(f"redis://127.0.0.1:{port}/0", timeout=0.2)
+        assert await backend.get("key") is None
+        await backend.set("key", b"value", ttl=60)
+        assert backend.errors == 2
+
+    asyncio.run(run())
+
+
+def test_memory_backend_expiry():
+    async def run():
+        backend = MemoryBackend()
+        await backend.set_json("key", {"a": 1}, ttl=60)
+        await backend.set_json("gone", 1, ttl=0.01)
+        await asyncio.sleep(0.02)
+        assert await backend.get_many_json(["key", "gone"]) == [(True, {"a": 1}), (False, None)]
+
+    asyncio.run(run())
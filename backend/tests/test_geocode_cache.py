@@ -0,0 +1,90 @@
+import asyncio
+
+import httpx
+import pytest
+
+from utils.geocode_cache import GeocodeCache, GeocodeStore, normalize_place_key
+from utils.geocoder import Geocoder
+
+
+class FakeNominatim:
+    """Answers Geocoder's HTTP calls from a dict, counting the requests."""
+
+    def __init__(self, places, fail=False):
+        self.places = places
+        self.fail = fail
+        self.requests = 0
+
+    async def get(self, provider, url, params=None):
+        self.requests += 1
+        request = httpx.Request("GET", url, params=params)
+        if self.fail:
+            return httpx.Response(429, request=request)
+        coords = self.places.get(params["q"])
+        body = [{"lat": str(coords[0]), "lon": str(coords[1])}] if coords else []
+        return httpx.Response(200, json=body, request=request)
+
+
+def test_normalized_keys():
+    assert normalize_place_key("  São  Paulo! ") == "sao paulo"
+    assert normalize_place_key("NEW-YORK") == "new york"
+    assert normalize_place_key("?!") == ""
+
+
+def test_gazetteer_answers_without_the_store(tmp_path):
+    store = GeocodeStore(str(tmp_path / "geocode.sqlite3"))
+    cache = GeocodeCache(store=store)
+    hit, coords = cache.get("paris")
+    assert hit and coords == pytest.approx((48.86, 2.32), abs=0.01)
+    assert cache.stats()["gazetteer_hits"] == 1
+    # Promoted to the memory tier
+    cache.get("paris")
+    assert cache.stats()["memory_hits"] == 1
+
+    assert GeocodeCache(store=store, use_gazetteer=False).get("paris") == (False, None)
+
+
+def test_store_survives_a_restart(tmp_path):
+    path = str(tmp_path / "geocode.sqlite3")
+    cache = GeocodeCache(store=GeocodeStore(path))
+    cache.set("hampi", (15.335, 76.46))
+    cache.set("atlantis", None)
+    cache.store.close()
+
+    restarted = GeocodeCache(store=GeocodeStore(path))
+    assert restarted.get("hampi") == (True, (15.335, 76.46))
+    # A cached "not found" is a hit too
+    assert restarted.get("atlantis") == (True, None)
+    assert restarted.stats()["store_hits"] == 2
+    assert restarted.get("elsewhere") == (False, None)
+
+
+def test_negative_entries_expire_first(tmp_path):
+    store = GeocodeStore(str(tmp_path / "geocode.sqlite3"))
+    store.set("atlantis", None, ttl=-1)
+    store.set("hampi", (15.335, 76.46), ttl=60)
+    assert store.get("atlantis") == (False, None)
+    assert store.get("hampi") == (True, (15.335, 76.46))
+    assert GeocodeCache.NEGATIVE_TTL < GeocodeCache.POSITIVE_TTL
+
+
+def test_geocoder_caches_not_found_but_not_errors():
+    async def test():
+        nominatim = FakeNominatim({"Hampi": (15.335, 76.46)})
+        geocoder = Geocoder(http=nominatim, cache=GeocodeCache())
+        assert await geocoder.get_coordinates("Hampi") == (15.335, 76.46)
+        assert await geocoder.get_coordinates("hampi!") == (15.335, 76.46)
+        assert await geocoder.get_coordinates("Atlantis") is None
+        assert await geocoder.get_coordinates("atlantis") is None
+        assert await geocoder.get_coordinates("Paris") is not None
+        # One request per unknown place; the gazetteer answers Paris
+        assert nominatim.requests == 2
+
+        nominatim.fail = True
+        assert await geocoder.get_coordinates("Lost City") is None
+        with pytest.raises(httpx.HTTPStatusError):
+            await geocoder.lookup("Lost City")
+        # Rate limiting is not remembered as "not found"
+        assert geocoder.cache.get("lost city") == (False, None)
+
+    asyncio.run(test())
@@ -0,0 +1,31 @@
+def test_get_chat_revalidates_with_if_none_match(app_client):
+    params = {"message": "weather in Paris"}
+    first = app_client.get("/chat", params=params)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and first.headers["cache-control"].startswith("public, max-age=")
+
+    again = app_client.get("/chat", params=params, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == etag
+
+    # A proxy may have weakened the tag; other tags don't match
+    assert app_client.get("/chat", params=params, headers={"If-None-Match": "W/" + etag}).status_code == 304
+    assert app_client.get("/chat", params=params, headers={"If-None-Match": '"other", ' + etag}).status_code == 304
+    stale = app_client.get("/chat", params=params, headers={"If-None-Match": '"other"'})
+    assert stale.status_code == 200 and stale.json() == first.json()
+
+
+def test_etag_follows_the_answer(app_client):
+    paris = app_client.get("/chat", params={"message": "weather in Paris"}).headers["etag"]
+    tokyo = app_client.get("/chat", params={"message": "weather in Tokyo"})
+    assert tokyo.headers["etag"] != paris
+    assert app_client.get("/chat", params={"message": "weather in Tokyo"}, headers={"If-None-Match": paris}).status_code == 200
+
+
+def test_post_never_answers_304(app_client):
+    first = app_client.post("/chat", json={"message": "places to visit in Paris"})
+    etag = first.headers["etag"]
+    again = app_client.post("/chat", json={"message": "places to visit in Paris"}, headers={"If-None-Match": etag})
+    assert again.status_code == 200 and again.headers["etag"] == etag
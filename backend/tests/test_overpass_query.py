@@ -0,0 +1,93 @@
+import pytest
+
+from agents.overpass_query import OUTPUT_TAGS, DensityEstimator, bounding_box, compile_places_query, tag_statements
+from agents.places_agent import PlacesAgent
+from features.categories import CATEGORY_MAPPINGS, get_category_tags
+
+EXPECTED_STATEMENTS = {
+    "all": [
+        'nwr["tourism"~"^(attraction|museum)$"];',
+        'nwr["historic"~"^(castle|monument)$"];',
+        'nwr["leisure"~"^(garden|park)$"];',
+        'nwr["natural"="peak"];',
+    ],
+    "attractions": [
+        'nwr["tourism"~"^(attraction|viewpoint)$"];',
+        'nwr["historic"="monument"];',
+    ],
+    "food": ['nwr["amenity"~"^(bar|cafe|fast_food|restaurant)$"];'],
+    "shopping": [
+        'nwr["shop"~"^(department_store|mall|supermarket)$"];',
+        'nwr["amenity"="marketplace"];',
+    ],
+    "entertainment": [
+        'nwr["amenity"~"^(arts_centre|cinema|nightclub|theatre)$"];',
+        'nwr["tourism"="museum"];',
+    ],
+    "historic": ['nwr["historic"~"^(archaeological_site|castle|memorial|monument|ruins)$"];'],
+    "nature": [
+        'nwr["leisure"~"^(garden|nature_reserve|park)$"];',
+        'nwr["natural"="beach"];',
+        'nwr["tourism"="zoo"];',
+    ],
+}
+
+
+def test_every_category_is_covered():
+    assert set(EXPECTED_STATEMENTS) == set(CATEGORY_MAPPINGS)
+
+
+@pytest.mark.parametrize("category", sorted(EXPECTED_STATEMENTS))
+def test_compiled_query_per_category(category):
+    query = PlacesAgent._build_query(48.85, 2.35, 15000, category)
+    lines = query.split("\n")
+    south, west, north, east = bounding_box(48.85, 2.35, 15000)
+    assert lines[0] == f"[out:json][timeout:25][maxsize:67108864][bbox:{south},{west},{north},{east}];"
+    assert lines[1] == "("
+    statements = EXPECTED_STATEMENTS[category]
+    assert [line.strip() for line in lines[2:2 + len(statements)]] == statements
+    assert lines[2 + len(statements):-2] == [")->.candidates;", "nwr.candidates(around:15000,48.85,2.35);"]
+    assert lines[-1] == f"out {PlacesAgent.RESULT_LIMIT};"
+    # Only the tags PlaceRecord keeps are sent back, with the element's center
+    convert = lines[-2]
+    assert convert.startswith("convert item ::id=id(), ::geom=center(geom()), ")
+    assert convert.count("=t[") == len(OUTPUT_TAGS)
+
+
+def test_union_query_covers_every_category():
+    query = PlacesAgent._build_union_query(48.85, 2.35, 15000)
+    assert query.endswith(f"out {PlacesAgent.UNION_RESULT_LIMIT};")
+    for category in CATEGORY_MAPPINGS:
+        for key, value in get_category_tags(category):
+            assert f'"{key}"' in query and value in query
+
+
+def test_ring_query_excludes_the_inner_circle():
+    query = PlacesAgent._build_query(48.85, 2.35, 8000, "food", inner_radius=3000)
+    assert "  nwr.candidates(around:8000,48.85,2.35);\n  - nwr.candidates(around:3000,48.85,2.35);" in query
+    # The bbox only needs to hold the outer circle
+    assert f"[bbox:{','.join(map(str, bounding_box(48.85, 2.35, 8000)))}]" in query
+
+
+def test_values_are_escaped():
+    assert tag_statements([("name", 'Caf"e'), ("shop", "a.b"), ("shop", "c|d")]) == [
+        'nwr["name"="Caf\\"e"];',
+        'nwr["shop"~"^(a\\\\.b|c\\\\|d)$"];',
+    ]
+    assert compile_places_query([("tourism", "museum")], 0.0, 0.0, 1000, limit=20).endswith("out 20;")
+
+
+def test_density_shrinks_capped_areas_in_steps():
+    density = DensityEstimator()
+    tags = get_category_tags("food")
+    assert density.radius_for(48.85, 2.35, 15000, 500, tags) == 15000
+    # A capped 15km search: the area holds at least this many
+    density.observe(48.85, 2.35, 15000, 500, 500, tags)
+    radius = density.radius_for(48.85, 2.35, 15000, 500, tags)
+    assert radius in DensityEstimator.RADIUS_STEPS and radius < 15000
+    # Other tag sets and caps in the same area are unaffected
+    assert density.radius_for(48.85, 2.35, 15000, 500, get_category_tags("nature")) == 15000
+    assert density.radius_for(48.85, 2.35, 15000, 3000, tags) == 15000
+    # An uncapped search that fits keeps the full radius
+    density.observe(40.71, -74.0, 15000, 120, 500, tags)
+    assert density.radius_for(40.71, -74.0, 15000, 500, tags) == 15000
@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from utils.overpass_stream import OverpassStreamError, OverpassStreamParser
+
+DOCUMENT = {
+    "version": 0.6,
+    "generator": "Overpass API",
+    "osm3s": {"copyright": "The data included in this document is from www.openstreetmap.org."},
+    "elements": [
+        {"type": "node", "id": 1, "lat": 48.8584, "lon": 2.2945, "tags": {"name": "Tour Eiffel", "tourism": "attraction"}},
+        {"type": "way", "id": 2, "center": {"lat": 48.8606, "lon": 2.3376}, "tags": {"name": "Musée du Louvre", "note": "a ] in \"quotes\", {braces}"}},
+        {"type": "relation", "id": 3, "tags": {"name": "Café ☕"}},
+    ],
+}
+
+
+def _parse(body: bytes, chunk_size: int):
+    parser = OverpassStreamParser()
+    elements = []
+    for i in range(0, len(body), chunk_size):
+        elements.extend(parser.feed(body[i:i + chunk_size]))
+    parser.close()
+    return elements
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1 << 16])
+def test_chunk_boundaries_anywhere(chunk_size):
+    # One byte at a time splits multi-byte UTF-8 characters and every token
+    body = json.dumps(DOCUMENT, ensure_ascii=False, indent=1).encode("utf-8")
+    assert _parse(body, chunk_size) == DOCUMENT["elements"]
+
+
+def test_compact_and_empty_arrays():
+    assert _parse(json.dumps(DOCUMENT, separators=(",", ":")).encode(), 5) == DOCUMENT["elements"]
+    assert _parse(b'{"version":0.6,"elements":[]}', 4) == []
+
+
+def test_truncated_response_raises():
+    body = json.dumps(DOCUMENT).encode()
+    with pytest.raises(OverpassStreamError):
+        _parse(body[:len(body) // 2], 16)
+
+
+def test_elements_yielded_as_they_complete():
+    parser = OverpassStreamParser()
+    body = json.dumps(DOCUMENT).encode()
+    first_end = body.index(b"}}") + 2
+    assert [element["id"] for element in parser.feed(body[:first_end])] == [1]
+    assert [element["id"] for element in parser.feed(body[first_end:])] == [2, 3]
+    assert parser.elements_parsed == 3
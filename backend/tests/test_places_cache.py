@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from agents.place_records import parse_place
+from agents.places_agent import PlacesAgent
+from agents.ranking import CandidateList
+from utils.spatial import geohash_bounds, geohash_center, geohash_encode, precision_for_radius, snap_to_cell
+
+
+def _places(lat, lon, count=3):
+    return CandidateList(
+        parse_place({"lat": lat + i * 0.001, "lon": lon, "tags": {"name": f"Museum {i}", "tourism": "museum"}})
+        for i in range(count)
+    )
+
+
+def _agent(**options):
+    agent = PlacesAgent(poi_store=None, **options)
+    queries = []
+
+    async def fetch_candidates(query):
+        queries.append(query)
+        return _places(48.85, 2.35)
+
+    agent._fetch_candidates = fetch_candidates
+    return agent, queries
+
+
+def test_geohash_round_trip():
+    assert geohash_encode(42.6, -5.6, 5) == "ezs42"
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds("ezs42")
+    assert min_lat <= 42.6 <= max_lat and min_lon <= -5.6 <= max_lon
+    assert geohash_center("ezs42") == pytest.approx((42.6, -5.6), abs=0.03)
+
+
+def test_cell_size_follows_radius():
+    assert precision_for_radius(30000) == 5
+    assert precision_for_radius(3000) == 7
+    # Cells stay small next to the search circle
+    assert precision_for_radius(30000) < precision_for_radius(3000)
+
+
+def test_nearby_points_snap_to_one_cell():
+    cell, lat, lon = snap_to_cell(48.8566, 2.3522, 30000)
+    assert snap_to_cell(48.8570, 2.3530, 30000) == (cell, lat, lon)
+    assert snap_to_cell(48.8566, 2.3522, 3000)[0] != cell
+    assert snap_to_cell(51.5074, -0.1278, 30000)[0] != cell
+
+
+def test_nearby_searches_share_one_fetch():
+    async def test():
+        agent, queries = _agent(fetch_mode="category", search_mode="fixed")
+        first = await agent.get_places(48.8566, 2.3522, "Paris", category_filter="all")
+        second = await agent.get_places(48.8570, 2.3530, "Paris", category_filter="all")
+        assert len(queries) == 1
+        assert [place["name"] for place in first] == [place["name"] for place in second]
+
+        # The query is centered on the cell, not on either geocode
+        _, cell_lat, cell_lon = snap_to_cell(48.8566, 2.3522, 30000)
+        assert f"(around:30000,{cell_lat},{cell_lon})" in queries[0]
+
+        # Another category or area is a separate entry
+        await agent.get_places(48.8566, 2.3522, "Paris", category_filter="food")
+        await agent.get_places(51.5074, -0.1278, "London", category_filter="all")
+        assert len(queries) == 3
+
+    asyncio.run(test())
+
+
+def test_upstream_errors_are_not_cached():
+    async def test():
+        agent, queries = _agent(fetch_mode="category", search_mode="fixed")
+        healthy = agent._fetch_candidates
+
+        async def failing(query):
+            raise ConnectionError("overpass down")
+
+        agent._fetch_candidates = failing
+        assert await agent.get_places(48.8566, 2.3522, "Paris") == []
+        agent._fetch_candidates = healthy
+        assert len(await agent.get_places(48.8566, 2.3522, "Paris")) == 3
+        assert len(queries) == 1
+
+    asyncio.run(test())
@@ -0,0 +1,83 @@
+import asyncio
+
+from agents.place_records import parse_place
+from agents.places_agent import PlacesAgent
+from agents.poi_index import PoiIndex
+from agents.ranking import CandidateList
+from features.categories import get_category_tags
+
+AREA = [
+    ("Louvre", {"tourism": "museum"}),
+    ("Café de Flore", {"amenity": "cafe"}),
+    ("Jardin du Luxembourg", {"leisure": "garden"}),
+    ("Le Procope", {"amenity": "restaurant"}),
+    ("Parc Monceau", {"leisure": "park"}),
+    ("Odéon", {"amenity": "theatre"}),
+]
+
+
+def _records(places):
+    return CandidateList(
+        parse_place({"lat": 48.85 + i * 0.001, "lon": 2.35, "tags": dict(tags, name=name)})
+        for i, (name, tags) in enumerate(places)
+    )
+
+
+def _agent(**options):
+    """PlacesAgent whose union queries return AREA and per-category queries one food place."""
+    agent = PlacesAgent(poi_store=None, fetch_mode="union", **options)
+    queries = []
+
+    async def fetch_candidates(query):
+        union = f"out {PlacesAgent.UNION_RESULT_LIMIT};" in query
+        queries.append("union" if union else "category")
+        return _records(AREA if union else [("Bouillon Chartier", {"amenity": "restaurant"})])
+
+    agent._fetch_candidates = fetch_candidates
+    return agent, queries
+
+
+def test_filter_matches_category_tags_in_response_order():
+    records = _records(AREA)
+    index = PoiIndex(records)
+    assert index.complete
+    for category in ("all", "food", "nature", "entertainment", "shopping"):
+        tags = set(get_category_tags(category))
+        expected = [r.name for r in records if any((key, r.tags.get(key)) in tags for key, _ in tags)]
+        assert [r.name for r in index.filter(category)] == expected
+    assert [r.name for r in index.filter("food")] == ["Café de Flore", "Le Procope"]
+
+
+def test_complete_union_answers_every_category():
+    async def test():
+        agent, queries = _agent(search_mode="fixed")
+        food = await agent.get_places(48.85, 2.35, "Paris", category_filter="food")
+        nature = await agent.get_places(48.85, 2.35, "Paris", category_filter="nature")
+        assert queries == ["union"]
+        assert {place["name"] for place in food} == {"Café de Flore", "Le Procope"}
+        assert {place["name"] for place in nature} == {"Jardin du Luxembourg", "Parc Monceau"}
+
+    asyncio.run(test())
+
+
+def test_truncated_union_falls_back_to_category_query():
+    async def test():
+        agent, queries = _agent(search_mode="fixed")
+        # The union fetch returns as many elements as its cap: an arbitrary slice
+        agent.UNION_RESULT_LIMIT = len(AREA)
+        food = await agent.get_places(48.85, 2.35, "Paris", category_filter="food")
+        assert queries == ["union", "category"]
+        assert [place["name"] for place in food] == ["Bouillon Chartier"]
+
+    asyncio.run(test())
+
+
+def test_truncated_union_ring_falls_back_to_category_ring():
+    async def test():
+        agent, queries = _agent(search_mode="adaptive")
+        agent.UNION_RESULT_LIMIT = len(AREA)
+        food = await agent.get_places(48.85, 2.35, "Paris", radius=3000, category_filter="food")
+        assert queries == ["union", "category"]
+        assert [place["name"] for place in food] == ["Bouillon Chartier"]
+
+    asyncio.run(test())
@@ -0,0 +1,104 @@
+import asyncio
+import random
+
+import pytest
+
+from agents.place_records import parse_place
+from agents.places_agent import PlacesAgent
+from agents.ranking import CandidateList
+from features.categories import get_category_tags
+from utils.spatial import haversine_distance
+
+np = pytest.importorskip("numpy")
+
+from utils.poi_store import PoiStore, write_poi_store  # noqa: E402
+
+# Around Paris, 1.0 x 1.4 degrees
+BBOX = (48.35, 1.65, 49.35, 3.05)
+TAGS = [("tourism", "museum"), ("amenity", "cafe"), ("leisure", "park"), ("historic", "monument"), ("shop", "bakery")]
+
+
+def _records(n=400, seed=0):
+    rnd = random.Random(seed)
+    records = []
+    for i in range(n):
+        key, value = rnd.choice(TAGS)
+        tags = {"name": f"Place {i}", key: value}
+        if rnd.random() < 0.3:
+            tags["wikipedia"] = f"fr:Place {i}"
+        if rnd.random() < 0.3:
+            tags["opening_hours"] = "Mo-Su 09:00-18:00"
+        records.append(parse_place({"lat": rnd.uniform(BBOX[0], BBOX[2]), "lon": rnd.uniform(BBOX[1], BBOX[3]), "tags": tags}))
+    return records
+
+
+@pytest.fixture
+def store(tmp_path):
+    records = _records()
+    path = str(tmp_path / "paris.poi")
+    assert write_poi_store(path, records, BBOX) == len(records)
+    store = PoiStore(path)
+    yield store, records
+    store.close()
+
+
+def test_coverage_needs_the_whole_circle(store):
+    store, _ = store
+    assert store.covers(48.85, 2.35, 15000)
+    # The center is inside, but the circle crosses the extract's edge
+    assert not store.covers(48.40, 2.35, 15000)
+    assert not store.covers(51.50, -0.12, 1000)
+
+
+@pytest.mark.parametrize("category", ["all", "food", "nature", "entertainment"])
+def test_query_matches_a_scan_of_the_records(store, category):
+    store, records = store
+    tags = set(get_category_tags(category))
+    expected = [
+        r for r in records
+        if any((key, r.tags.get(key)) in tags for key, _ in tags)
+        and haversine_distance(48.85, 2.35, r.lat, r.lon) * 1000 <= 15000
+    ]
+    found = store.query(48.85, 2.35, 15000, list(tags))
+    # In extract order, with the tags and scores the ranking uses
+    assert [(r.name, r.category, r.static_score, r.metadata_count) for r in found] == \
+        [(r.name, r.category, r.static_score, r.metadata_count) for r in expected]
+    assert PlacesAgent._rank_places(found, 48.85, 2.35) == PlacesAgent._rank_places(CandidateList(expected), 48.85, 2.35)
+
+
+def _agent(store):
+    agent = PlacesAgent(poi_store=store, fetch_mode="category", search_mode="fixed")
+    queries = []
+
+    async def fetch_candidates(query):
+        queries.append(query)
+        return CandidateList([parse_place({"lat": 51.5, "lon": -0.12, "tags": {"name": "From Overpass", "tourism": "museum"}})])
+
+    agent._fetch_candidates = fetch_candidates
+    return agent, queries
+
+
+def test_covered_searches_skip_overpass(store):
+    async def test():
+        agent, queries = _agent(store[0])
+        places = await agent.get_places(48.85, 2.35, "Paris", radius=15000, category_filter="food")
+        assert places and all(place["category"] == "Cafe" for place in places)
+        assert queries == []
+
+    asyncio.run(test())
+
+
+def test_uncovered_or_failing_searches_use_overpass(store):
+    async def test():
+        agent, queries = _agent(store[0])
+        assert [p["name"] for p in await agent.get_places(51.5, -0.12, "London", radius=15000)] == ["From Overpass"]
+        assert len(queries) == 1
+
+        def broken(*args):
+            raise ValueError("corrupt store")
+
+        agent.poi_store.query = broken
+        assert [p["name"] for p in await agent.get_places(48.85, 2.35, "Paris", radius=15000)] == ["From Overpass"]
+        assert len(queries) == 2
+
+    asyncio.run(test())
@@ -0,0 +1,49 @@
+import pytest
+
+from agents.orchestrator import Orchestrator
+from agents.query_parser import QueryParser, parse_query
+from benchmarks.bench_query_parser import DEFAULT_CORPUS, load_corpus
+
+# The reference methods don't touch any agent state
+REFERENCE = Orchestrator.__new__(Orchestrator)
+
+EDGE_CASES = [
+    "",
+    "   ",
+    "hi",
+    "Hello",
+    "temperature",
+    "Is it hot or cold in Cairo right now?",
+    "temperatures at Oslo",
+    "attemp to visit Rome",
+    "hotel near Hot Springs",
+    "I'm planning a trip. What should I see?",
+    "go to",
+    "rainforest tours in Manaus",
+    "climate of Lima",
+    "Where can I go to do things in New York City please",
+    "what about London, weather and places to visit",
+    "Bangalore temp",
+]
+
+
+@pytest.mark.parametrize("query", load_corpus(DEFAULT_CORPUS) + EDGE_CASES)
+def test_matches_reference(query):
+    parsed = parse_query(query)
+    assert parsed.intent == REFERENCE._determine_intent(query)
+    assert parsed.location == REFERENCE._extract_location(query)
+
+
+def test_keywords_are_reported():
+    assert parse_query("weather and places in Paris").keywords == ("weather", "places")
+    # Overlapping keywords are all found, longest first at the same position
+    assert parse_query("temperature in Oslo").keywords == ("temperature",)
+
+
+def test_results_are_memoized():
+    parse_query.cache_clear()
+    parser = QueryParser()
+    first = parser.parse("Things to do in Lisbon")
+    assert parser.parse("Things to do in Lisbon") is first
+    info = QueryParser.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
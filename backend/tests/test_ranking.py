@@ -0,0 +1,50 @@
+import pytest
+
+from agents.place_records import parse_place
+from agents.places_agent import PlacesAgent
+from agents.ranking import CandidateList, RankingEngine, TopKAccumulator
+from benchmarks.bench_ranking import accumulator_top_k, legacy_scores, make_candidates
+
+LAT, LON = 48.8566, 2.3522
+
+needs_numpy = pytest.mark.skipif(not RankingEngine.available, reason="NumPy not installed")
+
+
+@needs_numpy
+@pytest.mark.parametrize("n", [1, 7, 60, 500, 3000])
+def test_scores_match_reference(n):
+    candidates = make_candidates(n, LAT, LON, seed=n)
+    assert RankingEngine().score(candidates, LAT, LON).tolist() == legacy_scores(candidates, LAT, LON)
+
+
+@needs_numpy
+@pytest.mark.parametrize("n,k", [(0, 5), (3, 5), (60, 1), (60, 5), (500, 5), (500, 40), (3000, 5)])
+def test_top_k_matches_reference_order(n, k):
+    candidates = make_candidates(n, LAT, LON, seed=n + k)
+    expected = PlacesAgent._select_top_places(candidates, LAT, LON, k)
+    engine_top = [candidates[i] for i in RankingEngine().top_k(candidates, LAT, LON, k)]
+    assert [id(c) for c in engine_top] == [id(c) for c in expected]
+    # A cached candidate list reuses its columns and ranks the same
+    cached = CandidateList(candidates)
+    RankingEngine.to_columns(cached)
+    assert [cached[i] for i in RankingEngine().top_k(cached, LAT, LON, k)] == expected
+
+
+@pytest.mark.parametrize("n,k", [(0, 5), (3, 5), (60, 5), (500, 5), (500, 40)])
+def test_accumulator_matches_reference_order(n, k):
+    candidates = make_candidates(n, LAT, LON, seed=n + k)
+    expected = PlacesAgent._select_top_places(candidates, LAT, LON, k)
+    assert [id(c) for c in accumulator_top_k(candidates, LAT, LON, k)] == [id(c) for c in expected]
+
+
+@needs_numpy
+def test_ties_keep_response_order():
+    # Identical scores everywhere: the stable sort keeps the Overpass order
+    candidates = [parse_place({"lat": LAT, "lon": LON, "tags": {"name": f"Spot {i}", "tourism": "attraction"}}) for i in range(20)]
+    expected = [c.name for c in candidates[:5]]
+    assert [c.name for c in PlacesAgent._select_top_places(candidates, LAT, LON, 5)] == expected
+    assert [candidates[i].name for i in RankingEngine().top_k(candidates, LAT, LON, 5)] == expected
+    accumulator = TopKAccumulator(LAT, LON, 5)
+    for record in candidates:
+        accumulator.add(record)
+    assert [c.name for c in accumulator.result()] == expected
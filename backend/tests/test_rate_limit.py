@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from agents.places_agent import PlacesAgent
+from utils.metrics import BRANCH_OUTCOMES
+from utils.rate_limit import AdaptiveConcurrencyLimit, ProviderThrottle, RateLimitPolicy, TokenBucket, UpstreamBusy
+
+
+def test_aimd_grows_on_fast_responses_and_halves_on_overload():
+    limit = AdaptiveConcurrencyLimit(RateLimitPolicy(initial_concurrency=4, max_concurrency=6, latency_target=1.0))
+    for _ in range(40):
+        limit.in_flight += 1
+        limit.release(latency=0.1, overloaded=False)
+    assert limit.effective_limit == 6
+
+    limit.in_flight += 1
+    limit.release(latency=0.1, overloaded=True)
+    assert limit.effective_limit == 3
+    # Same congestion episode: not cut again within the window
+    limit.in_flight += 1
+    limit.release(latency=0.1, overloaded=True)
+    assert limit.effective_limit == 3
+
+
+def test_aimd_never_below_minimum():
+    limit = AdaptiveConcurrencyLimit(RateLimitPolicy(min_concurrency=2, initial_concurrency=4, latency_target=0.0))
+    for _ in range(10):
+        limit.in_flight += 1
+        limit.release(latency=5.0, overloaded=True)
+    assert limit.effective_limit == 2
+
+
+def test_concurrency_waiter_times_out():
+    async def test():
+        limit = AdaptiveConcurrencyLimit(RateLimitPolicy(initial_concurrency=1))
+        await limit.acquire(1.0)
+        with pytest.raises(UpstreamBusy):
+            await limit.acquire(0.05)
+        assert not limit._waiters
+        limit.release(0.1, False)
+        assert limit.in_flight == 0
+
+    asyncio.run(test())
+
+
+def test_token_bucket_reserves_in_order():
+    bucket = TokenBucket(rate=10.0, burst=1)
+    assert bucket.reserve(1.0) == 0.0
+    assert bucket.reserve(1.0) == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve(1.0) == pytest.approx(0.2, abs=0.01)
+    with pytest.raises(UpstreamBusy):
+        bucket.reserve(0.1)
+
+
+def test_rejected_acquire_refunds_its_token():
+    async def test():
+        throttle = ProviderThrottle("test", RateLimitPolicy(rate=1.0, burst=1, initial_concurrency=1, max_concurrency=1, max_wait=0.1))
+        throttle.bucket._tokens = 3.0
+        throttle.bucket.burst = 3
+        await throttle.acquire()
+        for _ in range(3):
+            with pytest.raises(UpstreamBusy):
+                await throttle.acquire()
+        assert throttle.rejected == 3
+        # Only the call that ran spent a token
+        assert throttle.bucket._tokens == pytest.approx(2.0, abs=0.5)
+
+    asyncio.run(test())
+
+
+def test_cancelled_acquire_refunds_its_token():
+    async def test():
+        throttle = ProviderThrottle("test", RateLimitPolicy(rate=1.0, burst=1, max_wait=5.0))
+        await throttle.acquire()
+        waiter = asyncio.create_task(throttle.acquire())
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert throttle.bucket._tokens == pytest.approx(0.0, abs=0.1)
+
+    asyncio.run(test())
+
+
+def test_throttled_place_search_is_counted():
+    async def test():
+        agent = PlacesAgent(poi_store=None, fetch_mode="category", search_mode="fixed")
+
+        async def busy(query):
+            raise UpstreamBusy("overpass: no concurrency slot within 0.1s")
+
+        agent._fetch_candidates = busy
+        before = BRANCH_OUTCOMES.value(branch="places", outcome="error")
+        assert await agent.get_places(48.85, 2.35, "Paris") == []
+        agent.search_mode = "adaptive"
+        assert await agent.get_places(48.85, 2.35, "Paris") == []
+        assert BRANCH_OUTCOMES.value(branch="places", outcome="error") == before + 2
+
+    asyncio.run(test())
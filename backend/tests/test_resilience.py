@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import pytest
+
+from utils.resilience import CircuitBreaker, CircuitOpen, EndpointHealth, MirrorPool
+
+
+def test_breaker_opens_then_probes():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=0.05)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # One probe at a time
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allows()
+
+
+def test_cancelled_probe_frees_the_probe_slot():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.0)
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_cancelled()
+    breaker.before_call()
+
+
+def _pool(urls, **options):
+    health = {}
+    return MirrorPool(urls, lambda url: health.setdefault(url, EndpointHealth(url)), **options), health
+
+
+def test_hedge_to_next_mirror_when_slow():
+    async def test():
+        pool, _ = _pool(["slow", "fast"], default_hedge_delay=0.05, min_hedge_delay=0.01)
+        finished = []
+
+        async def call(url):
+            try:
+                await asyncio.sleep(1.0 if url == "slow" else 0.01)
+                return url
+            finally:
+                finished.append(url)
+
+        assert await pool.call(call) == "fast"
+        assert pool.hedged == 1
+        # The losing attempt has been cancelled and has finished by the time call() returns
+        assert sorted(finished) == ["fast", "slow"]
+
+    asyncio.run(test())
+
+
+def test_failover_on_error():
+    async def test():
+        pool, _ = _pool(["broken", "ok"], default_hedge_delay=5.0)
+
+        async def call(url):
+            if url == "broken":
+                raise ConnectionError("refused")
+            return url
+
+        assert await pool.call(call) == "ok"
+        assert pool.hedged == 0
+
+    asyncio.run(test())
+
+
+def test_open_mirrors_are_skipped():
+    async def test():
+        pool, health = _pool(["a", "b"])
+        for _ in range(5):
+            pool.health("a").record(1.0, ok=False)
+        assert pool.ranked() == ["b"]
+        for _ in range(5):
+            pool.health("b").record(1.0, ok=False)
+        with pytest.raises(CircuitOpen):
+            await pool.call(lambda url: asyncio.sleep(0))
+
+    asyncio.run(test())
@@ -0,0 +1,77 @@
+import gzip
+
+from agents.response_schema import canonical_fields, parse_fields, project
+from utils.serialization import COMPRESSION_MIN_BYTES, compress, negotiate_encoding
+
+ANSWER = {
+    "text": "Here are some places",
+    "data": {
+        "location": "Paris",
+        "weather": {"current": {"temperature_2m": 14.2}, "daily": {"temperature_2m_max": [15.1]}},
+        "places": [{"name": "Louvre", "lat": 48.86, "category": "Museum"}, {"name": "Orsay", "lat": 48.86, "category": "Museum"}],
+    },
+}
+
+
+def test_parse_fields():
+    assert parse_fields(None) is None and parse_fields(" , ") is None
+    assert parse_fields("text, data.places.name,data.weather.current") == {
+        "text": None, "data": {"places": {"name": None}, "weather": {"current": None}},
+    }
+    # A shorter path selects the whole subtree, in either order
+    assert parse_fields("data.places.name,data") == parse_fields("data,data.places.name") == {"data": None}
+
+
+def test_projection_keeps_selected_paths_through_lists():
+    projected = project(ANSWER, parse_fields("text,data.places.name,data.weather.current,data.missing"))
+    assert projected == {
+        "text": "Here are some places",
+        "data": {"weather": {"current": {"temperature_2m": 14.2}}, "places": [{"name": "Louvre"}, {"name": "Orsay"}]},
+    }
+    assert project(ANSWER, None) is ANSWER
+
+
+def test_canonical_fields_ignore_order():
+    assert canonical_fields(parse_fields("data.places.name,text")) == canonical_fields(parse_fields("text,data.places.name")) == "data(places(name)),text"
+
+
+def test_fields_on_the_endpoints(app_client):
+    full = app_client.get("/chat", params={"message": "weather and places in Paris"})
+    projected = app_client.get("/chat", params={"message": "weather and places in Paris", "fields": "data.location,data.places.name"})
+    assert projected.json() == {"data": {"location": "Paris", "places": [{"name": p["name"]} for p in full.json()["data"]["places"]]}}
+    # Each projection has its own validator
+    assert projected.headers["etag"] != full.headers["etag"]
+
+    batch = app_client.post("/chat/batch", params={"fields": "data.location"}, json=[{"message": "weather in Paris"}, {"message": "weather in Tokyo"}])
+    assert batch.json() == {"results": [{"data": {"location": "Paris"}}, {"data": {"location": "Tokyo"}}]}
+
+
+def test_encoding_negotiation():
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip;q=0, deflate") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("*;q=0.5, br;q=0") == "gzip"
+
+    body = b'{"text":"' + b"x" * COMPRESSION_MIN_BYTES + b'"}'
+    compressed, coding = compress(body, "gzip")
+    assert coding == "gzip" and gzip.decompress(compressed) == body
+    assert compress(b"{}", "gzip") == (b"{}", None)
+
+
+def test_gzip_on_the_endpoint(app_client):
+    params = {"message": "places to visit in Paris"}
+    plain = app_client.get("/chat", params=params, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert len(plain.content) >= COMPRESSION_MIN_BYTES
+
+    zipped = app_client.get("/chat", params=params, headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["vary"] == "Accept-Encoding"
+    # The client decodes the body; the compressed one is no longer byte-identical, so its tag is weak
+    assert zipped.json() == plain.json()
+    assert zipped.headers["etag"] == "W/" + plain.headers["etag"]
+
+    # Small bodies are sent as is
+    small = app_client.get("/chat", params={"message": "hello", "fields": "text"}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
@@ -0,0 +1,73 @@
+import asyncio
+import re
+
+from agents.place_records import parse_place
+from agents.places_agent import PlacesAgent
+from agents.ranking import CandidateList
+
+
+def _ring(outer, good, poor):
+    """Candidates of one ring: `good` with a high place-only score, `poor` without."""
+    places = [(f"Museum {outer}-{i}", {"tourism": "museum"}) for i in range(good)]
+    places += [(f"Small unnamed local corner spot {outer}-{i}", {"tourism": "attraction"}) for i in range(poor)]
+    return CandidateList(parse_place({"lat": 48.85, "lon": 2.35, "tags": dict(tags, name=name)}) for name, tags in places)
+
+
+def _agent(rings):
+    """Adaptive PlacesAgent; rings maps an outer radius to (good, poor) counts."""
+    agent = PlacesAgent(poi_store=None, fetch_mode="category", search_mode="adaptive")
+    fetched = []
+
+    async def fetch_candidates(query):
+        radii = [int(r) for r in re.findall(r"around:(\d+),", query)]
+        fetched.append(tuple(radii))
+        return _ring(radii[0], *rings.get(radii[0], (0, 0)))
+
+    agent._fetch_candidates = fetch_candidates
+    return agent, fetched
+
+
+def test_good_candidates_are_scored_as_such():
+    assert _ring(1, 1, 0)[0].static_score >= PlacesAgent.GOOD_STATIC_SCORE
+    assert _ring(1, 0, 1)[0].static_score < PlacesAgent.GOOD_STATIC_SCORE
+
+
+def test_dense_center_stops_after_first_ring():
+    async def test():
+        agent, fetched = _agent({3000: (PlacesAgent.ENOUGH_GOOD_CANDIDATES, 10)})
+        places = await agent.get_places(48.85, 2.35, "Paris")
+        assert fetched == [(3000,)]
+        assert len(places) == 5
+
+    asyncio.run(test())
+
+
+def test_stops_at_the_ring_reaching_enough_good_candidates():
+    async def test():
+        # Poor candidates don't count towards the stop condition
+        agent, fetched = _agent({3000: (10, 100), 8000: (14, 0), 15000: (1, 0), 30000: (50, 0)})
+        await agent.get_places(48.85, 2.35, "Paris")
+        assert fetched == [(3000,), (8000, 3000), (15000, 8000)]
+
+    asyncio.run(test())
+
+
+def test_sparse_area_searches_the_whole_radius():
+    async def test():
+        agent, fetched = _agent({3000: (1, 0), 8000: (2, 5)})
+        places = await agent.get_places(48.85, 2.35, "Hampi", radius=10000)
+        # Rings beyond the requested radius are never searched
+        assert fetched == [(3000,), (8000, 3000), (10000, 8000)]
+        assert len(places) == 5
+
+    asyncio.run(test())
+
+
+def test_inner_rings_are_reused():
+    async def test():
+        agent, fetched = _agent({3000: (2, 0), 8000: (2, 0)})
+        await agent.get_places(48.85, 2.35, "Paris", radius=8000)
+        await agent.get_places(48.85, 2.35, "Paris", radius=30000)
+        assert fetched == [(3000,), (8000, 3000), (15000, 8000), (30000, 15000)]
+
+    asyncio.run(test())
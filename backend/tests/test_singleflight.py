@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+
+from utils.deadline import deadline_scope, remaining
+from utils.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    async def test():
+        group = SingleFlight("test")
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "value"
+
+        assert await asyncio.gather(*[group.do("key", fetch) for _ in range(5)]) == ["value"] * 5
+        assert calls == 1
+        assert group.stats()["coalesced"] == 4
+        assert group.in_flight() == 0
+
+    asyncio.run(test())
+
+
+def test_finished_calls_are_not_reused():
+    async def test():
+        group = SingleFlight("test")
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            return calls
+
+        assert await group.do("key", fetch) == 1
+        assert await group.do("key", fetch) == 2
+        # Different keys never share
+        assert await asyncio.gather(group.do("a", fetch), group.do("b", fetch)) == [3, 4]
+
+    asyncio.run(test())
+
+
+def test_one_waiter_leaving_does_not_cancel_the_others():
+    async def test():
+        group = SingleFlight("test")
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "value"
+
+        impatient = asyncio.create_task(asyncio.wait_for(group.do("key", fetch), 0.01))
+        patient = asyncio.create_task(group.do("key", fetch))
+        with pytest.raises(asyncio.TimeoutError):
+            await impatient
+        assert await patient == "value"
+        assert group.stats()["abandoned"] == 0
+
+    asyncio.run(test())
+
+
+def test_errors_reach_every_waiter():
+    async def test():
+        group = SingleFlight("test")
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream failed")
+
+        results = await asyncio.gather(*[group.do("key", fetch) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert group.in_flight() == 0
+
+    asyncio.run(test())
+
+
+def test_shared_call_runs_under_latest_waiter_deadline():
+    async def test():
+        group = SingleFlight("test")
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return remaining(30.0)
+
+        async def caller(seconds):
+            with deadline_scope(seconds):
+                return await group.do("key", fetch)
+
+        first, second = await asyncio.gather(caller(1.0), caller(3.0))
+        assert first == second == pytest.approx(3.0, abs=0.1)
+
+        # A caller without a deadline (e.g. a background refresh) lifts it
+        with deadline_scope(1.0):
+            assert await group.do("other", fetch) == pytest.approx(1.0, abs=0.1)
+        assert await group.do("other", fetch) == 30.0
+
+    asyncio.run(test())
+
+
+def test_call_cancelled_once_every_waiter_gave_up():
+    async def test():
+        group = SingleFlight("test")
+        started = cancelled = 0
+
+        async def fetch():
+            nonlocal started, cancelled
+            started += 1
+            try:
+                await asyncio.sleep(1.0)
+            except asyncio.CancelledError:
+                cancelled += 1
+                raise
+            return "late"
+
+        results = await asyncio.gather(
+            asyncio.wait_for(group.do("key", fetch), 0.02),
+            asyncio.wait_for(group.do("key", fetch), 0.05),
+            return_exceptions=True,
+        )
+        assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+        await asyncio.sleep(0)
+        assert (started, cancelled) == (1, 1)
+        assert group.stats()["abandoned"] == 1
+
+        # The next caller starts a fresh call instead of joining the cancelled one
+        async def quick():
+            return "fresh"
+        assert await group.do("key", quick) == "fresh"
+
+    asyncio.run(test())
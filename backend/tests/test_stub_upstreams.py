@@ -0,0 +1,33 @@
+from starlette.testclient import TestClient
+
+from agents.overpass_query import compile_places_query
+from benchmarks.stub_upstreams import FaultInjector, create_app
+from features.categories import get_category_tags
+
+
+def _client(provider):
+    return TestClient(create_app(provider, FaultInjector(0, 0.0, 503, seed=0)))
+
+
+def test_recorded_responses_are_replayed():
+    paris = _client("nominatim").get("/search", params={"q": " PARIS "}).json()
+    assert paris[0]["osm_id"] == 7444
+    weather = _client("open_meteo").get("/v1/forecast", params={"latitude": "48.9", "longitude": "2.3"}).json()
+    assert weather["timezone"] == "Europe/Paris"
+    summary = _client("wikipedia").get("/en/api/rest_v1/page/summary/Eiffel_Tower").json()
+    assert summary["title"] == "Eiffel Tower"
+
+
+def test_recorded_places_are_filtered_like_overpass():
+    query = compile_places_query(get_category_tags("food"), 48.8534951, 2.3483915, 5000)
+    elements = _client("overpass").get("/api/interpreter", params={"data": query}).json()["elements"]
+    assert sorted(e["tags"]["name"] for e in elements) == ["Café de Flore", "Le Procope"]
+    assert elements[0]["type"] == "item"
+
+
+def test_unrecorded_requests_get_synthetic_answers():
+    client = _client("nominatim")
+    first = client.get("/search", params={"q": "Nowhere Town"}).json()[0]
+    again = client.get("/search", params={"q": "nowhere town"}).json()[0]
+    assert (first["lat"], first["lon"]) == (again["lat"], again["lon"])
+    assert "osm_id" not in first
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import time
+
+from agents.orchestrator import Orchestrator
+from agents.place_records import parse_place
+from agents.ranking import CandidateList
+from agents.warmup import HotDestinations, WarmupScheduler
+
+
+def test_categories_follow_requests():
+    hot = HotDestinations()
+    assert hot.categories("Paris") == ["all"]
+    hot.record("Paris", "food")
+    hot.record("paris", "food")
+    hot.record("Paris", "nature")
+    hot.record("Paris", "all")
+    # Weather-only requests count for the destination but no category
+    hot.record("Paris")
+    assert hot.categories("PARIS") == ["all", "food", "nature"]
+    assert hot.top(5) == ["Paris"]
+
+
+def test_unused_categories_decay_away():
+    hot = HotDestinations()
+    hot.record("Rome", "food")
+    for _ in range(10):
+        hot.record("Rome", "historic")
+    for _ in range(40):
+        hot.decay()
+    assert hot.categories("Rome") == ["all", "historic"]
+
+
+def test_log_round_trip_and_old_format(tmp_path):
+    path = str(tmp_path / "destinations.json")
+    hot = HotDestinations(path)
+    hot.record("Tokyo", "shopping")
+    hot.save()
+    assert HotDestinations(path).categories("Tokyo") == ["all", "shopping"]
+
+    # Written before category filters were tracked
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"lisbon": ["Lisbon", 3.0]}, f)
+    old = HotDestinations(path)
+    assert old.top(5) == ["Lisbon"]
+    assert old.categories("Lisbon") == ["all"]
+
+
+def _orchestrator():
+    orchestrator = Orchestrator()
+    fetched = []
+
+    async def fetch_candidates(query):
+        fetched.append(query)
+        return CandidateList([parse_place({"lat": 48.85, "lon": 2.35, "tags": {"name": "Louvre", "tourism": "museum"}})])
+
+    async def refresh_cells(cells):
+        return len(cells)
+
+    orchestrator.places_agent._fetch_candidates = fetch_candidates
+    orchestrator.places_agent.search_mode = "fixed"
+    orchestrator.places_agent.fetch_mode = "category"
+    orchestrator.weather_agent.refresh_cells = refresh_cells
+    return orchestrator, fetched
+
+
+def test_warms_only_requested_categories():
+    async def test():
+        orchestrator, _ = _orchestrator()
+        searched = []
+
+        async def get_places(lat, lon, location_name="", radius=30000, category_filter="all"):
+            searched.append((location_name, category_filter))
+            return []
+
+        orchestrator.places_agent.get_places = get_places
+        orchestrator.hot_destinations.record("Paris", "food")
+        orchestrator.hot_destinations.record("Tokyo")
+        scheduler = WarmupScheduler(orchestrator, destinations=["London"], top_n=5)
+        assert await scheduler.warm() == ["London", "Paris", "Tokyo"]
+        assert searched == [("London", "all"), ("Paris", "all"), ("Paris", "food"), ("Tokyo", "all")]
+
+    asyncio.run(test())
+
+
+def test_cycle_waits_for_its_refreshes():
+    async def test():
+        orchestrator, fetched = _orchestrator()
+        orchestrator.hot_destinations.record("Paris", "food")
+        scheduler = WarmupScheduler(orchestrator, top_n=5)
+        await scheduler.warm()
+        assert len(fetched) == 2
+
+        # Make every entry stale: the next cycle is served from cache and refreshes them
+        cache = orchestrator.places_agent.places_cache
+        for entry in cache._entries.values():
+            entry.expires_at = time.monotonic() - 1
+        await scheduler.warm()
+        assert len(fetched) == 4
+        assert not cache._refreshing
+
+    asyncio.run(test())
@@ -0,0 +1,108 @@
+import asyncio
+
+import httpx
+import pytest
+
+import agents.weather_agent
+import utils.cache
+from agents.weather_agent import WeatherAgent
+
+HOUR = 3600
+
+
+class FakeClock:
+    """Stands in for the time module: wall clock and monotonic clock move together."""
+
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeOpenMeteo:
+    def __init__(self):
+        self.requests = []
+        self.fail = False
+
+    async def get(self, provider, url, params=None):
+        self.requests.append(params)
+        request = httpx.Request("GET", url)
+        if self.fail:
+            return httpx.Response(502, request=request)
+        locations = [
+            {"current": {"temperature_2m": float(lat), "precipitation": 0.0}, "daily": {"precipitation_probability_max": [10, 20]}, "timezone": "GMT"}
+            for lat in params["latitude"].split(",")
+        ]
+        return httpx.Response(200, json=locations if len(locations) > 1 else locations[0], request=request)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Ten seconds before a forecast update (xx:59:50)
+    clock = FakeClock(999 * HOUR + 59 * 60 + 50)
+    monkeypatch.setattr(agents.weather_agent, "time", clock)
+    monkeypatch.setattr(utils.cache, "time", clock)
+    return clock
+
+
+def test_grid_cells():
+    assert WeatherAgent.grid_cell(12.9716, 77.5946) == (13.0, 77.6, "auto")
+    assert WeatherAgent.grid_cell(12.98, 77.61) == WeatherAgent.grid_cell(12.9716, 77.5946)
+    assert WeatherAgent.grid_cell(-33.87, 151.21) == (-33.9, 151.2, "auto")
+
+
+def test_cached_until_the_next_forecast_update(clock):
+    async def test():
+        upstream = FakeOpenMeteo()
+        agent = WeatherAgent(http=upstream)
+        first = await agent.get_weather(48.8566, 2.3522)
+        assert first["current"]["temperature_2m"] == 48.9
+        # Trimmed to what the response uses
+        assert first["daily"] == {"precipitation_probability_max": [10]}
+
+        clock.now += 9
+        assert await agent.get_weather(48.86, 2.35) == first
+        assert len(upstream.requests) == 1
+
+        # The hourly model update passed: 10 seconds were all the entry had left
+        clock.now += 2
+        await agent.get_weather(48.8566, 2.3522)
+        assert len(upstream.requests) == 2
+
+        # Fetched just after the update, the entry lasts the whole hour
+        clock.now += HOUR - 5
+        await agent.get_weather(48.8566, 2.3522)
+        assert len(upstream.requests) == 2
+
+    asyncio.run(test())
+
+
+def test_errors_are_not_cached(clock):
+    async def test():
+        upstream = FakeOpenMeteo()
+        upstream.fail = True
+        agent = WeatherAgent(http=upstream)
+        assert await agent.get_weather(48.8566, 2.3522) is None
+        upstream.fail = False
+        assert await agent.get_weather(48.8566, 2.3522) is not None
+        assert len(upstream.requests) == 2
+
+    asyncio.run(test())
+
+
+def test_many_locations_in_one_request(clock):
+    async def test():
+        upstream = FakeOpenMeteo()
+        agent = WeatherAgent(http=upstream)
+        await agent.get_weather(51.5074, -0.1278)
+        results = await agent.get_weather_many([(48.8566, 2.3522), (51.5074, -0.1278), (35.68, 139.76), (48.86, 2.35)])
+        assert [r["current"]["temperature_2m"] for r in results] == [48.9, 51.5, 35.7, 48.9]
+        # London was cached; Paris (twice) and Tokyo share one request
+        assert len(upstream.requests) == 2
+        assert upstream.requests[1]["latitude"] == "48.9,35.7"
+
+    asyncio.run(test())
@@ -0,0 +1,111 @@
+import asyncio
+import urllib.parse
+
+import httpx
+
+from agents.wikipedia_agent import WikipediaAgent
+
+EXTRACT = "The Eiffel Tower is a wrought-iron lattice tower in Paris. It is named after Gustave Eiffel."
+
+
+class FakeWikipedia:
+    """Serves summaries by (lang, title) and Wikidata sitelinks, logging every request."""
+
+    def __init__(self, summaries=None, sitelinks=None, status=None):
+        self.summaries = summaries or {}
+        self.sitelinks = sitelinks or {}
+        # (lang, title) -> status code returned instead of the summary
+        self.status = status or {}
+        self.requests = []
+
+    async def get(self, provider, url, params=None, follow_redirects=False):
+        request = httpx.Request("GET", url, params=params)
+        if provider == "wikidata":
+            ids = params["ids"].split("|")
+            self.requests.append(("wikidata", tuple(ids)))
+            entities = {i: {"sitelinks": {"enwiki": {"title": self.sitelinks[i]}}} for i in ids if i in self.sitelinks}
+            return httpx.Response(200, json={"entities": entities}, request=request)
+
+        _, lang, title = urllib.parse.urlsplit(url).path.split("/")
+        key = (lang, urllib.parse.unquote(title).replace("_", " "))
+        self.requests.append(key)
+        if key in self.status:
+            return httpx.Response(self.status[key], content=b"not json", request=request)
+        if key in self.summaries:
+            return httpx.Response(200, json={"extract": self.summaries[key]}, request=request)
+        return httpx.Response(404, request=request)
+
+
+def _agent(upstream):
+    agent = WikipediaAgent(http=upstream)
+    agent.SUMMARY_API = "https://wiki.test/{lang}/{title}"
+    return agent
+
+
+def test_tag_is_resolved_directly():
+    async def test():
+        upstream = FakeWikipedia({("fr", "Tour Eiffel"): EXTRACT})
+        [place] = await _agent(upstream).enrich_places([{"name": "Eiffel Tower", "wikipedia": "fr:Tour Eiffel"}], "Paris")
+        assert place["description"].startswith("The Eiffel Tower")
+        assert upstream.requests == [("fr", "Tour Eiffel")]
+
+    asyncio.run(test())
+
+
+def test_stale_tags_fall_back_to_title_search():
+    async def test():
+        upstream = FakeWikipedia(
+            {("en", "Eiffel Tower"): EXTRACT, ("en", "Louvre"): "The Louvre is the world's most-visited art museum, in Paris."},
+            sitelinks={"Q243": "Renamed Page"},
+        )
+        places = [
+            {"name": "Eiffel Tower", "wikipedia": "en:Old Title"},
+            {"name": "Louvre", "wikidata": "Q243"},
+        ]
+        tower, louvre = await _agent(upstream).enrich_places(places, "Paris")
+        assert tower["description"].startswith("The Eiffel Tower")
+        assert louvre["description"].startswith("The Louvre")
+        assert ("en", "Old Title") in upstream.requests and ("en", "Renamed Page") in upstream.requests
+
+    asyncio.run(test())
+
+
+def test_wikidata_ids_resolved_in_one_call():
+    async def test():
+        upstream = FakeWikipedia({("en", f"Page {i}"): EXTRACT for i in range(3)}, sitelinks={f"Q{i}": f"Page {i}" for i in range(3)})
+        places = [{"name": f"Place {i}", "wikidata": f"Q{i}"} for i in range(3)]
+        enriched = await _agent(upstream).enrich_places(places)
+        assert all(place["description"] for place in enriched)
+        assert [r for r in upstream.requests if r[0] == "wikidata"] == [("wikidata", ("Q0", "Q1", "Q2"))]
+
+    asyncio.run(test())
+
+
+def test_miss_is_cached_only_when_every_lookup_answered():
+    async def test():
+        upstream = FakeWikipedia(status={("en", "Hidden Cafe"): 503})
+        agent = _agent(upstream)
+        assert await agent.describe("Hidden Cafe") is None
+        # The 503 was not remembered as "no article": the next search asks again
+        upstream.status.clear()
+        upstream.summaries[("en", "Hidden Cafe")] = "Hidden Cafe is a small coffee house known for its pastries."
+        assert (await agent.describe("Hidden Cafe")).startswith("Hidden Cafe")
+
+        assert await agent.describe("Nowhere Bar") is None
+        requests = len(upstream.requests)
+        assert await agent.describe("Nowhere Bar") is None
+        assert len(upstream.requests) == requests
+
+    asyncio.run(test())
+
+
+def test_unreadable_summary_is_not_cached():
+    async def test():
+        upstream = FakeWikipedia(status={("en", "Eiffel Tower"): 200})
+        agent = _agent(upstream)
+        assert await agent.get_summary("en", "Eiffel Tower") is None
+        del upstream.status[("en", "Eiffel Tower")]
+        upstream.summaries[("en", "Eiffel Tower")] = EXTRACT
+        assert await agent.get_summary("en", "Eiffel Tower") is not None
+
+    asyncio.run(test())
@@ -0,0 +1 @@
+# Offline data tools (run from the backend/ directory, e.g. `python -m tools.build_poi_store`)
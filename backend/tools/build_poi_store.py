@@ -0,0 +1,167 @@
+"""
+Build an offline POI store (utils/poi_store.py) from an OSM extract.
+
+Inputs, picked by file extension:
+    .osm / .osm.xml   OSM XML, e.g. from a Geofabrik or BBBike extract
+    .osm.pbf          OSM PBF, needs the optional `osmium` package
+    .json             an Overpass JSON dump (`[out:json]` ... `out center;`)
+
+Only elements carrying one of the tags searched by a category (or the
+default set) are kept, trimmed to the tags ranking and enrichment use.
+Ways are placed at the center of their bounding box, as `out center` does;
+relations are only kept from Overpass dumps, which already carry a center.
+
+    python -m tools.build_poi_store karnataka.osm.pbf karnataka.poi
+    POI_STORE_PATH=karnataka.poi uvicorn main:app
+"""
+import argparse
+import json
+import sys
+import time
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, List, Optional
+
+from agents.place_records import parse_place
+from features.categories import get_all_category_tags
+from utils.overpass_stream import OverpassStreamParser
+from utils.poi_store import DEFAULT_CELL_SIZE, write_poi_store
+
+Element = Dict[str, Any]
+
+WANTED_TAGS = frozenset(get_all_category_tags())
+WANTED_KEYS = frozenset(key for key, _ in WANTED_TAGS)
+
+
+def is_wanted(tags: Dict[str, str]) -> bool:
+    return any((key, tags[key]) in WANTED_TAGS for key in WANTED_KEYS if key in tags)
+
+
+def _bbox_center(coords: List[tuple]) -> Dict[str, float]:
+    lats = [lat for lat, _ in coords]
+    lons = [lon for _, lon in coords]
+    return {"lat": (min(lats) + max(lats)) / 2, "lon": (min(lons) + max(lons)) / 2}
+
+
+def read_overpass_json(path: str, bounds: Dict[str, float]) -> Iterator[Element]:
+    parser = OverpassStreamParser()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                break
+            yield from parser.feed(chunk)
+    parser.close()
+
+
+def read_osm_xml(path: str, bounds: Dict[str, float]) -> Iterator[Element]:
+    # Coordinates of every node are kept so way centers can be computed
+    # (nodes come before ways in OSM files)
+    node_coords: Dict[str, tuple] = {}
+    for _, elem in ET.iterparse(path, events=("end",)):
+        if elem.tag == "bounds":
+            bounds.update({key: float(elem.get(key)) for key in ("minlat", "minlon", "maxlat", "maxlon")})
+        elif elem.tag == "node":
+            coords = (float(elem.get("lat")), float(elem.get("lon")))
+            node_coords[elem.get("id")] = coords
+            tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+            if tags and is_wanted(tags):
+                yield {"type": "node", "lat": coords[0], "lon": coords[1], "tags": tags}
+            elem.clear()
+        elif elem.tag == "way":
+            tags = {tag.get("k"): tag.get("v") for tag in elem.iter("tag")}
+            if tags and is_wanted(tags):
+                coords = [node_coords[nd.get("ref")] for nd in elem.iter("nd") if nd.get("ref") in node_coords]
+                if coords:
+                    yield {"type": "way", "center": _bbox_center(coords), "tags": tags}
+            elem.clear()
+        elif elem.tag == "relation":
+            elem.clear()
+
+
+def read_osm_pbf(path: str, bounds: Dict[str, float]) -> Iterator[Element]:
+    try:
+        import osmium
+    except ImportError:
+        sys.exit("Reading .osm.pbf needs the osmium package (pip install osmium), or convert the extract to .osm first")
+
+    box = osmium.io.Reader(path, osmium.osm.osm_entity_bits.NOTHING).header().box()
+    if box.valid():
+        bounds.update(minlat=box.bottom_left.lat, minlon=box.bottom_left.lon, maxlat=box.top_right.lat, maxlon=box.top_right.lon)
+
+    elements: List[Element] = []
+
+    class Handler(osmium.SimpleHandler):
+        def node(self, n):
+            tags = {tag.k: tag.v for tag in n.tags}
+            if tags and is_wanted(tags):
+                elements.append({"type": "node", "lat": n.location.lat, "lon": n.location.lon, "tags": tags})
+
+        def way(self, w):
+            tags = {tag.k: tag.v for tag in w.tags}
+            if tags and is_wanted(tags):
+                coords = [(nd.lat, nd.lon) for nd in w.nodes if nd.location.valid()]
+                if coords:
+                    elements.append({"type": "way", "center": _bbox_center(coords), "tags": tags})
+
+    Handler().apply_file(path, locations=True)
+    yield from elements
+
+
+def reader_for(path: str):
+    if path.endswith(".pbf"):
+        return read_osm_pbf
+    if path.endswith(".json"):
+        return read_overpass_json
+    return read_osm_xml
+
+
+def build(input_path: str, output_path: str, bbox: Optional[List[float]] = None, cell_size: float = DEFAULT_CELL_SIZE) -> Dict[str, Any]:
+    started = time.perf_counter()
+    bounds: Dict[str, float] = {}
+    records = []
+    scanned = 0
+    for element in reader_for(input_path)(input_path, bounds):
+        scanned += 1
+        if not is_wanted(element.get("tags", {})):
+            continue
+        record = parse_place(element)
+        if record is not None:
+            records.append(record)
+
+    if bbox:
+        coverage = tuple(bbox)
+    elif bounds:
+        coverage = (bounds["minlat"], bounds["minlon"], bounds["maxlat"], bounds["maxlon"])
+    elif records:
+        # No declared extent: the data's own extent is the best guess
+        coverage = (
+            min(r.lat for r in records), min(r.lon for r in records),
+            max(r.lat for r in records), max(r.lon for r in records),
+        )
+    else:
+        coverage = (0.0, 0.0, 0.0, 0.0)
+
+    written = write_poi_store(output_path, records, coverage, cell_size)
+    return {
+        "input": input_path,
+        "output": output_path,
+        "elements_scanned": scanned,
+        "records": written,
+        "bbox": coverage,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("input", help="OSM extract (.osm, .osm.pbf) or Overpass JSON dump (.json)")
+    parser.add_argument("output", help="POI store file to write")
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"),
+                        help="Area the extract completely covers (default: the file's bounds, or the data extent)")
+    parser.add_argument("--cell-size", type=float, default=DEFAULT_CELL_SIZE, help="Grid cell size in degrees")
+    args = parser.parse_args()
+    print(json.dumps(build(args.input, args.output, args.bbox, args.cell_size), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Admission control for /chat.
+
+Every query that needs upstream calls takes a slot before it runs. Slots
+are split into two priority lanes: "light" queries (weather only, a
+couple of fast calls) and "heavy" ones (places searches, whose Overpass
+calls can take tens of seconds). Heavy queries may use at most max_heavy
+of the max_concurrent slots, so the rest stay available for light ones,
+and when a slot frees up light waiters are served first.
+
+Queries beyond that wait in a bounded queue per lane. A full queue, or a
+wait longer than queue_timeout, fails fast with Overloaded, so the caller
+can answer from cache, answer partially, or return 503 instead of letting
+latency pile up for everyone.
+
+A batch of queries takes one slot per query (its weight), capped to half
+of its lane's slots so single queries always keep the other half, and
+waits until all of them are free at once.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Tuple
+
+from utils.deadline import remaining
+from utils.metrics import ADMISSIONS
+
+LIGHT = "light"
+HEAVY = "heavy"
+# In priority order
+LANES = (LIGHT, HEAVY)
+
+
+class Overloaded(Exception):
+    """Raised when a query can't be admitted: its lane's queue is full or it waited too long."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency and bounded wait queues, in two priority lanes."""
+
+    # Largest share of a lane's slots one weighted acquire can hold
+    MAX_WEIGHT_SHARE = 0.5
+
+    def __init__(self, max_concurrent: int = 32, max_heavy: int = 16, max_queue: int = 64,
+                 queue_timeout: float = 5.0, request_timeout: float = 30.0):
+        self.max_concurrent = max_concurrent
+        self.max_heavy = min(max_heavy, max_concurrent)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # Deadline of an admitted request, counted from its arrival
+        self.request_timeout = request_timeout
+        self.in_flight: Dict[str, int] = {lane: 0 for lane in LANES}
+        # (future, weight) per waiting query, in arrival order
+        self._waiters: Dict[str, Deque[Tuple[asyncio.Future, int]]] = {lane: deque() for lane in LANES}
+        self.waited = 0.0
+        self.admitted = 0
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """
+        ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_HEAVY, ADMISSION_MAX_QUEUE,
+        ADMISSION_QUEUE_TIMEOUT and REQUEST_DEADLINE (seconds).
+        """
+        return cls(
+            max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", "32")),
+            max_heavy=int(os.getenv("ADMISSION_MAX_HEAVY", "16")),
+            max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+            queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5")),
+            request_timeout=float(os.getenv("REQUEST_DEADLINE", "30")),
+        )
+
+    def _has_slot(self, lane: str, weight: int = 1) -> bool:
+        if sum(self.in_flight.values()) + weight > self.max_concurrent:
+            return False
+        return lane == LIGHT or self.in_flight[HEAVY] + weight <= self.max_heavy
+
+    def _weight(self, lane: str, weight: int) -> int:
+        share = self.max_heavy if lane == HEAVY else self.max_concurrent
+        return max(1, min(weight, int(share * self.MAX_WEIGHT_SHARE)))
+
+    def queue_full(self, lane: str) -> bool:
+        return len(self._waiters[lane]) >= self.max_queue
+
+    @property
+    def retry_after(self) -> int:
+        """Suggested Retry-After (seconds) for a query turned away."""
+        return max(1, math.ceil(self.queue_timeout))
+
+    async def acquire(self, lane: str, wait: bool = True, weight: int = 1) -> int:
+        """
+        Take weight slots in lane, queueing for them unless wait is False.
+        Returns the number of slots taken, to pass to release().
+        """
+        started = time.monotonic()
+        weight = self._weight(lane, weight)
+        if self._has_slot(lane, weight) and not self._waiters[lane]:
+            self.in_flight[lane] += weight
+            self._admit(lane, started)
+            return weight
+        if not wait:
+            raise Overloaded(f"no {lane} slot free", self.retry_after)
+        if self.queue_full(lane):
+            ADMISSIONS.inc(lane=lane, outcome="queue_full")
+            raise Overloaded(f"{lane} queue full ({self.max_queue} waiting)", self.retry_after)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[lane].append((waiter, weight))
+        timeout = remaining(self.queue_timeout)
+        try:
+            # The slots are handed over by release(), which counts them in in_flight
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self._abandon(lane, waiter, weight)
+            ADMISSIONS.inc(lane=lane, outcome="queue_timeout")
+            raise Overloaded(f"no {lane} slot within {timeout:.1f}s", self.retry_after)
+        except asyncio.CancelledError:
+            self._abandon(lane, waiter, weight)
+            raise
+        self._admit(lane, started)
+        return weight
+
+    def _admit(self, lane: str, started: float) -> None:
+        self.admitted += 1
+        self.waited += time.monotonic() - started
+        ADMISSIONS.inc(lane=lane, outcome="admitted")
+
+    def _abandon(self, lane: str, waiter: asyncio.Future, weight: int) -> None:
+        if (waiter, weight) in self._waiters[lane]:
+            self._waiters[lane].remove((waiter, weight))
+            # A heavier waiter at the head may have been holding back lighter ones
+            self._wake()
+        elif waiter.done() and not waiter.cancelled():
+            # Granted the slots just as we gave up: pass them on
+            self.in_flight[lane] -= weight
+            self._wake()
+
+    def release(self, lane: str, weight: int = 1) -> None:
+        self.in_flight[lane] -= weight
+        self._wake()
+
+    def _wake(self) -> None:
+        for lane in LANES:
+            waiters = self._waiters[lane]
+            # First come, first served: a batch at the head waits for all its slots
+            while waiters and self._has_slot(lane, waiters[0][1]):
+                waiter, weight = waiters.popleft()
+                if not waiter.done():
+                    self.in_flight[lane] += weight
+                    waiter.set_result(None)
+
+    @asynccontextmanager
+    async def admit(self, lane: str, wait: bool = True, weight: int = 1) -> AsyncIterator[None]:
+        """Hold weight slots in lane for the duration of the block; raises Overloaded if they aren't available in time."""
+        weight = await self.acquire(lane, wait, weight)
+        try:
+            yield
+        finally:
+            self.release(lane, weight)
+
+    def ready(self) -> bool:
+        """False while any lane is turning queries away because its queue is full."""
+        return not any(self.queue_full(lane) for lane in LANES)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready(),
+            "max_concurrent": self.max_concurrent,
+            "max_heavy": self.max_heavy,
+            "max_queue": self.max_queue,
+            "in_flight": dict(self.in_flight),
+            "queued": {lane: len(waiters) for lane, waiters in self._waiters.items()},
+            "avg_wait_ms": round(1000 * self.waited / self.admitted, 1) if self.admitted else 0.0,
+        }
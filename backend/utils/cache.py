@@ -0,0 +1,163 @@
+"""
+Small in-process caching primitives shared by the agents.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from utils.deadline import without_deadline
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    expires_at: float
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries also expire after a TTL.
+
+    Values may legitimately be None (e.g. a cached "not found"), so lookups
+    return a (hit, value) pair instead of overloading None.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key)[0]
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return True, entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self._entries[key] = CacheEntry(value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+class StaleWhileRevalidateCache:
+    """
+    LRU cache where an entry is fresh for `ttl` seconds and may then be served
+    stale for another `stale_ttl` seconds while it is refreshed in the
+    background. Only a complete miss makes the caller wait on the fetch.
+    """
+
+    def __init__(self, max_size: int = 512, ttl: float = 3600.0, stale_ttl: float = 6 * 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.fallback_hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def peek(self, key: Hashable) -> Tuple[bool, Any]:
+        """Return a cached value even if it is stale, without refreshing it."""
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at + self.stale_ttl <= time.monotonic():
+            return False, None
+        return True, entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        self._entries[key] = CacheEntry(value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for key, calling fetch() on a miss.
+        If fetch() fails and an expired entry is still held, it is returned
+        instead; otherwise the exception propagates and nothing is cached.
+        """
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            if entry.expires_at + self.stale_ttl > now:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                self._schedule_refresh(key, fetch)
+                return entry.value
+
+        self.misses += 1
+        try:
+            value = await fetch()
+        except Exception:
+            if entry is not None:
+                # Upstream is down: an expired answer beats no answer
+                self.fallback_hits += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            raise
+        self.set(key, value)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "fallback_hits": self.fallback_hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+        }
+
+    async def wait_refreshes(self) -> None:
+        """Wait for the background refreshes in progress to finish."""
+        if self._refreshing:
+            await asyncio.gather(*list(self._refreshing.values()), return_exceptions=True)
+
+    def _schedule_refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> None:
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                self.set(key, await fetch())
+            except Exception as e:
+                # Keep serving the stale value; the next stale hit retries
+                print(f"Background refresh failed for {key}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        # Outlives the request that found the stale entry, so not bound by its deadline
+        self._refreshing[key] = asyncio.create_task(without_deadline(refresh))
@@ -0,0 +1,333 @@
+"""
+Cache tier shared between worker processes.
+
+Each worker keeps its own in-process caches (no serialization on the hot
+path); a CacheBackend sits behind them, so a geocode, forecast or Overpass
+result fetched by one worker is a cache hit for every other worker instead
+of one more upstream call. Values are bytes with a TTL; JSON helpers cover
+what the agents store.
+
+    CACHE_BACKEND=sqlite  CACHE_SQLITE_PATH=.cache/shared.sqlite3   (workers on one host)
+    CACHE_BACKEND=redis   CACHE_REDIS_URL=redis://localhost:6379/0  (any number of hosts)
+    CACHE_BACKEND=memory  (single process; reference implementation)
+
+Backend errors never fail a request: they count as misses, and a backend
+that keeps failing is skipped for a while by a circuit breaker.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlsplit
+
+from utils.resilience import CircuitBreaker, CircuitOpen
+
+KEY_PREFIX = "voyant:v1:"
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "shared.sqlite3")
+
+
+class CacheBackend:
+    """Async key/value store with per-key TTL. Subclasses implement the _raw methods."""
+
+    name = "backend"
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=30.0)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def _get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        raise NotImplementedError
+
+    async def _set(self, key: str, value: bytes, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def _delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+    async def _guarded(self, operation, default):
+        try:
+            self.breaker.before_call()
+        except CircuitOpen:
+            return default
+        try:
+            result = await operation()
+        except Exception as e:
+            self.errors += 1
+            self.breaker.record_failure()
+            print(f"Shared cache ({self.name}) error: {e}")
+            return default
+        self.breaker.record_success()
+        return result
+
+    async def get_many(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        if not keys:
+            return []
+        values = await self._guarded(lambda: self._get_many([KEY_PREFIX + key for key in keys]), [None] * len(keys))
+        found = sum(1 for value in values if value is not None)
+        self.hits += found
+        self.misses += len(keys) - found
+        return values
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self.get_many([key]))[0]
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        if ttl > 0:
+            await self._guarded(lambda: self._set(KEY_PREFIX + key, value, ttl), None)
+
+    async def delete(self, key: str) -> None:
+        await self._guarded(lambda: self._delete(KEY_PREFIX + key), None)
+
+    async def get_json(self, key: str) -> Tuple[bool, Any]:
+        """(hit, value); a stored null is a hit (e.g. a cached "not found")."""
+        return (await self.get_many_json([key]))[0]
+
+    async def get_many_json(self, keys: Sequence[str]) -> List[Tuple[bool, Any]]:
+        results = []
+        for raw in await self.get_many(keys):
+            try:
+                results.append((True, json.loads(raw)) if raw is not None else (False, None))
+            except ValueError:
+                results.append((False, None))
+        return results
+
+    async def set_json(self, key: str, value: Any, ttl: float) -> None:
+        await self.set(key, json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "hits": self.hits, "misses": self.misses, "errors": self.errors, "state": self.breaker.state}
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU store; shares nothing between processes."""
+
+    name = "memory"
+
+    def __init__(self, max_size: int = 4096):
+        super().__init__()
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+
+    async def _get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        now = time.monotonic()
+        values = []
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= now:
+                self._entries.pop(key, None)
+                values.append(None)
+            else:
+                self._entries.move_to_end(key)
+                values.append(entry[0])
+        return values
+
+    async def _set(self, key: str, value: bytes, ttl: float) -> None:
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def _delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    SQLite database in WAL mode, shared by the workers of one host: readers
+    never block each other or the writer. Queries run on one background
+    thread owning the connection, so a busy database never stalls the
+    event loop.
+    """
+
+    name = "sqlite"
+    # Expired rows are deleted after this many writes
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        super().__init__()
+        self.path = path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-cache")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=2.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)")
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _get_many_sync(self, keys: List[str]) -> List[Optional[bytes]]:
+        placeholders = ",".join("?" * len(keys))
+        rows = self._connect().execute(
+            f"SELECT key, value FROM entries WHERE key IN ({placeholders}) AND expires_at > ?", (*keys, time.time())
+        ).fetchall()
+        found = dict(rows)
+        return [found.get(key) for key in keys]
+
+    def _set_sync(self, key: str, value: bytes, ttl: float) -> None:
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)", (key, value, time.time() + ttl))
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+
+    def _delete_sync(self, key: str) -> None:
+        self._connect().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    async def _get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        return await self._run(self._get_many_sync, keys)
+
+    async def _set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._run(self._set_sync, key, value, ttl)
+
+    async def _delete(self, key: str) -> None:
+        await self._run(self._delete_sync, key)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+        self._executor.shutdown(wait=False)
+
+
+class RedisError(Exception):
+    """Error reply from the server, or a malformed reply."""
+
+
+class RedisBackend(CacheBackend):
+    """
+    Minimal Redis client (RESP2 over asyncio streams, GET/MGET/SET/DEL only)
+    with a small connection pool. Works with Redis, Valkey, KeyDB and the
+    stand-in in benchmarks/stub_redis.py.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str = "redis://localhost:6379/0", pool_size: int = 8, timeout: float = 0.5):
+        super().__init__()
+        parts = urlsplit(url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.username = unquote(parts.username) if parts.username else None
+        self.db = int(parts.path.strip("/") or 0)
+        self.timeout = timeout
+        self._pool: "asyncio.LifoQueue[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]" = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(pool_size)
+
+    @staticmethod
+    def _encode(*args: Any) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(out)
+
+    @classmethod
+    async def _read_reply(cls, reader: asyncio.StreamReader) -> Any:
+        line = await reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(payload)
+            return None if count < 0 else [await cls._read_reply(reader) for _ in range(count)]
+        raise RedisError(f"unexpected reply {line[:20]!r}")
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            if self.password:
+                auth = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+                writer.write(self._encode(*auth))
+                await self._read_reply(reader)
+            if self.db:
+                writer.write(self._encode("SELECT", self.db))
+                await self._read_reply(reader)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    async def _command(self, *args: Any) -> Any:
+        async with self._slots:
+            connection = self._pool.get_nowait() if not self._pool.empty() else None
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(self._connect(), self.timeout)
+                reader, writer = connection
+                writer.write(self._encode(*args))
+                reply = await asyncio.wait_for(self._read_reply(reader), self.timeout)
+            except RedisError:
+                # The connection itself is fine after an error reply
+                self._pool.put_nowait(connection)
+                raise
+            except BaseException:
+                # Timed out or broken mid-reply: the stream position is unknown
+                if connection is not None:
+                    connection[1].close()
+                raise
+            self._pool.put_nowait(connection)
+            return reply
+
+    async def _get_many(self, keys: List[str]) -> List[Optional[bytes]]:
+        if len(keys) == 1:
+            return [await self._command("GET", keys[0])]
+        return await self._command("MGET", *keys)
+
+    async def _set(self, key: str, value: bytes, ttl: float) -> None:
+        await self._command("SET", key, value, "PX", max(1, int(ttl * 1000)))
+
+    async def _delete(self, key: str) -> None:
+        await self._command("DEL", key)
+
+    async def close(self) -> None:
+        while not self._pool.empty():
+            _, writer = self._pool.get_nowait()
+            writer.close()
+
+
+def backend_from_env() -> Optional[CacheBackend]:
+    """
+    The shared backend selected by CACHE_BACKEND (memory, sqlite or redis),
+    or None when unset: each worker then only uses its in-process caches.
+    """
+    kind = os.getenv("CACHE_BACKEND", "").strip().lower()
+    if not kind:
+        return None
+    if kind == "memory":
+        return MemoryBackend()
+    if kind == "sqlite":
+        return SQLiteBackend(os.getenv("CACHE_SQLITE_PATH", DEFAULT_SQLITE_PATH))
+    if kind == "redis":
+        return RedisBackend(os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0"))
+    print(f"Unknown CACHE_BACKEND {kind!r}, continuing without a shared cache")
+    return None
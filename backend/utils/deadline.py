@@ -0,0 +1,85 @@
+"""
+Request deadlines, propagated through a context variable.
+
+A /chat request gets an absolute deadline when it arrives. Query plan
+branches, provider throttle waits and upstream HTTP timeouts started on
+its behalf are capped to the time it has left, so a request that can no
+longer be answered in time stops holding queue slots and upstream
+capacity. Tasks copy the context, so the deadline follows the work into
+query plan branches. A call shared between requests (SingleFlight) runs
+under the latest deadline of the requests waiting for it, see
+SharedDeadline; background refreshes run without one, see
+without_deadline().
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterator, Optional, Union
+
+
+class SharedDeadline:
+    """
+    Deadline of a call several requests wait for: the latest of their
+    deadlines, moved later as waiters join, and none at all once a waiter
+    without a deadline (e.g. a background refresh) joins.
+    """
+
+    def __init__(self):
+        self.at: Optional[float] = None
+        self._joined = False
+
+    def join(self, deadline: Optional[float]) -> None:
+        if not self._joined:
+            self.at, self._joined = deadline, True
+        elif self.at is not None:
+            self.at = None if deadline is None else max(self.at, deadline)
+
+
+# Absolute time.monotonic() by which the current request must be answered
+_deadline: ContextVar[Union[float, SharedDeadline, None]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting work the current request has no time left for."""
+
+
+def current() -> Optional[float]:
+    """The current deadline (absolute time.monotonic()), or None."""
+    deadline = _deadline.get()
+    return deadline.at if isinstance(deadline, SharedDeadline) else deadline
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[None]:
+    """Run the block under a deadline `seconds` from now (an earlier enclosing deadline wins)."""
+    deadline = current()
+    if seconds is not None:
+        deadline = time.monotonic() + seconds if deadline is None else min(deadline, time.monotonic() + seconds)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(default: float) -> float:
+    """default, capped to the time left before the current deadline (never negative)."""
+    deadline = current()
+    if deadline is None:
+        return default
+    return max(0.0, min(default, deadline - time.monotonic()))
+
+
+async def without_deadline(fn: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run fn() with no deadline. Meant as the body of a task: the task has its
+    own copy of the context, so the caller's deadline is left untouched.
+    """
+    _deadline.set(None)
+    return await fn()
+
+
+async def with_shared_deadline(fn: Callable[[], Awaitable[Any]], deadline: SharedDeadline) -> Any:
+    """Run fn() under a deadline its waiters keep up to date. Meant as the body of a task."""
+    _deadline.set(deadline)
+    return await fn()
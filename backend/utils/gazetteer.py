@@ -0,0 +1,105 @@
+"""
+Bundled gazetteer of major destinations.
+
+Answers geocoding lookups for the most frequently asked cities without any
+network call. Keys are normalized with utils.geocode_cache.normalize_place_key.
+"""
+from typing import Dict, Optional, Tuple
+
+MAJOR_CITIES: Dict[str, Tuple[float, float]] = {
+    # Europe
+    "paris": (48.8588897, 2.3200410),
+    "london": (51.5074456, -0.1277653),
+    "rome": (41.8933203, 12.4829321),
+    "madrid": (40.4167047, -3.7035825),
+    "barcelona": (41.3828939, 2.1774322),
+    "lisbon": (38.7077507, -9.1365919),
+    "berlin": (52.5170365, 13.3888599),
+    "munich": (48.1371079, 11.5753822),
+    "amsterdam": (52.3730796, 4.8924534),
+    "brussels": (50.8465573, 4.3516970),
+    "vienna": (48.2083537, 16.3725042),
+    "prague": (50.0596288, 14.4464593),
+    "budapest": (47.4813896, 19.1460941),
+    "zurich": (47.3744489, 8.5410422),
+    "venice": (45.4371908, 12.3345898),
+    "florence": (43.7697955, 11.2556404),
+    "milan": (45.4641943, 9.1896346),
+    "athens": (37.9755648, 23.7348324),
+    "istanbul": (41.0091982, 28.9662187),
+    "dublin": (53.3493795, -6.2605593),
+    "edinburgh": (55.9533456, -3.1883749),
+    "copenhagen": (55.6867243, 12.5700724),
+    "stockholm": (59.3251172, 18.0710935),
+    "oslo": (59.9133301, 10.7389701),
+    "helsinki": (60.1674881, 24.9427473),
+    "moscow": (55.7505412, 37.6174782),
+    # Asia
+    "tokyo": (35.6768601, 139.7638947),
+    "kyoto": (35.0115754, 135.7681441),
+    "osaka": (34.6937569, 135.5014539),
+    "seoul": (37.5666791, 126.9782914),
+    "beijing": (40.1905530, 116.4121480),
+    "shanghai": (31.2322758, 121.4692071),
+    "hong kong": (22.2793278, 114.1628131),
+    "singapore": (1.2899175, 103.8519072),
+    "bangkok": (13.7524938, 100.4935089),
+    "kuala lumpur": (3.1516964, 101.6942371),
+    "hanoi": (21.0283334, 105.8540410),
+    "ho chi minh city": (10.7763897, 106.7011391),
+    "bali": (-8.4095188, 115.1889060),
+    "jakarta": (-6.1753942, 106.8271830),
+    "manila": (14.5948914, 120.9782618),
+    "dubai": (25.0742823, 55.1885387),
+    "abu dhabi": (24.4538352, 54.3774014),
+    "doha": (25.2856329, 51.5264162),
+    "jerusalem": (31.7788242, 35.2257626),
+    "delhi": (28.6273928, 77.1716954),
+    "new delhi": (28.6138954, 77.2090057),
+    "mumbai": (19.0815772, 72.8866275),
+    "bangalore": (12.9767936, 77.5901060),
+    "bengaluru": (12.9767936, 77.5901060),
+    "chennai": (13.0836939, 80.2701860),
+    "kolkata": (22.5726459, 88.3638953),
+    "hyderabad": (17.3604260, 78.4740613),
+    "jaipur": (26.9154576, 75.8189817),
+    "agra": (27.1752554, 78.0098161),
+    "goa": (15.3004543, 74.0855134),
+    "kathmandu": (27.7083900, 85.3205817),
+    "colombo": (6.9349969, 79.8538463),
+    # Americas
+    "new york": (40.7127281, -74.0060152),
+    "new york city": (40.7127281, -74.0060152),
+    "los angeles": (34.0536909, -118.2427660),
+    "san francisco": (37.7792588, -122.4193286),
+    "chicago": (41.8755616, -87.6244212),
+    "las vegas": (36.1672559, -115.1485163),
+    "miami": (25.7741728, -80.1935970),
+    "washington": (38.8950368, -77.0365427),
+    "boston": (42.3554334, -71.0605110),
+    "seattle": (47.6038321, -122.3300624),
+    "toronto": (43.6534817, -79.3839347),
+    "vancouver": (49.2608724, -123.1139529),
+    "montreal": (45.5031824, -73.5698065),
+    "mexico city": (19.4326296, -99.1331785),
+    "cancun": (21.1527467, -86.8425761),
+    "havana": (23.1352840, -82.3589631),
+    "rio de janeiro": (-22.9110137, -43.2093727),
+    "sao paulo": (-23.5506507, -46.6333824),
+    "buenos aires": (-34.6083696, -58.4440583),
+    "lima": (-12.0463731, -77.0427540),
+    "cusco": (-13.5170887, -71.9785356),
+    # Africa & Oceania
+    "cairo": (30.0443879, 31.2357257),
+    "marrakech": (31.6258257, -7.9891608),
+    "cape town": (-33.9288301, 18.4172197),
+    "nairobi": (-1.2832533, 36.8172449),
+    "sydney": (-33.8698439, 151.2082848),
+    "melbourne": (-37.8142454, 144.9631732),
+    "auckland": (-36.8526097, 174.7630590),
+}
+
+
+def lookup(key: str) -> Optional[Tuple[float, float]]:
+    """Return bundled coordinates for a normalized place key, if known."""
+    return MAJOR_CITIES.get(key)
@@ -0,0 +1,151 @@
+"""
+Tiered geocoding cache.
+
+Lookups go through, in order:
+  1. an in-process LRU with TTL
+  2. the bundled gazetteer of major cities (no network)
+  3. a persistent SQLite store that survives restarts
+Only a miss on every tier reaches Nominatim. "Not found" answers are
+cached too, with a shorter TTL.
+"""
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from typing import Dict, Optional, Tuple
+from utils import gazetteer
+from utils.cache import TTLCache
+
+Coordinates = Optional[Tuple[float, float]]
+
+DEFAULT_STORE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "geocode.sqlite3")
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_place_key(place_name: str) -> str:
+    """
+    Normalize a place name into a cache key.
+    "  São  Paulo! " and "sao paulo" map to the same key.
+    """
+    decomposed = unicodedata.normalize("NFKD", place_name)
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    key = _PUNCTUATION.sub(" ", without_accents.casefold())
+    return _WHITESPACE.sub(" ", key).strip()
+
+
+class GeocodeStore:
+    """Persistent key -> coordinates store backed by SQLite."""
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS geocodes ("
+            " key TEXT PRIMARY KEY, lat REAL, lon REAL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Tuple[bool, Coordinates]:
+        row = self._conn.execute(
+            "SELECT lat, lon, expires_at FROM geocodes WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[2] <= time.time():
+            return False, None
+        lat, lon, _ = row
+        return True, (None if lat is None else (lat, lon))
+
+    def set(self, key: str, coords: Coordinates, ttl: float) -> None:
+        lat, lon = coords if coords else (None, None)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO geocodes (key, lat, lon, expires_at) VALUES (?, ?, ?, ?)",
+            (key, lat, lon, time.time() + ttl),
+        )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class GeocodeCache:
+    """Combines the memory, gazetteer and persistent tiers behind one get/set."""
+
+    # Place coordinates practically never change; misses may be typos that
+    # become resolvable once OSM data is fixed, so keep them for less time.
+    POSITIVE_TTL = 30 * 24 * 3600
+    NEGATIVE_TTL = 6 * 3600
+    MEMORY_TTL = 24 * 3600
+
+    def __init__(self, store: Optional[GeocodeStore] = None, use_gazetteer: bool = True, memory_size: int = 4096):
+        self.memory = TTLCache(max_size=memory_size, ttl=self.MEMORY_TTL)
+        self.store = store
+        self.use_gazetteer = use_gazetteer
+        # Lookups answered by the lower tiers (memory hits are counted by the TTLCache)
+        self.gazetteer_hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "GeocodeCache":
+        """
+        Build the cache from environment settings:
+        GEOCODE_CACHE_PATH (empty string disables the persistent tier) and
+        GEOCODE_GAZETTEER ("0" disables the bundled gazetteer).
+        """
+        path = os.getenv("GEOCODE_CACHE_PATH", DEFAULT_STORE_PATH)
+        store = None
+        if path:
+            try:
+                store = GeocodeStore(path)
+            except sqlite3.Error as e:
+                print(f"Geocode store unavailable, continuing in memory only: {e}")
+        return cls(store=store, use_gazetteer=os.getenv("GEOCODE_GAZETTEER", "1") != "0")
+
+    def get(self, key: str) -> Tuple[bool, Coordinates]:
+        hit, coords = self.memory.get(key)
+        if hit:
+            return True, coords
+
+        if self.use_gazetteer:
+            coords = gazetteer.lookup(key)
+            if coords:
+                self.gazetteer_hits += 1
+                self.memory.set(key, coords)
+                return True, coords
+
+        if self.store is not None:
+            try:
+                hit, coords = self.store.get(key)
+            except sqlite3.Error as e:
+                print(f"Geocode store read failed: {e}")
+                hit = False
+            if hit:
+                self.store_hits += 1
+                self.memory.set(key, coords, None if coords else self.NEGATIVE_TTL)
+                return True, coords
+
+        self.misses += 1
+        return False, None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.memory.hits + self.gazetteer_hits + self.store_hits,
+            "memory_hits": self.memory.hits,
+            "gazetteer_hits": self.gazetteer_hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "size": len(self.memory),
+        }
+
+    def set(self, key: str, coords: Coordinates) -> None:
+        ttl = self.POSITIVE_TTL if coords else self.NEGATIVE_TTL
+        self.memory.set(key, coords, min(ttl, self.MEMORY_TTL))
+        if self.store is not None:
+            try:
+                self.store.set(key, coords, ttl)
+            except sqlite3.Error as e:
+                print(f"Geocode store write failed: {e}")
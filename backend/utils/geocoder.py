@@ -1,11 +1,95 @@
-import httpx
-from typing import Optional, Tuple
+import os
+from typing import Dict, List, Optional, Tuple, Union
+from utils.cache_backend import CacheBackend
+from utils.geocode_cache import GeocodeCache, normalize_place_key
+from utils.http_client import UpstreamClients
+from utils.singleflight import SingleFlight
 
 class Geocoder:
-    BASE_URL = "https://nominatim.openstreetmap.org/search"
+    # Overridable to point at a stand-in server (see benchmarks/stub_upstreams.py)
+    BASE_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
 
-    @staticmethod
-    async def get_coordinates(place_name: str) -> Optional[Tuple[float, float]]:
+    def __init__(self, http: Optional[UpstreamClients] = None, cache: Optional[GeocodeCache] = None, shared_cache: Optional[CacheBackend] = None):
+        self.http = http or UpstreamClients()
+        self.cache = cache or GeocodeCache.from_env()
+        # Tier shared with the other workers, consulted before Nominatim
+        self.shared_cache = shared_cache
+        self.inflight = SingleFlight("nominatim")
+
+    async def get_coordinates(self, place_name: str) -> Optional[Tuple[float, float]]:
+        """
+        Fetch latitude and longitude for a given place name.
+        Served from the geocode cache tiers when possible, Nominatim otherwise.
+        """
+        try:
+            return await self.lookup(place_name)
+        except Exception as e:
+            # Upstream errors are not cached, only genuine "not found" answers
+            print(f"Error fetching coordinates: {e}")
+            return None
+
+    async def lookup(self, place_name: str) -> Optional[Tuple[float, float]]:
+        """
+        Same as get_coordinates, but upstream errors (rate limiting, timeouts,
+        HTTP errors) are raised instead of being reported as "not found".
+        """
+        key = normalize_place_key(place_name)
+        if not key:
+            return None
+
+        hit, coords = self.cache.get(key)
+        if hit:
+            return coords
+
+        # Concurrent lookups of the same place share one Nominatim call
+        return await self.inflight.do(key, lambda: self._fetch_and_cache(key, place_name))
+
+    async def get_coordinates_many(self, place_names: List[str]) -> Dict[str, Union[Tuple[float, float], None, Exception]]:
+        """
+        Geocode several places at once. Names that normalize to the same key
+        are looked up once, one after another: Nominatim's rate limit paces
+        the uncached ones anyway, and queueing them all on the throttle at
+        once would push the last ones past its max_wait.
+
+        A name whose lookup failed maps to the exception instead of None, so
+        callers can tell an upstream failure from an unknown place.
+        """
+        by_key: Dict[str, str] = {}
+        for name in place_names:
+            by_key.setdefault(normalize_place_key(name), name)
+        resolved: Dict[str, Union[Tuple[float, float], None, Exception]] = {}
+        for key, name in by_key.items():
+            if not key:
+                continue
+            try:
+                resolved[key] = await self.lookup(name)
+            except Exception as e:
+                print(f"Error fetching coordinates for {name}: {e}")
+                resolved[key] = e
+        return {name: resolved.get(normalize_place_key(name)) for name in place_names}
+
+    def pacing(self, place_names: List[str]) -> float:
+        """Longest Nominatim's rate limit can spread the lookups of place_names over (seconds)."""
+        rate = self.http.configs["nominatim"].rate_limit.rate
+        keys = {normalize_place_key(name) for name in place_names} - {""}
+        return len(keys) / rate if rate else 0.0
+
+    async def _fetch_and_cache(self, key: str, place_name: str) -> Optional[Tuple[float, float]]:
+        shared_key = "geocode:" + key
+        if self.shared_cache is not None:
+            hit, coords = await self.shared_cache.get_json(shared_key)
+            if hit:
+                coords = tuple(coords) if coords else None
+                self.cache.set(key, coords)
+                return coords
+
+        coords = await self._fetch_coordinates(place_name)
+        self.cache.set(key, coords)
+        if self.shared_cache is not None:
+            await self.shared_cache.set_json(shared_key, coords, self.cache.POSITIVE_TTL if coords else self.cache.NEGATIVE_TTL)
+        return coords
+
+    async def _fetch_coordinates(self, place_name: str) -> Optional[Tuple[float, float]]:
         """
         Fetch latitude and longitude for a given place name using Nominatim API.
         """
@@ -14,19 +98,11 @@ class Geocoder:
             "format": "json",
             "limit": 1
         }
-        headers = {
-            "User-Agent": "InkleTourismAgent/1.0"
-        }
-        
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(Geocoder.BASE_URL, params=params, headers=headers)
-                response.raise_for_status()
-                data = response.json()
-                
-                if data:
-                    return float(data[0]["lat"]), float(data[0]["lon"])
-                return None
-            except Exception as e:
-                print(f"Error fetching coordinates: {e}")
-                return None
+
+        response = await self.http.get("nominatim", self.BASE_URL, params=params)
+        response.raise_for_status()
+        data = response.json()
+
+        if data:
+            return float(data[0]["lat"]), float(data[0]["lon"])
+        return None
@@ -0,0 +1,251 @@
+"""
+Shared upstream HTTP clients.
+
+One pooled httpx.AsyncClient per upstream provider, created once at app
+startup and closed at shutdown, so repeat /chat requests reuse warm
+TCP/TLS connections instead of paying a fresh handshake every time.
+"""
+import asyncio
+import time
+
+import httpx
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from utils.deadline import DeadlineExceeded, remaining
+from utils.metrics import UPSTREAM_BYTES, UPSTREAM_RESPONSES, UPSTREAM_SECONDS
+from utils.rate_limit import ProviderThrottle, RateLimitPolicy
+from utils.resilience import EndpointHealth, endpoint_of
+
+try:
+    import h2  # noqa: F401 - only needed so httpx can negotiate HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@dataclass(frozen=True)
+class UpstreamConfig:
+    """Connection settings for a single upstream provider."""
+    timeout: float
+    connect_timeout: float = 5.0
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 60.0
+    http2: bool = True
+    headers: Dict[str, str] = field(default_factory=dict)
+    rate_limit: RateLimitPolicy = field(default_factory=RateLimitPolicy)
+
+
+USER_AGENT = "InkleTourismAgent/1.0"
+
+DEFAULT_UPSTREAMS: Dict[str, UpstreamConfig] = {
+    # Nominatim allows 1 req/s, a couple of connections is plenty
+    "nominatim": UpstreamConfig(
+        timeout=10.0, max_connections=4, max_keepalive_connections=2,
+        rate_limit=RateLimitPolicy(rate=1.0, burst=1, initial_concurrency=1, max_concurrency=2, max_wait=8.0),
+    ),
+    # Open-Meteo's free tier allows 600 calls/min
+    "open_meteo": UpstreamConfig(
+        timeout=10.0,
+        rate_limit=RateLimitPolicy(rate=10.0, burst=10, initial_concurrency=8, max_concurrency=20),
+    ),
+    # Overpass queries over a 30km radius can take a long time to run server-side,
+    # and the public instances hand out a couple of query slots per client
+    "overpass": UpstreamConfig(
+        timeout=30.0, max_connections=8, max_keepalive_connections=4,
+        rate_limit=RateLimitPolicy(initial_concurrency=2, max_concurrency=4, latency_target=15.0, max_wait=10.0),
+    ),
+    "wikipedia": UpstreamConfig(
+        timeout=5.0,
+        rate_limit=RateLimitPolicy(rate=50.0, burst=20, initial_concurrency=8, max_concurrency=32, latency_target=1.0, max_wait=2.0),
+    ),
+    "wikidata": UpstreamConfig(
+        timeout=5.0, max_connections=4, max_keepalive_connections=2,
+        rate_limit=RateLimitPolicy(rate=10.0, burst=5, initial_concurrency=2, max_concurrency=4, latency_target=1.0, max_wait=2.0),
+    ),
+}
+
+
+class UpstreamClients:
+    """
+    Registry of pooled AsyncClients, one per upstream provider.
+
+    Clients are created lazily on first use (or eagerly via start()) so
+    agents constructed outside the FastAPI app still work.
+    """
+
+    def __init__(self, configs: Optional[Dict[str, UpstreamConfig]] = None):
+        self.configs = dict(DEFAULT_UPSTREAMS if configs is None else configs)
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        # Shared by every agent, so the limits hold across all concurrent /chat requests
+        self._throttles: Dict[str, ProviderThrottle] = {}
+        # Circuit breaker and health of every endpoint (scheme + host) called
+        self._health: Dict[str, EndpointHealth] = {}
+
+    def _build_client(self, name: str) -> httpx.AsyncClient:
+        config = self.configs[name]
+        headers = {"User-Agent": USER_AGENT}
+        headers.update(config.headers)
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(config.timeout, connect=config.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+            http2=config.http2 and HTTP2_AVAILABLE,
+            headers=headers,
+        )
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        """Return the pooled client for an upstream, creating it if needed."""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._build_client(name)
+            self._clients[name] = client
+        return client
+
+    async def start(self) -> None:
+        """Create every configured client up front (called at app startup)."""
+        for name in self.configs:
+            self.client(name)
+
+    async def aclose(self) -> None:
+        """Close all pooled connections (called at app shutdown)."""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+    def throttle(self, name: str) -> ProviderThrottle:
+        throttle = self._throttles.get(name)
+        if throttle is None:
+            throttle = ProviderThrottle(name, self.configs[name].rate_limit)
+            self._throttles[name] = throttle
+        return throttle
+
+    def throttle_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: throttle.stats() for name, throttle in self._throttles.items()}
+
+    def health(self, url: str) -> EndpointHealth:
+        endpoint = endpoint_of(url)
+        health = self._health.get(endpoint)
+        if health is None:
+            health = EndpointHealth(endpoint)
+            self._health[endpoint] = health
+        return health
+
+    def health_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {endpoint: health.stats() for endpoint, health in self._health.items()}
+
+    @staticmethod
+    def _observe(name: str, latency: float, status_code: Optional[int], num_bytes: int) -> None:
+        UPSTREAM_SECONDS.observe(latency, provider=name)
+        UPSTREAM_RESPONSES.inc(provider=name, status=status_code or "error")
+        if num_bytes:
+            UPSTREAM_BYTES.inc(num_bytes, provider=name)
+
+    def _deadline_timeout(self, name: str, kwargs: Dict[str, Any]) -> Optional[httpx.Timeout]:
+        """
+        Timeout for a call starting now if what is left of the current
+        request's deadline is shorter than the provider's own timeout.
+        """
+        config = self.configs[name]
+        budget = remaining(config.timeout)
+        if budget <= 0:
+            raise DeadlineExceeded(f"no time left for a {name} call")
+        if budget < config.timeout and "timeout" not in kwargs:
+            return httpx.Timeout(budget, connect=min(config.connect_timeout, budget))
+        return None
+
+    @staticmethod
+    def _is_failure(status_code: Optional[int]) -> bool:
+        # Client errors are the caller's fault, not a sign the endpoint is unhealthy
+        return status_code is None or status_code >= 500 or status_code == 429
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        Send a request once the provider's rate limit and concurrency limit
+        allow it. Raises UpstreamBusy if that takes longer than the policy's
+        max_wait, CircuitOpen right away if the endpoint's breaker is open,
+        and DeadlineExceeded if the current request has run out of time.
+        """
+        health = self.health(url)
+        health.breaker.before_call()
+        throttle = self.throttle(name)
+        try:
+            started = await throttle.acquire()
+        except BaseException:
+            health.breaker.record_cancelled()
+            raise
+        timeout = None
+        try:
+            timeout = self._deadline_timeout(name, kwargs)
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            response = await self.client(name).request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            if timeout is not None and isinstance(e, httpx.TimeoutException):
+                # Cut short by the request's deadline: says nothing about the endpoint
+                throttle.release(started)
+                health.breaker.record_cancelled()
+                raise
+            throttle.release(started, failed=True)
+            health.record(time.monotonic() - started, ok=False)
+            self._observe(name, time.monotonic() - started, None, 0)
+            raise
+        except BaseException:
+            throttle.release(started)
+            health.breaker.record_cancelled()
+            raise
+        latency = time.monotonic() - started
+        throttle.release(started, response.status_code, response.headers.get("Retry-After"))
+        health.record(latency, ok=not self._is_failure(response.status_code))
+        self._observe(name, latency, response.status_code, response.num_bytes_downloaded)
+        return response
+
+    async def get(self, name: str, url: str, **kwargs) -> httpx.Response:
+        return await self.request(name, "GET", url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, name: str, method: str, url: str, **kwargs):
+        """Async context manager yielding a response whose body is read incrementally."""
+        health = self.health(url)
+        health.breaker.before_call()
+        throttle = self.throttle(name)
+        try:
+            started = await throttle.acquire()
+        except BaseException:
+            health.breaker.record_cancelled()
+            raise
+        status_code = retry_after = response = timeout = None
+        failed = cancelled = False
+        try:
+            timeout = self._deadline_timeout(name, kwargs)
+            if timeout is not None:
+                kwargs["timeout"] = timeout
+            async with self.client(name).stream(method, url, **kwargs) as response:
+                status_code = response.status_code
+                retry_after = response.headers.get("Retry-After")
+                yield response
+        except httpx.TransportError as e:
+            # A timeout shortened by the request's deadline is not the endpoint's fault
+            if timeout is not None and isinstance(e, httpx.TimeoutException):
+                cancelled = True
+            else:
+                failed = True
+            raise
+        except (asyncio.CancelledError, GeneratorExit, DeadlineExceeded):
+            cancelled = True
+            raise
+        finally:
+            # The slot is held until the body has been read
+            throttle.release(started, status_code, retry_after, failed)
+            # A call cancelled before it failed (e.g. a losing hedge) says nothing about the endpoint
+            if cancelled and (status_code is None or not self._is_failure(status_code)):
+                health.breaker.record_cancelled()
+            else:
+                latency = time.monotonic() - started
+                health.record(latency, ok=not failed and not self._is_failure(status_code))
+                self._observe(name, latency, None if failed else status_code, response.num_bytes_downloaded if response is not None else 0)
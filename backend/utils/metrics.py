@@ -0,0 +1,273 @@
+"""
+Process-wide metrics and per-request stage timing.
+
+Counters and histograms are kept in memory and rendered in the Prometheus
+text format by GET /metrics. Hot-path code wraps its stages in span(),
+which always feeds the stage latency histogram (a couple of perf_counter
+calls) and, while profiling is switched on, also the trace of the request
+being served: that trace becomes the Server-Timing header and a log line
+for slow requests. Profiling can be toggled at runtime, see PROFILER.
+"""
+import math
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+# (labels, value) pairs produced by a collector at scrape time
+Samples = Iterable[Tuple[Dict[str, Any], float]]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[Any], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with a fixed set of label names."""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names."""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            series = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            self._series[key] = series
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def count(self, **labels: Any) -> int:
+        series = self._series.get(tuple(str(labels[name]) for name in self.labelnames))
+        return series[2] if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Owns the metrics and renders them for /metrics. Collectors expose
+    counters that other components already keep (cache hits, throttle
+    stats) without those components depending on this module.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._collectors: List[Tuple[str, str, str, Tuple[str, ...], Callable[[], Samples]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, labelnames, buckets))
+
+    def collector(self, name: str, kind: str, help: str, labelnames: Tuple[str, ...], collect: Callable[[], Samples]) -> None:
+        """Register a metric whose samples are read from collect() at scrape time."""
+        self._collectors.append((name, kind, help, labelnames, collect))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        for name, kind, help, labelnames, collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                print(f"Metrics collector {name} failed: {e}")
+                continue
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(labelnames, [labels[label] for label in labelnames])} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "voyant_stage_duration_seconds", "Time spent in each stage of answering a query.", ("stage",))
+BRANCH_OUTCOMES = REGISTRY.counter(
+    "voyant_branch_outcomes_total", "Query plan branches by outcome (ok, empty, timeout, error, skipped).", ("branch", "outcome"))
+REQUEST_ERRORS = REGISTRY.counter(
+    "voyant_request_errors_total", "Requests that failed with an exception, by endpoint and exception type.", ("endpoint", "error"))
+ADMISSIONS = REGISTRY.counter(
+    "voyant_admissions_total", "Queries by admission lane and outcome (admitted, queue_full, queue_timeout, served_stale, served_weather_only, shed).", ("lane", "outcome"))
+HTTP_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "Latency of requests served by the API.", ("method", "path", "status"))
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "upstream_request_duration_seconds", "Latency of upstream calls, from the request being sent to the body being read.", ("provider",))
+UPSTREAM_RESPONSES = REGISTRY.counter(
+    "upstream_responses_total", "Upstream calls by status code (\"error\" for transport failures).", ("provider", "status"))
+UPSTREAM_BYTES = REGISTRY.counter(
+    "upstream_response_bytes_total", "Response body bytes received from upstreams.", ("provider",))
+
+
+# --- Per-request traces ------------------------------------------------------
+
+class RequestTrace:
+    """Stage durations of one request, in the order the stages finished."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float]] = []
+
+    def add(self, stage: str, duration: float) -> None:
+        self.spans.append((stage, duration))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def totals(self) -> Dict[str, Tuple[float, int]]:
+        """Total duration and count per stage (stages can repeat, e.g. per batch item)."""
+        totals: Dict[str, Tuple[float, int]] = {}
+        for stage, duration in self.spans:
+            total, count = totals.get(stage, (0.0, 0))
+            totals[stage] = (total + duration, count + 1)
+        return totals
+
+    def server_timing(self) -> str:
+        entries = [f"{stage};dur={1000 * total:.1f}" for stage, (total, _) in self.totals().items()]
+        entries.append(f"total;dur={1000 * self.elapsed():.1f}")
+        return ", ".join(entries)
+
+    def summary(self) -> str:
+        return " ".join(f"{stage}={1000 * total:.0f}ms" + (f"(x{count})" if count > 1 else "")
+                        for stage, (total, count) in self.totals().items())
+
+
+# Tasks created while serving a request (query plan branches) copy the context,
+# so they all append to the same trace object
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_request() -> Iterator[RequestTrace]:
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a stage of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def record_stage(stage: str, duration: float) -> None:
+    """Record a stage timed by the caller (e.g. CPU time summed over a loop)."""
+    STAGE_SECONDS.observe(duration, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, duration)
+
+
+class Profiler:
+    """
+    Runtime switches for per-request profiling. While enabled, every API
+    request is traced: stage timings are returned in a Server-Timing header
+    (if server_timing is on) and requests slower than slow_ms are logged
+    with their stage breakdown. Stage histograms are collected either way.
+    """
+
+    def __init__(self, enabled: bool = False, server_timing: bool = True, slow_ms: float = 2000.0):
+        self.enabled = enabled
+        self.server_timing = server_timing
+        self.slow_ms = slow_ms
+        self.slow_requests = 0
+
+    @classmethod
+    def from_env(cls) -> "Profiler":
+        """PROFILING_ENABLED (default 0), SERVER_TIMING (default 1) and PROFILING_SLOW_MS."""
+        return cls(
+            enabled=os.getenv("PROFILING_ENABLED", "0") == "1",
+            server_timing=os.getenv("SERVER_TIMING", "1") != "0",
+            slow_ms=float(os.getenv("PROFILING_SLOW_MS", "2000")),
+        )
+
+    def update(self, enabled: Optional[bool] = None, server_timing: Optional[bool] = None, slow_ms: Optional[float] = None) -> None:
+        if enabled is not None:
+            self.enabled = enabled
+        if server_timing is not None:
+            self.server_timing = server_timing
+        if slow_ms is not None:
+            self.slow_ms = slow_ms
+
+    def finish(self, trace: RequestTrace, label: str) -> None:
+        if 1000 * trace.elapsed() >= self.slow_ms:
+            self.slow_requests += 1
+            print(f"Slow request {label}: {1000 * trace.elapsed():.0f}ms {trace.summary()}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "server_timing": self.server_timing, "slow_ms": self.slow_ms, "slow_requests": self.slow_requests}
+
+
+PROFILER = Profiler.from_env()
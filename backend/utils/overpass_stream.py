@@ -0,0 +1,71 @@
+"""
+Incremental parser for Overpass JSON output.
+
+Yields the objects of the top-level "elements" array one at a time as
+response bytes arrive, so only the element currently being parsed is ever
+materialized instead of the whole response document.
+"""
+import codecs
+import json
+import re
+from typing import Any, Dict, Iterator
+
+_ELEMENTS_START = re.compile(r'"elements"\s*:\s*\[')
+# Longest tail of unmatched prefix kept while searching for the array start
+_PREFIX_TAIL = 32
+
+
+class OverpassStreamError(ValueError):
+    """Raised when the stream ends before the elements array is complete."""
+
+
+class OverpassStreamParser:
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._in_elements = False
+        self.done = False
+        self.elements_parsed = 0
+
+    def feed(self, chunk: bytes) -> Iterator[Dict[str, Any]]:
+        """Consume a chunk of response bytes and yield every element completed by it."""
+        if self.done:
+            return
+        self._buffer += self._decoder.decode(chunk)
+
+        if not self._in_elements:
+            match = _ELEMENTS_START.search(self._buffer)
+            if not match:
+                self._buffer = self._buffer[-_PREFIX_TAIL:]
+                return
+            self._in_elements = True
+            self._buffer = self._buffer[match.end():]
+
+        buffer = self._buffer
+        pos = 0
+        length = len(buffer)
+        while True:
+            # Skip separators between elements
+            while pos < length and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= length:
+                break
+            if buffer[pos] == "]":
+                self.done = True
+                pos += 1
+                break
+            try:
+                element, pos = self._json.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Element is incomplete: wait for the next chunk
+                break
+            self.elements_parsed += 1
+            yield element
+        self._buffer = buffer[pos:]
+
+    def close(self) -> None:
+        """Verify the stream contained a complete elements array."""
+        self._buffer += self._decoder.decode(b"", final=True)
+        if not self.done:
+            raise OverpassStreamError("Overpass response ended before the elements array was complete")
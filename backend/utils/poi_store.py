@@ -0,0 +1,272 @@
+"""
+Offline POI store: a compact, memory-mapped file of place records with a
+grid spatial index, built by tools/build_poi_store.py from an OSM extract.
+
+PlacesAgent queries it before Overpass; radius searches inside the covered
+area are answered locally without any network call.
+
+File layout (little endian, sections 8-byte aligned):
+    header   MAGIC, cell size, coverage bbox, section counts
+    cells    (cell key, first record, record count), sorted by cell key
+    records  RECORD_DTYPE rows, sorted by cell key (seq keeps input order)
+    strings  offsets (n + 1 uint32) followed by the UTF-8 blob
+String id 0 is always the empty string and means "tag absent".
+"""
+import math
+import mmap
+import os
+import struct
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from utils.spatial import EARTH_RADIUS_KM
+
+MAGIC = b"VOYPOI01"
+# cell size (degrees), min_lat, min_lon, max_lat, max_lon, records, cells, strings
+_HEADER = struct.Struct("<8s5dIII")
+
+VALUE_KEYS = ("tourism", "historic", "amenity", "shop", "leisure", "natural", "wikipedia", "wikidata")
+
+# Presence bits for the metadata keys the scorer counts, plus truthy heritage / unesco
+FLAG_KEYS = ("opening_hours", "wheelchair", "website", "wikipedia", "ticket_price", "tourism", "phone", "email", "addr:street", "image", "heritage", "unesco")
+
+if np is not None:
+    RECORD_DTYPE = np.dtype(
+        [("lat", "<f8"), ("lon", "<f8"), ("name", "<u4"), ("category", "<u4")]
+        + [(key, "<u4") for key in VALUE_KEYS]
+        + [("flags", "<u2"), ("static_score", "i1"), ("metadata_count", "i1"), ("seq", "<u4")]
+    )
+    CELL_DTYPE = np.dtype([("key", "<i8"), ("start", "<u4"), ("count", "<u4")])
+
+DEFAULT_CELL_SIZE = 0.05  # degrees, roughly 5.5km of latitude
+
+Bbox = Tuple[float, float, float, float]
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _grid_shape(cell_size: float) -> Tuple[int, int]:
+    return math.ceil(180 / cell_size), math.ceil(360 / cell_size)
+
+
+def _cell_row_col(lat: float, lon: float, cell_size: float) -> Tuple[int, int]:
+    rows, cols = _grid_shape(cell_size)
+    row = min(max(int((lat + 90) // cell_size), 0), rows - 1)
+    col = min(max(int((lon + 180) // cell_size), 0), cols - 1)
+    return row, col
+
+
+def write_poi_store(path: str, records: Iterable, bbox: Bbox, cell_size: float = DEFAULT_CELL_SIZE) -> int:
+    """
+    Write PlaceRecords to a store file. Returns the number of records written.
+    """
+    if np is None:
+        raise RuntimeError("NumPy is required to build a POI store")
+
+    strings: Dict[str, int] = {"": 0}
+
+    def string_id(value: Optional[str]) -> int:
+        if not value:
+            return 0
+        return strings.setdefault(value, len(strings))
+
+    _, cols = _grid_shape(cell_size)
+    rows = []
+    keys = []
+    for seq, record in enumerate(records):
+        flags = 0
+        for bit, key in enumerate(FLAG_KEYS):
+            present = bool(record.tags.get(key)) if key in ("heritage", "unesco") else key in record.tags
+            if present:
+                flags |= 1 << bit
+        rows.append(
+            (record.lat, record.lon, string_id(record.name), string_id(record.category))
+            + tuple(string_id(record.tags.get(key)) for key in VALUE_KEYS)
+            + (flags, record.static_score, record.metadata_count, seq)
+        )
+        row, col = _cell_row_col(record.lat, record.lon, cell_size)
+        keys.append(row * cols + col)
+
+    data = np.array(rows, dtype=RECORD_DTYPE)
+    cell_keys = np.array(keys, dtype=np.int64)
+    order = np.argsort(cell_keys, kind="stable")
+    data = data[order]
+    cell_keys = cell_keys[order]
+
+    unique_keys, starts, counts = np.unique(cell_keys, return_index=True, return_counts=True)
+    cells = np.empty(len(unique_keys), dtype=CELL_DTYPE)
+    cells["key"] = unique_keys
+    cells["start"] = starts
+    cells["count"] = counts
+
+    ordered_strings = sorted(strings, key=strings.get)
+    encoded = [s.encode("utf-8") for s in ordered_strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, cell_size, *bbox, len(data), len(cells), len(encoded)))
+        for section in (cells.tobytes(), data.tobytes(), offsets.tobytes()):
+            f.write(b"\0" * (_align(f.tell()) - f.tell()))
+            f.write(section)
+        f.write(b"".join(encoded))
+    os.replace(tmp_path, path)
+    return len(data)
+
+
+class PoiStore:
+    """Read-only, memory-mapped view of a POI store file."""
+
+    def __init__(self, path: str):
+        if np is None:
+            raise RuntimeError("NumPy is required to read a POI store")
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.cell_size, *bbox, n_records, n_cells, n_strings = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a POI store")
+        self.bbox: Bbox = tuple(bbox)
+        self._rows, self._cols = _grid_shape(self.cell_size)
+
+        offset = _align(_HEADER.size)
+        self.cells = np.frombuffer(self._mmap, dtype=CELL_DTYPE, count=n_cells, offset=offset)
+        offset = _align(offset + self.cells.nbytes)
+        self.records = np.frombuffer(self._mmap, dtype=RECORD_DTYPE, count=n_records, offset=offset)
+        offset = _align(offset + self.records.nbytes)
+        self._string_offsets = np.frombuffer(self._mmap, dtype="<u4", count=n_strings + 1, offset=offset)
+        self._blob_offset = offset + self._string_offsets.nbytes
+        self._strings: Dict[int, str] = {}
+        self._string_ids: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["PoiStore"]:
+        """Open the store named by POI_STORE_PATH, if any."""
+        path = os.getenv("POI_STORE_PATH")
+        if not path:
+            return None
+        try:
+            return cls(path)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"POI store unavailable, using Overpass only: {e}")
+            return None
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def close(self) -> None:
+        # Drop the array views before closing the mapping they point into
+        self.cells = self.records = self._string_offsets = None
+        self._mmap.close()
+        self._file.close()
+
+    def string(self, string_id: int) -> str:
+        value = self._strings.get(string_id)
+        if value is None:
+            start = self._blob_offset + int(self._string_offsets[string_id])
+            end = self._blob_offset + int(self._string_offsets[string_id + 1])
+            value = self._mmap[start:end].decode("utf-8")
+            self._strings[string_id] = value
+        return value
+
+    def string_id(self, value: str) -> Optional[int]:
+        if self._string_ids is None:
+            self._string_ids = {self.string(i): i for i in range(len(self._string_offsets) - 1)}
+        return self._string_ids.get(value)
+
+    def covers(self, lat: float, lon: float, radius_m: float) -> bool:
+        """Whether the whole search circle lies inside the extract's coverage."""
+        dlat, dlon = self._degree_extent(lat, radius_m)
+        min_lat, min_lon, max_lat, max_lon = self.bbox
+        return min_lat <= lat - dlat and lat + dlat <= max_lat and min_lon <= lon - dlon and lon + dlon <= max_lon
+
+    @staticmethod
+    def _degree_extent(lat: float, radius_m: float) -> Tuple[float, float]:
+        dlat = math.degrees(radius_m / 1000 / EARTH_RADIUS_KM)
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        return dlat, dlon
+
+    def _candidate_rows(self, lat: float, lon: float, radius_m: float) -> "np.ndarray":
+        """Records of every grid cell overlapping the circle's bounding box."""
+        dlat, dlon = self._degree_extent(lat, radius_m)
+        row_lo, col_lo = _cell_row_col(lat - dlat, lon - dlon, self.cell_size)
+        row_hi, col_hi = _cell_row_col(lat + dlat, lon + dlon, self.cell_size)
+        keys = self.cells["key"]
+        slices = []
+        for row in range(row_lo, row_hi + 1):
+            # Cells of one row have consecutive keys, so their records are contiguous
+            first = np.searchsorted(keys, row * self._cols + col_lo, side="left")
+            last = np.searchsorted(keys, row * self._cols + col_hi, side="right")
+            if first < last:
+                start = int(self.cells["start"][first])
+                end = int(self.cells["start"][last - 1]) + int(self.cells["count"][last - 1])
+                slices.append(np.arange(start, end))
+        if not slices:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(slices)
+
+    def query(self, lat: float, lon: float, radius_m: float, tag_filters: List[Tuple[str, str]]) -> List:
+        """
+        Records within radius_m of (lat, lon) having any of the (key, value)
+        tags, as a CandidateList of PlaceRecords ready for ranking.
+        """
+        from agents.place_records import PlaceRecord
+        from agents.ranking import CandidateList
+
+        rows = self._candidate_rows(lat, lon, radius_m)
+        subset = self.records[rows]
+
+        mask = np.zeros(len(subset), dtype=bool)
+        for key, value in tag_filters:
+            value_id = self.string_id(value)
+            if key in VALUE_KEYS and value_id:
+                mask |= subset[key] == value_id
+        subset = subset[mask]
+
+        dlat = np.radians(subset["lat"] - lat)
+        dlon = np.radians(subset["lon"] - lon)
+        a = np.sin(dlat / 2) ** 2 + np.cos(np.radians(lat)) * np.cos(np.radians(subset["lat"])) * np.sin(dlon / 2) ** 2
+        dist = EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        subset = subset[dist * 1000 <= radius_m]
+        # Back to extract order (nodes, then ways, by id, like Overpass output)
+        # so ranking ties break the same way as for an Overpass response
+        subset = subset[np.argsort(subset["seq"], kind="stable")]
+
+        candidates = CandidateList()
+        for row in subset:
+            tags = {}
+            flags = int(row["flags"])
+            for bit, key in enumerate(FLAG_KEYS):
+                if flags & (1 << bit):
+                    tags[key] = "yes"
+            for key in VALUE_KEYS:
+                value_id = int(row[key])
+                if value_id:
+                    tags[key] = self.string(value_id)
+            candidates.append(PlaceRecord(
+                self.string(int(row["name"])),
+                float(row["lat"]),
+                float(row["lon"]),
+                self.string(int(row["category"])),
+                tags,
+                int(row["static_score"]),
+                int(row["metadata_count"]),
+            ))
+
+        # The columns the ranking engine needs are already arrays here
+        candidates.columns = {
+            "lat": np.ascontiguousarray(subset["lat"]),
+            "lon": np.ascontiguousarray(subset["lon"]),
+            "static_score": np.ascontiguousarray(subset["static_score"]),
+            "metadata": np.ascontiguousarray(subset["metadata_count"]),
+            "category_ids": np.unique(subset["category"], return_inverse=True)[1].astype(np.int32),
+        }
+        return candidates
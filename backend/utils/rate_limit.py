@@ -0,0 +1,203 @@
+"""
+Per-provider request throttling.
+
+Each upstream gets a token bucket (its published request rate, e.g.
+Nominatim's 1 req/s) and an adaptive concurrency limit that grows while
+the provider answers quickly and is cut back on 429/5xx responses or rising
+latency (AIMD). Requests wait in line for both, up to a bounded time,
+instead of hammering a provider that is already struggling.
+"""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+from utils.deadline import remaining
+
+# Responses that mean "slow down" rather than "your request is wrong"
+OVERLOAD_STATUSES = frozenset({429, 502, 503, 504})
+
+
+class UpstreamBusy(Exception):
+    """Raised when a request can't get a slot with a provider within its wait budget."""
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """Throttling settings for one upstream provider."""
+    # Sustained requests per second (None: no rate limit) and burst size
+    rate: Optional[float] = None
+    burst: int = 1
+    # Adaptive concurrency bounds and starting point
+    min_concurrency: int = 1
+    initial_concurrency: int = 4
+    max_concurrency: int = 16
+    # Requests slower than this count as a congestion signal
+    latency_target: float = 2.0
+    # Longest a request waits for a token and a slot before giving up
+    max_wait: float = 5.0
+
+
+class TokenBucket:
+    """
+    Token bucket with reservations: each caller takes the next token (going
+    into debt if needed) and sleeps until it is due, so waiters are served
+    in arrival order without polling.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        # A Retry-After from the provider blocks the bucket until this time
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, max_wait: float) -> float:
+        """Take a token and return how long to wait for it, or raise UpstreamBusy."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, (1 - self._tokens) / self.rate, self._paused_until - now)
+        if wait > max_wait:
+            raise UpstreamBusy(f"rate limit wait {wait:.1f}s exceeds {max_wait:.1f}s")
+        self._tokens -= 1
+        return wait
+
+    def refund(self) -> None:
+        """Give back a reserved token whose request never ran."""
+        self._tokens = min(self.burst, self._tokens + 1)
+
+    def pause(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD concurrency limit: +1 per limit's worth of fast successful requests,
+    halved on overload responses, reduced by 10% on slow responses. At most
+    one decrease per latency window, so a burst of failures from the same
+    congestion episode isn't counted many times over.
+    """
+
+    def __init__(self, policy: RateLimitPolicy):
+        self.policy = policy
+        self.limit = float(policy.initial_concurrency)
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._last_decrease = 0.0
+
+    @property
+    def effective_limit(self) -> int:
+        return max(self.policy.min_concurrency, int(self.limit))
+
+    async def acquire(self, timeout: float) -> None:
+        if self.in_flight < self.effective_limit and not self._waiters:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # The slot is handed over by release(), which counts it in in_flight
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            raise UpstreamBusy(f"no concurrency slot within {timeout:.1f}s (limit {self.effective_limit})")
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+        elif waiter.done() and not waiter.cancelled():
+            # Granted a slot just as we gave up: pass it on
+            self.in_flight -= 1
+            self._wake()
+
+    def release(self, latency: float, overloaded: bool) -> None:
+        now = time.monotonic()
+        policy = self.policy
+        if overloaded or latency > policy.latency_target:
+            if now - self._last_decrease >= policy.latency_target:
+                factor = 0.5 if overloaded else 0.9
+                self.limit = max(float(policy.min_concurrency), self.limit * factor)
+                self._last_decrease = now
+        else:
+            self.limit = min(float(policy.max_concurrency), self.limit + 1 / self.limit)
+
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.effective_limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+class ProviderThrottle:
+    """Token bucket plus adaptive concurrency limit for one provider."""
+
+    def __init__(self, name: str, policy: RateLimitPolicy):
+        self.name = name
+        self.policy = policy
+        self.bucket = TokenBucket(policy.rate, policy.burst) if policy.rate else None
+        self.concurrency = AdaptiveConcurrencyLimit(policy)
+        self.requests = 0
+        self.rejected = 0
+        self.overloaded = 0
+        self.waited = 0.0
+
+    async def acquire(self) -> float:
+        """Wait for a token and a slot; returns the start time for release()."""
+        started = time.monotonic()
+        # Never wait past the deadline of the request being served
+        max_wait = remaining(self.policy.max_wait)
+        reserved = False
+        try:
+            if self.bucket is not None:
+                wait = self.bucket.reserve(max_wait)
+                reserved = True
+                if wait:
+                    await asyncio.sleep(wait)
+            await self.concurrency.acquire(max(max_wait - (time.monotonic() - started), 0.0))
+        except (UpstreamBusy, asyncio.CancelledError) as e:
+            # The request never ran: its token goes to the next caller
+            if reserved:
+                self.bucket.refund()
+            if isinstance(e, UpstreamBusy):
+                self.rejected += 1
+            raise
+        now = time.monotonic()
+        self.waited += now - started
+        self.requests += 1
+        return now
+
+    def release(self, started: float, status_code: Optional[int] = None, retry_after: Optional[str] = None, failed: bool = False) -> None:
+        """Report a finished request. Timeouts and connection errors count as overload."""
+        overloaded = failed or status_code in OVERLOAD_STATUSES
+        if overloaded:
+            self.overloaded += 1
+        if retry_after and self.bucket is not None:
+            try:
+                self.bucket.pause(min(float(retry_after), self.policy.max_wait * 4))
+            except ValueError:
+                pass  # HTTP-date form: the halved concurrency limit is enough
+        self.concurrency.release(time.monotonic() - started, overloaded)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "overloaded": self.overloaded,
+            "concurrency_limit": self.concurrency.effective_limit,
+            "in_flight": self.concurrency.in_flight,
+            "queued": len(self.concurrency._waiters),
+            "avg_wait_ms": round(1000 * self.waited / self.requests, 1) if self.requests else 0.0,
+        }
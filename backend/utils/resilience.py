@@ -0,0 +1,191 @@
+"""
+Failure handling for upstream endpoints.
+
+Every endpoint (scheme + host) gets a circuit breaker and a health record
+(success rate and latency). Once an endpoint keeps failing its breaker
+opens and calls fail immediately with CircuitOpen, so callers can fall back
+to cached data instead of waiting out a timeout. For providers with several
+interchangeable endpoints (Overpass mirrors), MirrorPool sends each call to
+the healthiest one and hedges to the next if no answer arrives by its p95.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+from urllib.parse import urlsplit
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures; open ->
+    half-open after `recovery_timeout`, letting one probe call through;
+    the probe's outcome closes or re-opens the circuit.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allows(self) -> bool:
+        """Whether a call may go through now (without reserving the half-open probe)."""
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.recovery_timeout
+        if self.state == self.HALF_OPEN:
+            return not self._probe_in_flight
+        return True
+
+    def before_call(self) -> None:
+        if not self.allows():
+            raise CircuitOpen("circuit open")
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def record_cancelled(self) -> None:
+        # A hedged call that lost the race tells us nothing about the endpoint
+        self._probe_in_flight = False
+
+
+class EndpointHealth:
+    """Breaker plus recent latency and success rate of one endpoint."""
+
+    LATENCY_WINDOW = 100
+    # Samples needed before the observed p95 is trusted over the default
+    MIN_SAMPLES = 20
+    # Weight of the newest outcome in the success-rate average
+    SUCCESS_ALPHA = 0.2
+
+    def __init__(self, endpoint: str, breaker: Optional[CircuitBreaker] = None):
+        self.endpoint = endpoint
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies: Deque[float] = deque(maxlen=self.LATENCY_WINDOW)
+        self.success_rate = 1.0
+        self.successes = 0
+        self.failures = 0
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.success_rate += self.SUCCESS_ALPHA * ((1.0 if ok else 0.0) - self.success_rate)
+        if ok:
+            self.successes += 1
+            self.latencies.append(latency)
+            self.breaker.record_success()
+        else:
+            self.failures += 1
+            self.breaker.record_failure()
+
+    def percentile(self, q: float, default: float) -> float:
+        if len(self.latencies) < self.MIN_SAMPLES:
+            return default
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def score(self) -> float:
+        """Higher is healthier: success rate, discounted by typical latency."""
+        if not self.breaker.allows():
+            return -1.0
+        return self.success_rate / (1.0 + self.percentile(0.5, 0.0))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.breaker.state,
+            "success_rate": round(self.success_rate, 3),
+            "p95_ms": round(1000 * self.percentile(0.95, 0.0), 1),
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+def endpoint_of(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class MirrorPool:
+    """
+    Interchangeable endpoints of one provider, tried healthiest first.
+
+    If the chosen mirror hasn't answered within its p95 latency (clamped to
+    [min_hedge_delay, max_hedge_delay], or default_hedge_delay until enough
+    samples exist), the same call is also sent to the next mirror and the
+    first success wins. A failed attempt moves on to the next mirror at once.
+    """
+
+    def __init__(self, urls: List[str], health: Callable[[str], EndpointHealth], default_hedge_delay: float = 5.0,
+                 min_hedge_delay: float = 0.5, max_hedge_delay: float = 15.0, max_attempts: int = 2):
+        self.urls = list(urls)
+        self.health = health
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_hedge_delay = max_hedge_delay
+        self.max_attempts = max_attempts
+        self.hedged = 0
+
+    def ranked(self) -> List[str]:
+        """Mirrors whose breakers allow a call, healthiest first (configured order breaks ties)."""
+        usable = [url for url in self.urls if self.health(url).breaker.allows()]
+        return sorted(usable, key=lambda url: -self.health(url).score())
+
+    def hedge_delay(self, url: str) -> float:
+        p95 = self.health(url).percentile(0.95, self.default_hedge_delay)
+        return min(max(p95, self.min_hedge_delay), self.max_hedge_delay)
+
+    async def call(self, fn: Callable[[str], Awaitable[Any]]) -> Any:
+        """Run fn(mirror_url) with failover and hedging; raises CircuitOpen if no mirror is usable."""
+        remaining = self.ranked()[:self.max_attempts]
+        if not remaining:
+            raise CircuitOpen(f"all {len(self.urls)} mirrors have open circuits")
+
+        running: Dict[asyncio.Task, str] = {}
+        last_error: Optional[BaseException] = None
+
+        def launch() -> None:
+            url = remaining.pop(0)
+            running[asyncio.create_task(fn(url))] = url
+
+        launch()
+        try:
+            while running:
+                newest = list(running.values())[-1]
+                timeout = self.hedge_delay(newest) if remaining else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slower than usual: race the next mirror against it
+                    self.hedged += 1
+                    launch()
+                    continue
+                for task in done:
+                    running.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                if not running and remaining:
+                    launch()
+            raise last_error
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                # Let the losers finish their bookkeeping (throttle slot, breaker) before returning
+                await asyncio.gather(*running, return_exceptions=True)
@@ -0,0 +1,80 @@
+"""
+JSON encoding and response compression.
+
+Bodies are encoded with orjson when it is installed (several times faster
+than the json module, and it produces UTF-8 bytes directly), and
+compressed with brotli or gzip according to the client's Accept-Encoding.
+Bodies below COMPRESSION_MIN_BYTES are sent as is: at that size the
+framing overhead eats most of the saving.
+"""
+import gzip
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.getenv("RESPONSE_COMPRESSION", "1") != "0"
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "512"))
+# Fast settings: responses are compressed on the request path
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+
+def dumps(value: Any, sort_keys: bool = False) -> bytes:
+    """Compact UTF-8 JSON."""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(value, option=option)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), sort_keys=sort_keys).encode("utf-8")
+
+
+def _accepted_codings(accept_encoding: str) -> Dict[str, float]:
+    codings = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            codings[name.strip().lower()] = quality
+    return codings
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best content coding we support for this Accept-Encoding ("br", "gzip" or None)."""
+    if not COMPRESSION_ENABLED or not accept_encoding:
+        return None
+    codings = _accepted_codings(accept_encoding)
+    wildcard = codings.get("*", 0.0)
+    # Brotli first on equal preference: smaller output at similar speed
+    supported = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_quality = None, 0.0
+    for name in supported:
+        quality = codings.get(name, wildcard)
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compress(body: bytes, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+    """(body, Content-Encoding) for the negotiated coding; small bodies stay uncompressed."""
+    if encoding is None or len(body) < COMPRESSION_MIN_BYTES:
+        return body, None
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    # mtime=0 keeps the output identical for identical bodies
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
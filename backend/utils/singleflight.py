@@ -0,0 +1,85 @@
+"""
+Request coalescing for upstream calls.
+
+Concurrent callers asking for the same key share one in-flight call and
+all receive its result (or its exception), so a burst of identical
+/chat requests reaches the upstream provider only once.
+
+The shared call runs under the latest deadline of the callers waiting for
+it, and is cancelled once none of them is waiting any more, so a call
+every caller has given up on doesn't keep holding upstream capacity.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from utils.deadline import SharedDeadline, current, with_shared_deadline
+
+
+class _Call:
+    """One shared call: its task, its deadline and how many callers wait for it."""
+
+    def __init__(self, fn: Callable[[], Awaitable[Any]]):
+        self.deadline = SharedDeadline()
+        self.task = asyncio.create_task(with_shared_deadline(fn, self.deadline))
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls per key."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() for key, or join the call already in flight for key.
+        """
+        self.calls += 1
+        call = self._inflight.get(key)
+        if call is None:
+            self.executions += 1
+            call = _Call(fn)
+            self._inflight[key] = call
+            call.task.add_done_callback(lambda done, key=key, call=call: self._finish(key, call))
+        else:
+            self.coalesced += 1
+        call.deadline.join(current())
+        call.waiters += 1
+        try:
+            # Shielded so one caller timing out or disconnecting doesn't cancel
+            # the shared call for everyone else waiting on it
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every caller gave up: stop the call, and let the next caller start afresh
+                self.abandoned += 1
+                self._forget(key, call)
+                call.task.cancel()
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+
+    def _finish(self, key: Hashable, call: _Call) -> None:
+        self._forget(key, call)
+        # Mark the exception as retrieved even if every caller gave up waiting
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+            "in_flight": self.in_flight(),
+        }
@@ -0,0 +1,92 @@
+"""
+Geospatial helpers: distances and geohash cells used as cache keys.
+"""
+import math
+from typing import Tuple
+
+EARTH_RADIUS_KM = 6371
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(_BASE32)}
+
+# Approximate cell width in km at the equator for each geohash precision
+_CELL_WIDTH_KM = {1: 5000, 2: 1250, 3: 156, 4: 39.1, 5: 4.89, 6: 1.22, 7: 0.153, 8: 0.0382}
+
+
+def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Calculate distance between two points in km"""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat/2) * math.sin(dlat/2) + \
+        math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
+        math.sin(dlon/2) * math.sin(dlon/2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return EARTH_RADIUS_KM * c
+
+
+def geohash_encode(lat: float, lon: float, precision: int) -> str:
+    """Encode a coordinate as a geohash string of the given length."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """Return (min_lat, min_lon, max_lat, max_lon) of a geohash cell."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def geohash_center(geohash: str) -> Tuple[float, float]:
+    min_lat, min_lon, max_lat, max_lon = geohash_bounds(geohash)
+    return (min_lat + max_lat) / 2, (min_lon + max_lon) / 2
+
+
+def precision_for_radius(radius_m: float) -> int:
+    """
+    Pick the coarsest geohash precision whose cells are small compared to the
+    search radius, so snapping to a cell barely moves the search circle.
+    """
+    radius_km = radius_m / 1000
+    for precision in range(1, 9):
+        if _CELL_WIDTH_KM[precision] <= radius_km / 5:
+            return precision
+    return 8
+
+
+def snap_to_cell(lat: float, lon: float, radius_m: float) -> Tuple[str, float, float]:
+    """Return (geohash, center_lat, center_lon) of the cell containing a point."""
+    cell = geohash_encode(lat, lon, precision_for_radius(radius_m))
+    center_lat, center_lon = geohash_center(cell)
+    return cell, center_lat, center_lon
@@ -1,12 +1,41 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { Send, Loader2, Sparkles } from 'lucide-react';
 import { motion, AnimatePresence } from 'framer-motion';
-import { chatWithAgent } from '../services/api';
+import { chatWithAgent, streamChatWithAgent } from '../services/api';
 import WeatherCard from './WeatherCard';
 import PlacesCard from './PlacesCard';
 import MapView from './MapView';
 import HeroSection from './HeroSection';
 
+// Folds one /chat/stream event into the bot message being streamed.
+// Weather text comes before places text, as in the final answer.
+const applyStreamEvent = (message, event) => {
+    switch (event.event) {
+        case 'location':
+            return { ...message, data: { location: event.location, lat: event.lat, lon: event.lon } };
+        case 'weather':
+            return {
+                ...message,
+                weatherText: event.text,
+                text: [event.text, message.placesText].filter(Boolean).join(' '),
+                data: { ...message.data, weather: event.weather }
+            };
+        case 'places':
+            return {
+                ...message,
+                placesText: event.text,
+                text: [message.weatherText, event.text].filter(Boolean).join(' '),
+                data: { ...message.data, places: event.places.length > 0 ? event.places : undefined }
+            };
+        case 'enrichment':
+            return { ...message, data: { ...message.data, places: event.places } };
+        case 'done':
+            return { type: 'bot', text: event.text, data: event.data };
+        default:
+            return message;
+    }
+};
+
 const ChatInterface = ({ preferences, onOpenPreferences }) => {
     const [messages, setMessages] = useState([]);
     const [input, setInput] = useState('');
@@ -37,15 +66,40 @@ const ChatInterface = ({ preferences, onOpenPreferences }) => {
                 ? { category_filter: preferences.category_filter }
                 : { category_filter: 'all' };
 
-            const response = await chatWithAgent(userMessage, filterPreferences);
-
-            setMessages(prev => [...prev, {
-                type: 'bot',
-                text: response.text,
-                data: response.data
-            }]);
+            // Show each result as soon as the backend has it, in one bot
+            // message that is updated in place until the final "done" event
+            let streamed = false;
+            try {
+                await streamChatWithAgent(userMessage, filterPreferences, (event) => {
+                    const first = !streamed;
+                    streamed = true;
+                    setMessages(prev => {
+                        if (first) {
+                            return [...prev, applyStreamEvent({ type: 'bot', text: '', data: null, streaming: true }, event)];
+                        }
+                        return [...prev.slice(0, -1), applyStreamEvent(prev[prev.length - 1], event)];
+                    });
+                });
+            } catch (error) {
+                if (streamed) throw error;
+                // Streaming unavailable (old backend, proxy): wait for the whole answer
+                const response = await chatWithAgent(userMessage, filterPreferences);
+                setMessages(prev => [...prev, {
+                    type: 'bot',
+                    text: response.text,
+                    data: response.data
+                }]);
+            }
         } catch (error) {
-            setMessages(prev => [...prev, { type: 'bot', text: "Sorry, I encountered an error. Please try again." }]);
+            const sorry = { type: 'bot', text: "Sorry, I encountered an error. Please try again." };
+            setMessages(prev => {
+                const last = prev[prev.length - 1];
+                // Keep the partial results already shown
+                if (last && last.streaming) {
+                    return [...prev.slice(0, -1), { ...last, streaming: false, text: [last.text, sorry.text].filter(Boolean).join(' ') }];
+                }
+                return [...prev, sorry];
+            });
         } finally {
             setLoading(false);
         }
@@ -77,15 +131,17 @@ const ChatInterface = ({ preferences, onOpenPreferences }) => {
                                     )}
 
                                     <div className="flex flex-col gap-2">
-                                        <div
-                                            className={`px-5 py-3.5 rounded-2xl text-[15px] leading-relaxed shadow-sm ${msg.type === 'user' ? 'text-white rounded-tr-sm' : 'rounded-tl-sm border'}`}
-                                            style={msg.type === 'user'
-                                                ? { background: 'var(--navy-primary)' }
-                                                : { background: 'rgba(255, 255, 255, 0.95)', borderColor: 'rgba(201, 169, 97, 0.2)', color: 'var(--text-dark)' }
-                                            }
-                                        >
-                                            <p className="whitespace-pre-wrap">{msg.text}</p>
-                                        </div>
+                                        {(msg.text || !msg.streaming) && (
+                                            <div
+                                                className={`px-5 py-3.5 rounded-2xl text-[15px] leading-relaxed shadow-sm ${msg.type === 'user' ? 'text-white rounded-tr-sm' : 'rounded-tl-sm border'}`}
+                                                style={msg.type === 'user'
+                                                    ? { background: 'var(--navy-primary)' }
+                                                    : { background: 'rgba(255, 255, 255, 0.95)', borderColor: 'rgba(201, 169, 97, 0.2)', color: 'var(--text-dark)' }
+                                                }
+                                            >
+                                                <p className="whitespace-pre-wrap">{msg.text}</p>
+                                            </div>
+                                        )}
 
                                         {msg.data && (
                                             <div className="flex flex-col gap-4 mt-1">
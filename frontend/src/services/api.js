@@ -2,11 +2,12 @@ import axios from 'axios';
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
+// GET so the browser (and any CDN in front of the API) can cache answers
+// and revalidate them with If-None-Match.
 export const chatWithAgent = async (message, preferences = null) => {
     try {
-        const response = await axios.post(`${API_URL}/chat`, {
-            message,
-            preferences
+        const response = await axios.get(`${API_URL}/chat`, {
+            params: { message, ...(preferences || {}) }
         });
         return response.data;
     } catch (error) {
@@ -14,3 +15,40 @@ export const chatWithAgent = async (message, preferences = null) => {
         throw error;
     }
 };
+
+// Streams /chat/stream results as NDJSON events ("location", "weather",
+// "places", "enrichment", "done"), calling onEvent for each one as it arrives.
+// An "error" event from the server is thrown.
+export const streamChatWithAgent = async (message, preferences = null, onEvent = () => {}) => {
+    const response = await fetch(`${API_URL}/chat/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', Accept: 'application/x-ndjson' },
+        body: JSON.stringify({ message, preferences })
+    });
+    if (!response.ok || !response.body) {
+        throw new Error(`Streaming request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let finalEvent = null;
+
+    for (;;) {
+        const { value, done } = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const event = JSON.parse(line);
+            if (event.event === 'error') {
+                throw new Error(event.detail || 'Streaming request failed');
+            }
+            if (event.event === 'done') finalEvent = event;
+            onEvent(event);
+        }
+        if (done) break;
+    }
+    return finalEvent;
+};